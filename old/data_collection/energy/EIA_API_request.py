@@ -156,7 +156,12 @@ def store_data(db_conn, data: list, region: str) -> bool:
     """Store energy production data in database"""
     try:
         stored_count = 0
+        missing_count = 0
         for entry in data:
+            # A missing reading is a gap, not a zero; skip it so the quality stage sees it as one
+            if entry.get('value') in (None, ''):
+                missing_count += 1
+                continue
             try:
                 db_conn.cursor.execute("""
                 INSERT OR REPLACE INTO EnergyProduction 
@@ -168,7 +173,7 @@ def store_data(db_conn, data: list, region: str) -> bool:
                     entry.get('respondent-name'),
                     entry.get('fueltype'),
                     entry.get('type-name'),
-                    float(entry.get('value', 0)),
+                    float(entry['value']),
                     entry.get('value-units')
                 ))
                 stored_count += 1
@@ -176,11 +181,13 @@ def store_data(db_conn, data: list, region: str) -> bool:
                 if stored_count % 1000 == 0:
                     logger.info(f"Stored {stored_count} records for {region}")
                 
-            except sqlite3.Error as e:
+            except (sqlite3.Error, ValueError) as e:
                 logger.error(f"Error storing entry: {e}")
                 continue
             
         db_conn.conn.commit()
+        if missing_count:
+            logger.warning(f"Skipped {missing_count} records without a value for {region}")
         logger.info(f"Successfully stored {stored_count} records for {region}")
         
         # After storing raw data, calculate and store statistics
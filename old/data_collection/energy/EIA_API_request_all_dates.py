@@ -1,4 +1,5 @@
 import os
+import sys
 import requests
 import sqlite3
 from datetime import datetime, timedelta
@@ -9,6 +10,10 @@ import matplotlib.pyplot as plt
 
 from dotenv import load_dotenv
 
+# Shared timing / counter instrumentation (see final_deliverable/instrumentation.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'final_deliverable'))
+from instrumentation import count, metrics, profiled, span, timed
+
 
 # Set up logging
 logging.basicConfig(
@@ -139,7 +144,9 @@ def get_energy_production_data(region: str, start_date: str, end_date: str) -> l
 
     try:
         logger.info(f"Fetching data for {region} from {start_date} to {end_date}")
-        response = requests.get(endpoint, params=params)
+        with span('eia.fetch', region=region):
+            response = requests.get(endpoint, params=params)
+        count('eia.requests', region=region, status=response.status_code)
         
         if response.status_code != 200:
             logger.error(f"Error response: {response.text}")
@@ -147,6 +154,7 @@ def get_energy_production_data(region: str, start_date: str, end_date: str) -> l
             
         data = response.json()
         records = data['response']['data']
+        count('eia.records_fetched', len(records), region=region)
         logger.info(f"Retrieved {len(records)} records for {region}")
         
         return records
@@ -193,32 +201,43 @@ def fetch_and_store_data_for_range(region: str, start_date: str, end_date: str,
 def store_data(db_conn, data: list, region: str) -> bool:
     """Store energy production data in database"""
     try:
-        stored_count = 0
-        for entry in data:
-            try:
-                db_conn.cursor.execute("""
-                INSERT OR REPLACE INTO EnergyProduction 
-                (period, respondent, respondent_name, fuel_type, type_name, value, units, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-                """, (
-                    entry.get('period'),
-                    entry.get('respondent'),
-                    entry.get('respondent-name'),
-                    entry.get('fueltype'),
-                    entry.get('type-name'),
-                    float(entry.get('value', 0)),
-                    entry.get('value-units')
-                ))
-                stored_count += 1
+        with span('eia.store', region=region):
+            stored_count = 0
+            missing_count = 0
+            for entry in data:
+                # A missing reading is a gap, not a zero; skip it so the quality stage sees it as one
+                if entry.get('value') in (None, ''):
+                    missing_count += 1
+                    continue
+                try:
+                    db_conn.cursor.execute("""
+                    INSERT OR REPLACE INTO EnergyProduction 
+                    (period, respondent, respondent_name, fuel_type, type_name, value, units, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    """, (
+                        entry.get('period'),
+                        entry.get('respondent'),
+                        entry.get('respondent-name'),
+                        entry.get('fueltype'),
+                        entry.get('type-name'),
+                        float(entry['value']),
+                        entry.get('value-units')
+                    ))
+                    stored_count += 1
                 
-                if stored_count % 1000 == 0:
-                    logger.info(f"Stored {stored_count} records for {region}")
+                    if stored_count % 1000 == 0:
+                        logger.info(f"Stored {stored_count} records for {region}")
                 
-            except sqlite3.Error as e:
-                logger.error(f"Error storing entry: {e}")
-                continue
+                except (sqlite3.Error, ValueError) as e:
+                    logger.error(f"Error storing entry: {e}")
+                    count('eia.store_errors', region=region)
+                    continue
             
-        db_conn.conn.commit()
+            db_conn.conn.commit()
+        count('eia.records_stored', stored_count, region=region)
+        if missing_count:
+            count('eia.missing_values', missing_count, region=region)
+            logger.warning(f"Skipped {missing_count} records without a value for {region}")
         logger.info(f"Successfully stored {stored_count} records for {region}")
         
         # After storing raw data, calculate and store statistics
@@ -231,6 +250,7 @@ def store_data(db_conn, data: list, region: str) -> bool:
         logger.error(f"Error storing data: {e}")
         return False
 
+@timed('eia.statistics')
 def calculate_statistics(db_conn, region: str):
     """Calculate and store daily and regional statistics"""
     try:
@@ -310,18 +330,21 @@ def main():
     logger.info(f"Fetching data from {start_date_str} to {end_date_str}")
 
     try:
-        with DatabaseConnection("energy_production.db") as db:
+        with profiled('eia_backfill'), DatabaseConnection("energy_production.db") as db:
             initialize_database(db)
             
             for region in regions:
                 logger.info(f"\nProcessing region: {region}")
-                fetch_and_store_data_for_range(region, start_date_str, end_date_str, db)
+                with span('eia.region', region=region):
+                    fetch_and_store_data_for_range(region, start_date_str, end_date_str, db)
                 
         logger.info("Data collection and analysis complete")
         
     except Exception as e:
         logger.error(f"Application error: {str(e)}")
         return
+    finally:
+        metrics.flush()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,188 @@
+"""Align weather and generation series on one dense UTC hour grid.
+
+Every source is reduced to int64 hours since the epoch, and its values are
+scattered with ``np.bincount`` into a (hours, columns) float array with NaN
+where the source has no observation. Duplicate readings of the same hour
+(for example the repeated hour when local clocks fall back) are averaged.
+Gaps are then filled or left masked per source:
+
+  mask         leave NaN
+  ffill        carry the last observation forward at most ``limit`` hours
+  interpolate  linear interpolation across gaps of at most ``limit`` hours
+  zero         0.0 across gaps of at most ``limit`` hours
+
+``limit=None`` fills gaps of any length. Before filling, ``quality``
+policies (quality.py) flag and repair flatlines, negative readings and
+outliers in each column; readings they mask count as gaps. Rows still
+containing NaN are invalid, and ``window_validity`` marks every sliding window that would
+include one, so no training window silently spans an outage.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from features import NS_PER_HOUR
+from quality import check_column, report_frame
+
+GAP_POLICIES = ('mask', 'ffill', 'interpolate', 'zero')
+
+AlignedData = namedtuple('AlignedData', ['epoch_ns', 'columns', 'valid', 'observed', 'quality'],
+                         defaults=[None])
+
+
+def to_hours(values, timezone='UTC'):
+    """(hours since the epoch, parsed mask) for datetimes given in ``timezone``.
+
+    Naive timestamps are taken as local time in ``timezone``: nonexistent
+    spring-forward hours are dropped and ambiguous fall-back hours are
+    inferred from order where possible, dropped otherwise.
+    """
+    index = pd.DatetimeIndex(pd.to_datetime(values))
+    if index.tz is None and timezone not in (None, 'UTC'):
+        try:
+            index = index.tz_localize(timezone, ambiguous='infer', nonexistent='NaT')
+        except Exception:
+            # pytz.AmbiguousTimeError: the repeated hour cannot be told apart by order
+            index = index.tz_localize(timezone, ambiguous='NaT', nonexistent='NaT')
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+
+    parsed = ~index.isna()
+    hours = np.zeros(len(index), dtype=np.int64)
+    hours[parsed] = np.floor_divide(index[parsed].as_unit('ns').asi8, NS_PER_HOUR)
+    return hours, parsed
+
+
+class HourGrid:
+    """Half-open range of UTC hours [start, stop)"""
+
+    def __init__(self, start, stop):
+        self.start = int(start)
+        self.stop = max(int(stop), int(start))
+
+    @classmethod
+    def overlapping(cls, *hour_arrays):
+        """Grid covering the hours every source has data for"""
+        return cls(max(h.min() for h in hour_arrays), min(h.max() for h in hour_arrays) + 1)
+
+    def __len__(self):
+        return self.stop - self.start
+
+    @property
+    def epoch_ns(self):
+        return np.arange(self.start, self.stop, dtype=np.int64) * NS_PER_HOUR
+
+    def scatter(self, hours, values):
+        """Mean of ``values`` per grid hour as (len(grid), columns) float64, NaN where unobserved"""
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1:
+            values = values[:, None]
+        position = np.asarray(hours, dtype=np.int64) - self.start
+        inside = (position >= 0) & (position < len(self))
+        position, values = position[inside], values[inside]
+
+        out = np.empty((len(self), values.shape[1]), dtype=np.float64)
+        for j in range(values.shape[1]):
+            finite = np.isfinite(values[:, j])
+            counts = np.bincount(position[finite], minlength=len(self))
+            sums = np.bincount(position[finite], weights=values[finite, j], minlength=len(self))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                out[:, j] = np.where(counts > 0, sums / counts, np.nan)
+        return out
+
+
+def _neighbours(valid):
+    """Index of the previous and next valid row for every cell (-1 / n when there is none)"""
+    n = len(valid)
+    rows = np.arange(n)[:, None]
+    previous = np.maximum.accumulate(np.where(valid, rows, -1), axis=0)
+    following = np.minimum.accumulate(np.where(valid, rows, n)[::-1], axis=0)[::-1]
+    return previous, following
+
+
+def fill_gaps(values, policy='mask', limit=None):
+    """Fill NaN runs in each column of ``values`` according to ``policy``"""
+    if policy not in GAP_POLICIES:
+        raise ValueError(f"Unknown gap policy {policy!r}; use one of {GAP_POLICIES}")
+    values = np.array(values, dtype=np.float64, copy=True)
+    missing = np.isnan(values)
+    if policy == 'mask' or not missing.any():
+        return values
+
+    n = len(values)
+    limit = n if limit is None else limit
+    rows = np.arange(n)[:, None]
+    columns = np.broadcast_to(np.arange(values.shape[1]), values.shape)
+    previous, following = _neighbours(~missing)
+
+    if policy == 'ffill':
+        fill = missing & (previous >= 0) & (rows - previous <= limit)
+        values[fill] = values[previous[fill], columns[fill]]
+        return values
+
+    # Whole gaps only: a gap longer than the limit is left entirely masked
+    fill = missing & (following - previous - 1 <= limit)
+    if policy == 'zero':
+        values[fill] = 0.0
+        return values
+
+    fill &= (previous >= 0) & (following < n)
+    before = values[previous[fill], columns[fill]]
+    after = values[following[fill], columns[fill]]
+    weight = (rows - previous)[fill] / (following - previous)[fill]
+    values[fill] = before + weight * (after - before)
+    return values
+
+
+def window_validity(valid, sequence_length):
+    """For each window start i: rows i .. i + sequence_length (the target row) are all valid"""
+    valid = np.asarray(valid, dtype=bool)
+    count = max(len(valid) - sequence_length, 0)
+    invalid_before = np.concatenate([[0], np.cumsum(~valid)])
+    starts = np.arange(count)
+    return invalid_before[starts + sequence_length + 1] - invalid_before[starts] == 0
+
+
+def align_sources(sources, policies=None, grid=None, quality=None):
+    """Put every source on one hour grid.
+
+    ``sources`` maps a name to ``(timestamps, {column: values}, timezone)``;
+    ``policies`` maps a source name to ``(policy, limit)`` (default: mask)
+    and ``quality`` a source name to its quality.QUALITY_POLICIES entry
+    (default: no checks). Returns AlignedData with the grid's epoch
+    nanoseconds, every column, the rows where all columns are present after
+    filling, the rows where every column was actually observed, and the
+    quality report (None without ``quality``).
+    """
+    policies = policies or {}
+    quality = quality or {}
+    report = []
+    hours = {}
+    for name, (timestamps, _, timezone) in sources.items():
+        source_hours, parsed = to_hours(timestamps, timezone)
+        hours[name] = (source_hours, parsed)
+    if grid is None:
+        grid = HourGrid.overlapping(*(h[parsed] for h, parsed in hours.values()))
+
+    columns, valid, observed = {}, np.ones(len(grid), dtype=bool), np.ones(len(grid), dtype=bool)
+    for name, (_, data, _) in sources.items():
+        source_hours, parsed = hours[name]
+        names = list(data)
+        stacked = np.column_stack([np.asarray(data[c], dtype=np.float64)[parsed] for c in names])
+        scattered = grid.scatter(source_hours[parsed], stacked)
+        if name in quality:
+            in_grid = source_hours[parsed]
+            in_grid = in_grid[(in_grid >= grid.start) & (in_grid < grid.stop)]
+            for j, column in enumerate(names):
+                scattered[:, j], counts = check_column(scattered[:, j], quality[name], in_grid)
+                report.append({'source': name, 'column': column, **counts})
+        observed &= ~np.isnan(scattered).any(axis=1)
+
+        policy, limit = policies.get(name, ('mask', None))
+        filled = fill_gaps(scattered, policy, limit)
+        valid &= ~np.isnan(filled).any(axis=1)
+        for j, column in enumerate(names):
+            columns[column] = filled[:, j]
+
+    return AlignedData(grid.epoch_ns, columns, valid, observed, report_frame(report) if quality else None)
@@ -1,37 +1,174 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import os
 import sqlite3
-import pickle  # Replace joblib with pickle
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from meteostat import Point, Hourly, Daily
 import pytz
 
+from features import NS_PER_HOUR, build_feature_frame, to_epoch_ns
+from forecasters import (HORIZONS, MODEL_DIR, TARGETS, XGBoostForecaster, forecast_frame, load_booster,
+                         model_path)
+from instrumentation import count, metrics, profiled, timed
+from prediction_cache import PredictionCache, prediction_key
+from regions import DEFAULT_REGION, REGIONS
+from registry import ModelRegistry, file_digest
+from scenarios import SCENARIOS, bands_frame, run_ensemble
+
+# Date-range mode: the range is split into fixed-size windows that are fetched
+# in parallel, cached individually and sent to the model a few at a time
+RANGE_WINDOW_DAYS = 7
+RANGE_MAX_WORKERS = 4
+RANGE_BATCH_WINDOWS = 2
+
+WEATHER_COLUMNS = {
+    'temp': 'temperature',
+    'dwpt': 'dwpt',
+    'rhum': 'humidity',
+    'prcp': 'precipitation',
+    'wdir': 'wdir',
+    'wspd': 'windspeed',
+    'pres': 'pres',
+    'coco': 'cloudcover'
+}
+
+# Directory of XGBoost boosters to serve instead of the hierarchical RNN; 'quantile' is
+# shorthand for MODEL_DIR/quantile (quantiles.py output), whose P10-P90 bands are plotted
+DASHBOARD_MODELS_ENV = 'ENERGY_DASHBOARD_MODELS'
+
+# P10-P90 fill per target when the forecaster produces quantiles
+BAND_FILLS = {
+    'solar': 'rgba(255,165,0,0.25)',
+    'wind': 'rgba(0,180,216,0.25)',
+    'demand': 'rgba(255,75,75,0.25)'
+}
+
+ACTUALS_QUERIES = {
+    'solar': "SELECT datetime, value FROM SUN_data_NE WHERE datetime >= ? AND datetime < ?",
+    'wind': "SELECT datetime, value FROM WND_data_NE WHERE datetime >= ? AND datetime < ?",
+    'demand': "SELECT datetime, Demand as value FROM demand_data_NE WHERE datetime >= ? AND datetime < ?"
+}
+
+
+@st.cache_resource
+def get_prediction_cache():
+    """Prediction cache shared by every session of this server process"""
+    return PredictionCache()
+
+
+@st.cache_resource
+def get_model_registry():
+    """Model registry shared by every session; registering a new version invalidates cached predictions"""
+    registry = ModelRegistry()
+    registry.subscribe(get_prediction_cache().on_model_registered)
+    return registry
+
+
+@st.cache_data(show_spinner=False)
+@timed('dashboard.fetch_weather')
+def fetch_weather_window(latitude, longitude, start, end):
+    """Fetch hourly Meteostat data for the half-open window [start, end)"""
+    data = Hourly(Point(latitude, longitude), start, end - timedelta(hours=1)).fetch()
+    data = data.rename(columns=WEATHER_COLUMNS)
+    data = data.reset_index()
+    return data.rename(columns={'time': 'datetime'})
+
+
+@st.cache_data(show_spinner=False)
+@timed('dashboard.fetch_actuals')
+def fetch_actuals_window(database_path, start, end):
+    """Load historical solar, wind and demand for the half-open window [start, end)"""
+    if database_path is None:
+        return None
+    bounds = (start.strftime('%Y-%m-%d %H:%M:%S'), end.strftime('%Y-%m-%d %H:%M:%S'))
+    try:
+        conn = sqlite3.connect(f"file:{database_path}?mode=ro", uri=True)
+    except sqlite3.Error:
+        return None
+
+    try:
+        actuals = None
+        for target, query in ACTUALS_QUERIES.items():
+            frame = pd.read_sql_query(query, conn, params=bounds)
+            frame['datetime'] = pd.to_datetime(frame['datetime'])
+            frame = frame.rename(columns={'value': target})
+            actuals = frame if actuals is None else pd.merge(actuals, frame, on='datetime', how='outer')
+        return actuals.sort_values('datetime').reset_index(drop=True)
+    except (sqlite3.Error, pd.errors.DatabaseError):
+        return None
+    finally:
+        conn.close()
+
+
+def add_quantile_band(fig, predictions, column, name, fill, row):
+    """Shade the P10-P90 band of ``column`` if the forecast has quantile columns"""
+    lower, upper = f'{column}_p10', f'{column}_p90'
+    if lower not in predictions or upper not in predictions:
+        return
+    fig.add_trace(
+        go.Scatter(x=predictions['datetime'], y=predictions[upper], line=dict(width=0),
+                   showlegend=False, hoverinfo='skip'),
+        row=row, col=1
+    )
+    fig.add_trace(
+        go.Scatter(x=predictions['datetime'], y=predictions[lower], line=dict(width=0),
+                   fill='tonexty', fillcolor=fill, name=f'{name} P10-P90'),
+        row=row, col=1
+    )
+
+
 class EnergyDashboard:
-    def __init__(self):
-        """Initialize dashboard with models and database connection"""
-        self.database_path = "energy_data_NE.db"
-        self.location = Point(42.3601, -71.0589)  # Boston coordinates for NE
-        self.default_timezone = 'America/New_York'  # Default timezone for NE
+    def __init__(self, region=DEFAULT_REGION):
+        """Initialize dashboard with models and database connection for one of regions.REGIONS"""
+        self.region = region
+        spec = REGIONS[region]
+        self.database_path = spec['database']  # None when the region has no historical actuals
+        self.coordinates = spec['coordinates']
+        self.location = Point(*self.coordinates)
+        self.default_timezone = spec['timezone']
+        self.registry = get_model_registry()
+        self.prediction_cache = get_prediction_cache()
         self.load_models()
 
     def load_models(self):
-        """Load the pre-trained hierarchical RNN model"""
-        try:
-            self.model = HierarchicalEnergyForecaster(input_size=12)
-            self.model.load_state_dict(torch.load('hierarchical_rnn_model.pkl'))
-            self.model.eval()
-            st.success("✅ Model loaded successfully")
-        except Exception as e:
-            st.error(f"Error loading model: {str(e)}")
+        """Load the forecaster once per server process.
+
+        The hierarchical RNN by default; with ENERGY_DASHBOARD_MODELS set, the
+        XGBoost boosters in that directory ('quantile' for MODEL_DIR/quantile).
+        """
+        if self.registry.get('forecaster') is None:
+            model_dir = os.environ.get(DASHBOARD_MODELS_ENV)
+            try:
+                if model_dir:
+                    if model_dir == 'quantile':
+                        model_dir = os.path.join(MODEL_DIR, 'quantile')
+                    # Not loaded through the registry: these may be quantile boosters, which must not
+                    # replace the point boosters other views share under xgboost/<target>
+                    model = XGBoostForecaster(model_dir)
+                    version = '-'.join(file_digest(model_path(model_dir, target)) for target in TARGETS)
+                    self.registry.register('forecaster', model, version=version)
+                    bands = f" with {', '.join(sorted(model.quantiles))} quantile bands" if model.quantiles else ""
+                    st.success(f"✅ XGBoost models loaded from {model_dir}{bands}")
+                else:
+                    model = HierarchicalEnergyForecaster(input_size=12)
+                    model.load_state_dict(torch.load('hierarchical_rnn_model.pkl'))
+                    model.eval()
+                    self.registry.register('forecaster', model, version=file_digest('hierarchical_rnn_model.pkl'))
+                    st.success("✅ Model loaded successfully")
+            except Exception as e:
+                st.error(f"Error loading model: {str(e)}")
+
+        self.model = self.registry.get('forecaster')
+        self.model_version = self.registry.version('forecaster')
 
     @staticmethod
     def load_model(filepath):
-        """Load a model from a pickle file"""
-        with open(filepath, 'rb') as file:
-            return pickle.load(file)
+        """Load an XGBoost model from its native UBJSON / JSON file or a pickle"""
+        return load_booster(filepath)
 
     def get_available_dates(self):
         """Get range of available dates in the database"""
@@ -47,42 +184,21 @@ class EnergyDashboard:
         print(f"{max_date}")
         return min_date, max_date
 
+    @timed('dashboard.prepare_features')
     def prepare_features(self, weather_data):
         """Prepare features for prediction"""
-        features = weather_data[['temperature', 'dwpt', 'humidity', 'precipitation',
-                               'wdir', 'windspeed', 'pres', 'cloudcover']]
-
-        weather_data['hour'] = weather_data['datetime'].dt.hour
-        weather_data['month'] = weather_data['datetime'].dt.month
-        weather_data['season'] = np.where(weather_data['datetime'].dt.month.isin([12, 1, 2]), 1,
-                                np.where(weather_data['datetime'].dt.month.isin([3, 4, 5]), 2,
-                                np.where(weather_data['datetime'].dt.month.isin([6, 7, 8]), 3, 4)))
-        weather_data['time_of_day'] = np.where(weather_data['datetime'].dt.hour < 6, 1,
-                                      np.where(weather_data['datetime'].dt.hour < 12, 2,
-                                      np.where(weather_data['datetime'].dt.hour < 18, 3, 4)))
-
-        return pd.concat([features,
-                         weather_data[['hour', 'month', 'season', 'time_of_day']]], axis=1)
-
-    def get_meteostat_data(self, start_date):
+        return build_feature_frame(weather_data, feature_set='default')
+
+    def get_meteostat_data(self, start_date, end_date=None):
         """Get weather data from Meteostat"""
         try:
             start = pd.to_datetime(start_date)
-            end = start + timedelta(days=1)
+            end = pd.to_datetime(end_date) if end_date is not None else start + timedelta(days=1)
 
             data = Hourly(self.location, start, end)
             data = data.fetch()
 
-            data = data.rename(columns={
-                'temp': 'temperature',
-                'dwpt': 'dwpt',
-                'rhum': 'humidity',
-                'prcp': 'precipitation',
-                'wdir': 'wdir',
-                'wspd': 'windspeed',
-                'pres': 'pres',
-                'coco': 'cloudcover'
-            })
+            data = data.rename(columns=WEATHER_COLUMNS)
 
             data = data.reset_index()
             data = data.rename(columns={'time': 'datetime'})
@@ -93,132 +209,437 @@ class EnergyDashboard:
             st.error(f"Error fetching Meteostat data: {str(e)}")
             return None
 
-def get_predictions(self, start_date):
-    """Get predictions using hierarchical RNN model"""
-    pred_data = self.get_meteostat_data(start_date)
+    @staticmethod
+    def split_range(start_date, end_date, window_days=RANGE_WINDOW_DAYS):
+        """Split [start_date, end_date) into consecutive fixed-size windows"""
+        start = pd.to_datetime(start_date).to_pydatetime()
+        end = pd.to_datetime(end_date).to_pydatetime()
+        step = timedelta(days=window_days)
+
+        windows = []
+        while start < end:
+            windows.append((start, min(start + step, end)))
+            start += step
+        return windows
+
+    def load_window(self, start, end):
+        """Load weather and historical actuals for one window (runs in a worker thread)"""
+        weather = fetch_weather_window(*self.coordinates, start, end)
+        actuals = fetch_actuals_window(self.database_path, start, end)
+        return weather, actuals
+
+    def get_predictions(self, start_date):
+        """Get predictions using hierarchical RNN model.
+
+        Results are memoized in the shared prediction cache, so reruns caused
+        by display-only widgets (timezone, overlay, raw data, tabs) do not run
+        inference again.
+        """
+        start = pd.to_datetime(start_date).to_pydatetime()
+        try:
+            pred_data = fetch_weather_window(*self.coordinates, start, start + timedelta(days=1))
+        except Exception as e:
+            st.error(f"Error fetching Meteostat data: {str(e)}")
+            return None
 
-    if pred_data is None or pred_data.empty:
-        return None
+        if pred_data is None or pred_data.empty:
+            return None
 
-    pred_data['datetime'] = pd.to_datetime(pred_data['datetime'])
-    
-    # Get predictions
-    predictions = self.model.predict(pred_data)
-    
-    # Create DataFrame with predictions
-    results = pd.DataFrame({
-        'datetime': pred_data['datetime'],
-        'solar_24h': predictions['solar']['24'],
-        'solar_1w': predictions['solar']['168'],
-        'solar_30d': predictions['solar']['720'],
-        'wind_24h': predictions['wind']['24'],
-        'wind_1w': predictions['wind']['168'],
-        'wind_30d': predictions['wind']['720'],
-        'demand_24h': predictions['demand']['24'],
-        'demand_1w': predictions['demand']['168'],
-        'demand_30d': predictions['demand']['720']
-    })
-    
-    return results
-
-def create_plots(self, predictions, overlay=False, timezone='UTC', horizon='24h'):
-    """Enhanced plots with multiple time horizons"""
-    predictions = predictions.copy()
-    predictions['datetime'] = predictions['datetime'].dt.tz_localize('UTC').dt.tz_convert(timezone)
-    
-    # Select columns for the chosen horizon
-    solar_col = f'solar_{horizon}'
-    wind_col = f'wind_{horizon}'
-    demand_col = f'demand_{horizon}'
-    
-    if not overlay:
-        fig = make_subplots(
-            rows=4, cols=1,
-            subplot_titles=(
-                f'Energy Generation Forecast - {horizon} ({timezone})',
-                'Demand Forecast',
-                'Generation Mix',
-                'Forecast Comparison'
-            ),
-            vertical_spacing=0.1,
-            row_heights=[0.3, 0.2, 0.2, 0.3]
-        )
-        
-        # Generation predictions
-        for source, col in [('Solar', solar_col), ('Wind', wind_col)]:
-            color = 'orange' if source == 'Solar' else '#00B4D8'
+        key = self.prediction_key(start, pred_data)
+        results = self.prediction_cache.get(key)
+        count('dashboard.prediction_cache', result='miss' if results is None else 'hit')
+        if results is None:
+            results = self.predict_frame(pred_data)
+            self.prediction_cache.put(key, results)
+        return results
+
+    def prediction_key(self, start, weather):
+        """Cache key for a forecast: location, start, horizons, model version and weather"""
+        return prediction_key(self.coordinates, start, HORIZONS, self.model_version, weather)
+
+    def lookback_weather(self, weather):
+        """The ``lookback_hours`` of weather before each run of consecutive hours in ``weather``, or None"""
+        hours = getattr(self.model, 'lookback_hours', 0)
+        if not hours:
+            return None
+        epoch_ns = np.unique(to_epoch_ns(weather['datetime']))
+        starts = epoch_ns[np.concatenate([[True], np.diff(epoch_ns) != NS_PER_HOUR])]
+
+        frames = []
+        for start in pd.to_datetime(starts):
+            start = start.to_pydatetime()
+            history = fetch_weather_window(*self.coordinates, start - timedelta(hours=hours), start)
+            if history is not None and not history.empty:
+                frames.append(history)
+        return pd.concat(frames, ignore_index=True) if frames else None
+
+    @timed('dashboard.inference')
+    def predict_frame(self, pred_data):
+        """Run the model over a weather frame and label the horizon outputs"""
+        pred_data['datetime'] = pd.to_datetime(pred_data['datetime'])
+        return forecast_frame(self.model, pred_data, history=self.lookback_weather(pred_data))
+
+    def predict_windows(self, weather_windows):
+        """Predict several windows with a single model call and split the results back"""
+        batch = pd.concat(weather_windows, ignore_index=True)
+        results = self.predict_frame(batch)
+
+        bounds = np.cumsum([0] + [len(window) for window in weather_windows])
+        return [results.iloc[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+    def get_range_predictions(self, start_date, end_date, window_days=RANGE_WINDOW_DAYS,
+                              on_progress=None):
+        """Get predictions and historical actuals over an arbitrary date range.
+
+        Windows are fetched in parallel and handed to the model in batches of
+        RANGE_BATCH_WINDOWS as they finish. ``on_progress(predictions, actuals,
+        done, total)`` is called on the calling thread after every batch so the
+        caller can render partial results.
+        """
+        windows = self.split_range(start_date, end_date, window_days)
+        predicted, observed, pending = [], [], []
+        done = 0
+
+        def flush():
+            if pending:
+                keys, frames = zip(*pending)
+                for key, results in zip(keys, self.predict_windows(list(frames))):
+                    self.prediction_cache.put(key, results)
+                    predicted.append(results)
+                pending.clear()
+            if on_progress is not None and predicted:
+                on_progress(self.combine(predicted), self.combine(observed), done, len(windows))
+
+        with ThreadPoolExecutor(max_workers=RANGE_MAX_WORKERS) as pool:
+            futures = {pool.submit(self.load_window, start, end): start for start, end in windows}
+
+            for future in as_completed(futures):
+                done += 1
+                try:
+                    weather, actuals = future.result()
+                except Exception as e:
+                    st.warning(f"Skipping window: {str(e)}")
+                    continue
+
+                if actuals is not None and not actuals.empty:
+                    observed.append(actuals)
+                if weather is not None and not weather.empty:
+                    key = self.prediction_key(futures[future], weather)
+                    cached = self.prediction_cache.get(key)
+                    if cached is not None:
+                        predicted.append(cached)
+                    else:
+                        pending.append((key, weather))
+                if len(pending) >= RANGE_BATCH_WINDOWS:
+                    flush()
+
+        flush()
+        if not predicted:
+            return None, None
+        return self.combine(predicted), self.combine(observed)
+
+    @staticmethod
+    def combine(frames):
+        """Concatenate per-window frames in time order"""
+        if not frames:
+            return None
+        return pd.concat(frames, ignore_index=True).sort_values('datetime').reset_index(drop=True)
+
+    @timed('dashboard.create_plots')
+    def create_plots(self, predictions, overlay=False, timezone='UTC', horizon='24h'):
+        """Enhanced plots with multiple time horizons"""
+        predictions = predictions.copy()
+        predictions['datetime'] = predictions['datetime'].dt.tz_localize('UTC').dt.tz_convert(timezone)
+
+        # Select columns for the chosen horizon
+        solar_col = f'solar_{horizon}'
+        wind_col = f'wind_{horizon}'
+        demand_col = f'demand_{horizon}'
+
+        if not overlay:
+            fig = make_subplots(
+                rows=4, cols=1,
+                subplot_titles=(
+                    f'Energy Generation Forecast - {horizon} ({timezone})',
+                    'Demand Forecast',
+                    'Generation Mix',
+                    'Forecast Comparison'
+                ),
+                vertical_spacing=0.1,
+                row_heights=[0.3, 0.2, 0.2, 0.3]
+            )
+
+            # Generation predictions
+            for source, col in [('Solar', solar_col), ('Wind', wind_col)]:
+                color = 'orange' if source == 'Solar' else '#00B4D8'
+                add_quantile_band(fig, predictions, col, source, BAND_FILLS[source.lower()], row=1)
+                fig.add_trace(
+                    go.Scatter(
+                        x=predictions['datetime'],
+                        y=predictions[col],
+                        name=f'{source} ({horizon})',
+                        mode='lines+markers',
+                        line=dict(color=color, width=2),
+                        marker=dict(size=6)
+                    ),
+                    row=1, col=1
+                )
+
+            # Demand prediction
+            add_quantile_band(fig, predictions, demand_col, 'Demand', BAND_FILLS['demand'], row=2)
             fig.add_trace(
                 go.Scatter(
                     x=predictions['datetime'],
-                    y=predictions[col],
-                    name=f'{source} ({horizon})',
-                    mode='lines+markers',
-                    line=dict(color=color, width=2),
-                    marker=dict(size=6)
+                    y=predictions[demand_col],
+                    name=f'Demand ({horizon})',
+                    line=dict(color='#FF4B4B', width=2)
                 ),
-                row=1, col=1
+                row=2, col=1
+            )
+
+            # Generation mix
+            total_gen = predictions[solar_col] + predictions[wind_col]
+            fig.add_trace(
+                go.Bar(
+                    x=predictions['datetime'],
+                    y=(predictions[solar_col]/total_gen*100),
+                    name='Solar %',
+                    marker_color='#FFA62B'
+                ),
+                row=3, col=1
+            )
+            fig.add_trace(
+                go.Bar(
+                    x=predictions['datetime'],
+                    y=(predictions[wind_col]/total_gen*100),
+                    name='Wind %',
+                    marker_color='#00B4D8'
+                ),
+                row=3, col=1
+            )
+
+            # Forecast comparison across horizons
+            for h in ['24h', '1w', '30d']:
+                fig.add_trace(
+                    go.Scatter(
+                        x=predictions['datetime'],
+                        y=predictions[f'solar_{h}'],
+                        name=f'Solar ({h})',
+                        line=dict(dash='dot' if h != horizon else 'solid')
+                    ),
+                    row=4, col=1
+                )
+
+        # Update layout
+        fig.update_layout(
+            height=1200,
+            showlegend=True,
+            barmode='stack',
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='white'),
+            title=dict(
+                text=f"Hierarchical Energy Forecast ({timezone})",
+                font=dict(size=24, color='white'),
+                x=0.5
             )
-        
-        # Demand prediction
-        fig.add_trace(
-            go.Scatter(
-                x=predictions['datetime'],
-                y=predictions[demand_col],
-                name=f'Demand ({horizon})',
-                line=dict(color='#FF4B4B', width=2)
-            ),
-            row=2, col=1
-        )
-        
-        # Generation mix
-        total_gen = predictions[solar_col] + predictions[wind_col]
-        fig.add_trace(
-            go.Bar(
-                x=predictions['datetime'],
-                y=(predictions[solar_col]/total_gen*100),
-                name='Solar %',
-                marker_color='#FFA62B'
-            ),
-            row=3, col=1
         )
-        fig.add_trace(
-            go.Bar(
-                x=predictions['datetime'],
-                y=(predictions[wind_col]/total_gen*100),
-                name='Wind %',
-                marker_color='#00B4D8'
-            ),
-            row=3, col=1
+
+        return fig
+
+    @timed('dashboard.create_range_plot')
+    def create_range_plot(self, predictions, actuals=None, timezone='UTC', horizon='24h'):
+        """Forecast vs. historical actuals for each target over a date range"""
+        predictions = predictions.copy()
+        predictions['datetime'] = predictions['datetime'].dt.tz_localize('UTC').dt.tz_convert(timezone)
+        if actuals is not None:
+            actuals = actuals.copy()
+            actuals['datetime'] = actuals['datetime'].dt.tz_localize('UTC').dt.tz_convert(timezone)
+
+        targets = [('solar', 'Solar', 'orange'), ('wind', 'Wind', '#00B4D8'), ('demand', 'Demand', '#FF4B4B')]
+        fig = make_subplots(
+            rows=3, cols=1,
+            subplot_titles=[f'{label} - {horizon} forecast vs actual' for _, label, _ in targets],
+            vertical_spacing=0.08,
+            shared_xaxes=True
         )
-        
-        # Forecast comparison across horizons
-        for h in ['24h', '1w', '30d']:
+
+        for row, (target, label, color) in enumerate(targets, start=1):
+            add_quantile_band(fig, predictions, f'{target}_{horizon}', label, BAND_FILLS[target], row=row)
             fig.add_trace(
                 go.Scatter(
                     x=predictions['datetime'],
-                    y=predictions[f'solar_{h}'],
-                    name=f'Solar ({h})',
-                    line=dict(dash='dot' if h != horizon else 'solid')
+                    y=predictions[f'{target}_{horizon}'],
+                    name=f'{label} forecast',
+                    line=dict(color=color, width=2)
                 ),
-                row=4, col=1
+                row=row, col=1
+            )
+            if actuals is not None and target in actuals:
+                fig.add_trace(
+                    go.Scatter(
+                        x=actuals['datetime'],
+                        y=actuals[target],
+                        name=f'{label} actual',
+                        line=dict(color='white', width=1, dash='dot')
+                    ),
+                    row=row, col=1
+                )
+
+        fig.update_layout(
+            height=900,
+            showlegend=True,
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='white'),
+            title=dict(
+                text=f"Range Forecast vs Actuals ({timezone})",
+                font=dict(size=24, color='white'),
+                x=0.5
+            )
+        )
+
+        return fig
+
+    @staticmethod
+    def forecast_skill(predictions, actuals, horizon='24h'):
+        """MAE and RMSE of the forecast against actuals, per target"""
+        merged = pd.merge(predictions, actuals, on='datetime', how='inner')
+        rows = []
+        for target in ['solar', 'wind', 'demand']:
+            if target not in merged:
+                continue
+            error = (merged[f'{target}_{horizon}'] - merged[target]).dropna()
+            if error.empty:
+                continue
+            rows.append({
+                'target': target,
+                'hours': len(error),
+                'MAE': error.abs().mean(),
+                'RMSE': np.sqrt((error ** 2).mean())
+            })
+        return pd.DataFrame(rows)
+
+    def scenario_model(self):
+        """A model with ``predict_features`` for the ensemble runs.
+
+        The hierarchical RNN has none, so the XGBoost boosters (forecasters.MODEL_DIR)
+        are loaded through the shared registry instead; None when they are missing.
+        """
+        if hasattr(self.model, 'predict_features'):
+            return self.model
+        try:
+            return XGBoostForecaster(registry=self.registry)
+        except Exception as e:
+            st.error(f"Error loading the XGBoost models for scenarios: {str(e)}")
+            return None
+
+    def get_scenario_bands(self, start_date, perturbations, members=100):
+        """Percentile bands of a perturbed-weather ensemble for the selected day"""
+        model = self.scenario_model()
+        if model is None:
+            return None
+
+        start = pd.to_datetime(start_date).to_pydatetime()
+        weather = fetch_weather_window(*self.coordinates, start, start + timedelta(days=1))
+        if weather is None or weather.empty:
+            return None
+
+        features = self.prepare_features(weather).to_numpy()
+        bands = run_ensemble(model.predict_features, features, perturbations, members=members,
+                             feature_set='default')
+        return bands_frame(weather['datetime'], bands)
+
+    @timed('dashboard.create_scenario_plot')
+    def create_scenario_plot(self, bands, timezone='UTC'):
+        """P10-P90 bands, median and unperturbed forecast for each target"""
+        bands = bands.copy()
+        bands['datetime'] = bands['datetime'].dt.tz_localize('UTC').dt.tz_convert(timezone)
+
+        targets = [('solar', 'Solar', 'orange', 'rgba(255,165,0,0.25)'),
+                   ('wind', 'Wind', '#00B4D8', 'rgba(0,180,216,0.25)'),
+                   ('demand', 'Demand', '#FF4B4B', 'rgba(255,75,75,0.25)')]
+        fig = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.08,
+                            subplot_titles=[f'{label} scenario range' for _, label, _, _ in targets])
+
+        for row, (target, label, color, fill) in enumerate(targets, start=1):
+            fig.add_trace(
+                go.Scatter(x=bands['datetime'], y=bands[f'{target}_p90'], line=dict(width=0),
+                           showlegend=False, hoverinfo='skip'),
+                row=row, col=1
+            )
+            fig.add_trace(
+                go.Scatter(x=bands['datetime'], y=bands[f'{target}_p10'], line=dict(width=0),
+                           fill='tonexty', fillcolor=fill, name=f'{label} P10-P90'),
+                row=row, col=1
+            )
+            fig.add_trace(
+                go.Scatter(x=bands['datetime'], y=bands[f'{target}_p50'], name=f'{label} median',
+                           line=dict(color=color, width=2)),
+                row=row, col=1
+            )
+            fig.add_trace(
+                go.Scatter(x=bands['datetime'], y=bands[f'{target}_baseline'], name=f'{label} baseline',
+                           line=dict(color='white', width=1, dash='dot')),
+                row=row, col=1
+            )
+
+        fig.update_layout(
+            height=900,
+            showlegend=True,
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='white'),
+            title=dict(
+                text=f"Weather Scenario Ensemble ({timezone})",
+                font=dict(size=24, color='white'),
+                x=0.5
             )
-    
-    # Update layout
-    fig.update_layout(
-        height=1200,
-        showlegend=True,
-        barmode='stack',
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        font=dict(color='white'),
-        title=dict(
-            text=f"Hierarchical Energy Forecast ({timezone})",
-            font=dict(size=24, color='white'),
-            x=0.5
         )
+
+        return fig
+
+
+def render_range_mode(dashboard, timezone, min_date, extended_max_date):
+    """Date-range mode: load the range window by window and render as batches finish"""
+    default_start = max(min_date.date(), (datetime.now() - timedelta(days=7)).date())
+    date_range = st.sidebar.date_input(
+        "Select forecast range",
+        value=(default_start, datetime.now().date()),
+        min_value=min_date.date(),
+        max_value=extended_max_date.date()
     )
-    
-    return fig
+    if not isinstance(date_range, (list, tuple)) or len(date_range) != 2:
+        st.info("Select both a start and an end date")
+        return
+
+    window_days = st.sidebar.slider("Window size (days)", min_value=1, max_value=31,
+                                    value=RANGE_WINDOW_DAYS)
+    start = datetime.combine(date_range[0], datetime.min.time())
+    end = datetime.combine(date_range[1], datetime.min.time()) + timedelta(days=1)
+
+    progress = st.progress(0.0)
+    chart = st.empty()
+
+    def on_progress(predictions, actuals, done, total):
+        progress.progress(done / total, text=f"Loaded {done}/{total} windows")
+        chart.plotly_chart(dashboard.create_range_plot(predictions, actuals, timezone=timezone),
+                           use_container_width=True)
+
+    predictions, actuals = dashboard.get_range_predictions(start, end, window_days=window_days,
+                                                           on_progress=on_progress)
+    progress.empty()
+
+    if predictions is None or predictions.empty:
+        st.error(f"""
+            No data available between {start.strftime('%Y-%m-%d')} and {end.strftime('%Y-%m-%d')}.
+            Try a different range or check Meteostat service status.
+        """)
+        return
+
+    if actuals is not None and not actuals.empty:
+        st.subheader("Forecast skill")
+        st.dataframe(dashboard.forecast_skill(predictions, actuals))
 
 
 def main():
@@ -226,8 +647,18 @@ def main():
 
     st.title("⚡ Energy Generation Forecast Dashboard")
 
+    # Sidebar
+    st.sidebar.header("Forecast Settings")
+
+    region = st.sidebar.selectbox(
+        'Region',
+        options=list(REGIONS),
+        index=list(REGIONS).index(DEFAULT_REGION),
+        format_func=lambda key: REGIONS[key]['name']
+    )
+
     # Initialize dashboard
-    dashboard = EnergyDashboard()
+    dashboard = EnergyDashboard(region)
 
     # Get available date range (from your database for historical validation)
     min_date, max_date = dashboard.get_available_dates()
@@ -235,12 +666,9 @@ def main():
     # Extend max_date to allow for future predictions
     extended_max_date = datetime.now() + timedelta(days=7)
 
-    # Sidebar
-    st.sidebar.header("Forecast Settings")
-
     # Timezone selection
     timezone_options = {
-        'NE (Eastern Time)': 'America/New_York',
+        f'{region} ({dashboard.default_timezone})': dashboard.default_timezone,
         'UTC': 'UTC'
     }
     selected_timezone = st.sidebar.selectbox(
@@ -250,6 +678,8 @@ def main():
     )
     timezone = timezone_options[selected_timezone]
 
+    mode = st.sidebar.radio("Forecast mode", ["Single day", "Date range"], index=0)
+
     # Show available date range
     st.sidebar.info(f"""
         Data range:
@@ -259,6 +689,10 @@ def main():
         Note: Future predictions use Meteostat weather data
     """)
 
+    if mode == "Date range":
+        render_range_mode(dashboard, timezone, min_date, extended_max_date)
+        return
+
     # Date selection with extended range
     selected_date = st.sidebar.date_input(
         "Select forecast date",
@@ -299,7 +733,7 @@ def main():
             return
 
     # Create tabs for different views
-    tab1, tab2, tab3 = st.tabs(["📈 Forecasts", "📊 Statistics", "ℹ️ Info"])
+    tab1, tab2, tab3, tab4 = st.tabs(["📈 Forecasts", "📊 Statistics", "🌦️ What-if", "ℹ️ Info"])
 
     with tab1:
         overlay_plots = st.checkbox("Overlay Generation and Demand", value=False)
@@ -340,6 +774,25 @@ def main():
             )
 
     with tab3:
+        if not hasattr(dashboard.model, 'predict_features'):
+            st.caption("Scenario bands come from the XGBoost forecaster, not the hierarchical RNN "
+                       "shown on the other tabs, which cannot predict from a feature matrix.")
+        scenarios = st.multiselect("Weather perturbations", options=list(SCENARIOS.keys()),
+                                   default=list(SCENARIOS.keys())[:1])
+        members = st.slider("Ensemble members", min_value=10, max_value=500, value=100, step=10)
+
+        if st.button("Run scenarios"):
+            perturbations = [p for name in scenarios for p in SCENARIOS[name]]
+            with st.spinner(f'Running {members}-member ensemble...'):
+                bands = dashboard.get_scenario_bands(start_datetime, perturbations, members=members)
+            if bands is None:
+                st.warning("Scenario runs need weather data for the selected day and the XGBoost models "
+                           "in the models directory")
+            else:
+                st.plotly_chart(dashboard.create_scenario_plot(bands, timezone=timezone),
+                                use_container_width=True)
+
+    with tab4:
         st.markdown(f"""
         ### About this Dashboard
         This dashboard provides energy generation forecasts using machine learning models trained on historical data.
@@ -358,4 +811,6 @@ def main():
         """)
 
 if __name__ == "__main__":
-    main()
+    with profiled('dashboard'):
+        main()
+    metrics.flush()
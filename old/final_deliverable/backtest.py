@@ -0,0 +1,276 @@
+"""Walk-forward (rolling-origin) backtests of the XGBoost, CNN and LSTM models.
+
+    python backtest.py --target solar --models xgboost EnergyCNN SolarRNN --test-hours 720 --folds 6
+
+Each fold refits a model on every hour before its origin (or the last
+--max-train-hours of them) and scores the next --test-hours. Errors are
+reported per fold and per horizon, where the horizon is the lead time since
+the origin bucketed like the dashboard's 24h / 1w / 30d forecasts, so it
+shows how quickly a model goes stale between refits.
+
+The raw 'joint' feature matrix comes from the feature-store cache
+(feature_store.py) and is placed in shared memory once; every
+(model, fold) pair runs in a worker process that attaches to it and picks
+its own feature-set columns.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import torch
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.preprocessing import MinMaxScaler
+
+from batching import make_loader
+from feature_store import FeatureStore
+from features import column_indices
+from forecasters import HORIZONS
+from models import ARCHITECTURES, build_model
+from sharing import SharedArrays, attach_shared
+from trainer import Trainer
+from training_data import DATABASE_PATH
+from windows import WindowedDataset
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SHARED_FEATURE_SET = 'joint'
+
+# Lead-time bucket edges in hours: [0, 24) -> '24h', [24, 168) -> '1w', ...
+HORIZON_EDGES = np.array([int(hours) for hours in HORIZONS.values()])
+HORIZON_LABELS = list(HORIZONS) + [f'>{list(HORIZONS)[-1]}']
+
+XGBOOST_PARAMS = dict(n_estimators=300, max_depth=6, learning_rate=0.1, subsample=0.8,
+                      tree_method='hist')
+
+# Per-process state set up by init_worker
+_WORKER = {}
+
+
+class XGBoostBacktestModel:
+    """XGBRegressor on the dashboard's per-hour feature rows"""
+
+    feature_set = 'default'
+
+    def __init__(self, threads=1, seed=0, **params):
+        self.params = {**XGBOOST_PARAMS, **params, 'n_jobs': threads, 'random_state': seed}
+        self.model = None
+
+    def fit(self, features, targets, start, end):
+        from xgboost import XGBRegressor
+
+        # XGBoost handles missing features itself; hours without a target are skipped
+        known = np.isfinite(targets[start:end])
+        self.model = XGBRegressor(**self.params)
+        self.model.fit(features[start:end][known], targets[start:end][known])
+        return self
+
+    def predict(self, features, start, end):
+        return self.model.predict(features[start:end])
+
+
+class SequenceBacktestModel:
+    """One of the notebook CNN / LSTM architectures, trained on this fold only.
+
+    Scalers are fitted on the training rows so the test period never leaks
+    into them. Windows feeding the first test hours reach back into the
+    training period, exactly as they would in production.
+    """
+
+    def __init__(self, architecture, epochs=None, seed=0):
+        self.architecture = architecture
+        self.spec = ARCHITECTURES[architecture]
+        self.feature_set = self.spec['feature_set']
+        self.sequence_length = self.spec['sequence_length']
+        self.epochs = epochs or self.spec['num_epochs']
+        self.seed = seed
+        self.model = None
+
+    def fit(self, features, targets, start, end):
+        torch.manual_seed(self.seed)
+        self.scaler_features = MinMaxScaler().fit(features[start:end])
+        self.scaler_target = MinMaxScaler().fit(targets[start:end, None])
+
+        dataset = WindowedDataset(self.scaler_features.transform(features[start:end]),
+                                  self.scaler_target.transform(targets[start:end, None]),
+                                  self.sequence_length)
+        self.model = build_model(self.architecture, dataset.num_features, self.sequence_length)
+        optimizer = torch.optim.Adam(self.model.parameters(), lr=self.spec['learning_rate'],
+                                     weight_decay=self.spec['weight_decay'])
+        loader = make_loader(dataset, batch_size=self.spec['batch_size'], shuffle=True, seed=self.seed)
+        Trainer(self.model, optimizer, clip_grad_norm=self.spec.get('clip_grad_norm')).fit(
+            loader, num_epochs=self.epochs, verbose=False)
+        return self
+
+    def predict(self, features, start, end, batch_size=1024):
+        if start < self.sequence_length:
+            raise ValueError(f"Need {self.sequence_length} hours of history before row {start}")
+        rows = self.scaler_features.transform(features[start - self.sequence_length:end])
+        # Keep every window so row i still predicts hour start + i; gaps come out as NaN
+        dataset = WindowedDataset(rows, np.zeros(len(rows), dtype=np.float32), self.sequence_length,
+                                  drop_invalid=False)
+
+        self.model.eval()
+        predictions = []
+        with torch.no_grad():
+            for batch_X, _ in make_loader(dataset, batch_size=batch_size, shuffle=False):
+                predictions.append(self.model(batch_X).numpy())
+        return self.scaler_target.inverse_transform(np.concatenate(predictions)).ravel()
+
+
+def make_model(name, epochs=None, threads=1, seed=0):
+    """Backtest model for 'xgboost' or any architecture in models.ARCHITECTURES"""
+    if name == 'xgboost':
+        return XGBoostBacktestModel(threads=threads, seed=seed)
+    if name in ARCHITECTURES:
+        return SequenceBacktestModel(name, epochs=epochs, seed=seed)
+    raise ValueError(f"Unknown model {name!r}; use 'xgboost' or one of {list(ARCHITECTURES)}")
+
+
+def rolling_origin_folds(n_rows, initial_train, test_size, step=None, max_train=None, n_folds=None):
+    """Fold boundaries as dicts of row offsets; the latest ``n_folds`` origins are kept"""
+    step = step or test_size
+    origins = list(range(initial_train, n_rows - test_size + 1, step))
+    if n_folds:
+        origins = origins[-n_folds:]
+    return [{'fold': i,
+             'train_start': max(0, origin - max_train) if max_train else 0,
+             'train_end': origin,
+             'test_start': origin,
+             'test_end': origin + test_size}
+            for i, origin in enumerate(origins)]
+
+
+def horizon_labels(leads):
+    """Dashboard horizon label for each lead time in hours"""
+    return np.asarray(HORIZON_LABELS)[np.searchsorted(HORIZON_EDGES, leads, side='right')]
+
+
+def score(actual, predicted):
+    return {
+        'n': len(actual),
+        'MAE': mean_absolute_error(actual, predicted),
+        'RMSE': np.sqrt(mean_squared_error(actual, predicted)),
+        'R2': r2_score(actual, predicted) if len(actual) > 1 else np.nan,
+    }
+
+
+def init_worker(specs, threads):
+    torch.set_num_threads(threads)
+    arrays, handles = attach_shared(specs)
+    _WORKER.update(arrays=arrays, handles=handles)
+
+
+def run_fold(task):
+    """Fit and score one (model, fold) pair in a worker process"""
+    started = time.perf_counter()
+    fold = task['fold']
+    base = {'model': task['model'], 'fold': fold['fold'], 'origin': task['origin']}
+    try:
+        model = make_model(task['model'], task['epochs'], task['threads'], task['seed'])
+        features = _WORKER['arrays']['features'][:, column_indices(model.feature_set, SHARED_FEATURE_SET)]
+        targets = _WORKER['arrays']['targets']
+
+        model.fit(features, targets, fold['train_start'], fold['train_end'])
+        predicted = model.predict(features, fold['test_start'], fold['test_end'])
+        actual = targets[fold['test_start']:fold['test_end']]
+        scored = np.isfinite(actual) & np.isfinite(predicted)
+        leads = np.arange(len(actual))[scored]
+        actual, predicted = actual[scored], predicted[scored]
+        if not scored.any():
+            raise ValueError("no test hour has both an observation and a prediction")
+    except Exception as e:
+        logger.error(f"{task['model']} fold {fold['fold']} failed: {e}")
+        return [{**base, 'horizon': 'all', 'status': 'failed', 'seconds': time.perf_counter() - started}]
+
+    seconds = time.perf_counter() - started
+    rows = [{**base, 'horizon': 'all', 'status': 'complete', 'seconds': seconds, **score(actual, predicted)}]
+    labels = horizon_labels(leads)
+    for label in HORIZON_LABELS:
+        mask = labels == label
+        if mask.any():
+            rows.append({**base, 'horizon': label, 'status': 'complete', 'seconds': seconds,
+                         **score(actual[mask], predicted[mask])})
+    return rows
+
+
+def run_backtest(target, model_names, test_hours=720, initial_train_hours=None, step_hours=None,
+                 max_train_hours=None, n_folds=None, epochs=None, workers=None, threads=1,
+                 database_path=DATABASE_PATH, seed=0):
+    """Backtest every model over the same folds; returns one row per (model, fold, horizon)"""
+    prepared = FeatureStore(database_path).get([target], SHARED_FEATURE_SET)
+    features, targets = prepared.features, prepared.targets[:, 0]
+
+    initial_train_hours = initial_train_hours or len(features) // 2
+    folds = rolling_origin_folds(len(features), initial_train_hours, test_hours, step_hours,
+                                 max_train_hours, n_folds)
+    if not folds:
+        raise ValueError(f"{len(features)} hours is too short for {initial_train_hours} training "
+                         f"+ {test_hours} test hours")
+
+    origins = pd.to_datetime(prepared.epoch_ns).strftime('%Y-%m-%d %H:%M')
+    tasks = [{'model': name, 'fold': fold, 'origin': origins[fold['test_start']],
+              'epochs': epochs, 'threads': threads, 'seed': seed}
+             for name in model_names for fold in folds]
+    workers = workers or max(1, min(len(tasks), (os.cpu_count() or 1) // threads))
+    logger.info(f"{len(model_names)} models × {len(folds)} folds on {len(features)} hours, "
+                f"{workers} workers × {threads} threads")
+
+    shared = SharedArrays(features=features, targets=targets)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=init_worker, initargs=(shared.specs, threads)) as pool:
+            results = [row for rows in pool.map(run_fold, tasks) for row in rows]
+    finally:
+        shared.close()
+
+    return pd.DataFrame(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the forecasting models")
+    parser.add_argument('--target', choices=['solar', 'wind', 'demand'], default='solar')
+    parser.add_argument('--models', nargs='+', default=['xgboost', 'EnergyCNN', 'SolarRNN'],
+                        help=f"'xgboost' and/or any of {list(ARCHITECTURES)}")
+    parser.add_argument('--test-hours', type=int, default=720)
+    parser.add_argument('--initial-train-hours', type=int, default=None, help="Default: half the series")
+    parser.add_argument('--step-hours', type=int, default=None, help="Default: --test-hours")
+    parser.add_argument('--max-train-hours', type=int, default=None,
+                        help="Sliding training window; default expands from the first hour")
+    parser.add_argument('--folds', type=int, default=None, help="Keep only the latest N folds")
+    parser.add_argument('--epochs', type=int, default=None, help="Default: each notebook's num_epochs")
+    parser.add_argument('--workers', type=int, default=None, help="Default: CPU count / --threads")
+    parser.add_argument('--threads', type=int, default=1, help="torch / xgboost threads per worker")
+    parser.add_argument('--database', default=DATABASE_PATH)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="Write every row to this CSV")
+    args = parser.parse_args()
+
+    results = run_backtest(args.target, args.models, args.test_hours, args.initial_train_hours,
+                           args.step_hours, args.max_train_hours, args.folds, args.epochs,
+                           args.workers, args.threads, args.database, args.seed)
+    if args.output:
+        results.to_csv(args.output, index=False)
+        logger.info(f"Wrote {len(results)} rows to {args.output}")
+
+    complete = results[results['status'] == 'complete']
+    for metric in ([] if complete.empty else ['MAE', 'RMSE', 'R2']):
+        summary = complete.pivot_table(index='model', columns='horizon', values=metric, aggfunc='mean')
+        print(f"\nMean {metric} over folds\n{summary.reindex(columns=['all'] + HORIZON_LABELS).round(3)}")
+
+    failed = results[results['status'] == 'failed']
+    if len(failed):
+        print(f"\n{len(failed)} (model, fold) runs failed; see the log")
+
+
+if __name__ == "__main__":
+    main()
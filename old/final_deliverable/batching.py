@@ -0,0 +1,89 @@
+"""Training-batch fast path for WindowedDataset.
+
+WindowBatchLoader draws shuffled start offsets and gathers every batch with a
+single indexing op on the dataset's pre-tensorized buffer, optionally a few
+batches ahead on background threads (torch indexing releases the GIL).
+make_loader picks between it and a regular DataLoader so the notebooks can
+switch with one argument.
+"""
+import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Subset
+
+from windows import collate_batch
+
+
+class WindowBatchLoader:
+    """Iterable of (x, y) batches over ``indices`` of a WindowedDataset"""
+
+    def __init__(self, dataset, indices=None, batch_size=32, shuffle=True, drop_last=False,
+                 prefetch=0, seed=None):
+        self.dataset = dataset
+        if indices is None:
+            indices = np.arange(len(dataset))
+        self.indices = torch.as_tensor(np.asarray(indices), dtype=torch.long)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.prefetch = prefetch
+        self.generator = torch.Generator()
+        if seed is not None:
+            self.generator.manual_seed(seed)
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.indices) // self.batch_size
+        return math.ceil(len(self.indices) / self.batch_size)
+
+    def batch_indices(self):
+        """Start offsets of each batch for one epoch"""
+        order = self.indices
+        if self.shuffle:
+            order = order[torch.randperm(len(order), generator=self.generator)]
+        batches = list(torch.split(order, self.batch_size))
+        if self.drop_last and batches and len(batches[-1]) < self.batch_size:
+            batches.pop()
+        return batches
+
+    def __iter__(self):
+        batches = self.batch_indices()
+        if self.prefetch <= 0:
+            for starts in batches:
+                yield self.dataset.get_batch(starts)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.prefetch, thread_name_prefix='batch-prefetch') as pool:
+            pending = deque()
+            for starts in batches:
+                pending.append(pool.submit(self.dataset.get_batch, starts))
+                if len(pending) > self.prefetch:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+
+def make_loader(dataset, indices=None, batch_size=32, shuffle=True, fast=True, prefetch=0,
+                num_workers=0, persistent_workers=False, seed=None):
+    """Training loader over ``indices`` of a WindowedDataset.
+
+    ``fast=True`` returns a WindowBatchLoader (in-process, one gather per
+    batch, ``prefetch`` background threads). ``fast=False`` returns a
+    DataLoader that still fetches whole batches through ``__getitems__`` and
+    honours ``num_workers`` / ``persistent_workers``.
+    """
+    if fast:
+        return WindowBatchLoader(dataset, indices, batch_size=batch_size, shuffle=shuffle,
+                                 prefetch=prefetch, seed=seed)
+
+    subset = dataset if indices is None else Subset(dataset, np.asarray(indices).tolist())
+    generator = None
+    if seed is not None:
+        generator = torch.Generator()
+        generator.manual_seed(seed)
+    return DataLoader(subset, batch_size=batch_size, shuffle=shuffle, collate_fn=collate_batch,
+                      num_workers=num_workers, persistent_workers=persistent_workers and num_workers > 0,
+                      generator=generator)
@@ -0,0 +1,121 @@
+"""Samples/sec of the training data path for each notebook architecture.
+
+    python bench_loaders.py --hours 17520 --batches 200 --prefetch 2
+
+For every architecture in models.ARCHITECTURES this times, on synthetic data
+with the notebook's feature width, sequence length and batch size:
+  - the original per-sample Dataset behind a DataLoader,
+  - a DataLoader fetching whole batches through WindowedDataset.__getitems__,
+  - the WindowBatchLoader fast path, with and without prefetch threads,
+both as a bare data pass and as full Adam training steps.
+"""
+import argparse
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader, Dataset, Subset
+
+from batching import make_loader
+from features import FEATURE_SETS
+from models import ARCHITECTURES, build_model
+from windows import WindowedDataset
+
+
+class PerSampleDataset(Dataset):
+    """The notebooks' original dataset: two new FloatTensors per sample"""
+
+    def __init__(self, features, targets, sequence_length):
+        self.features = features
+        self.targets = targets
+        self.sequence_length = sequence_length
+
+    def __len__(self):
+        return len(self.features) - self.sequence_length
+
+    def __getitem__(self, idx):
+        x = self.features[idx:idx + self.sequence_length]
+        y = self.targets[idx + self.sequence_length]
+        return torch.FloatTensor(x), torch.FloatTensor(y)
+
+
+def synthetic_data(hours, width, seed=0):
+    """Min-max scaled random features and a target correlated with them"""
+    rng = np.random.default_rng(seed)
+    features = rng.random((hours, width), dtype=np.float32)
+    targets = (features[:, :3].mean(axis=1, keepdims=True)
+               + rng.normal(0, 0.05, (hours, 1))).astype(np.float32)
+    return features, targets
+
+
+def samples_per_second(loader, max_batches, step=None):
+    samples = 0
+    started = time.perf_counter()
+    for i, (x, y) in enumerate(loader):
+        if i >= max_batches:
+            break
+        if step is not None:
+            step(x, y)
+        samples += len(x)
+    return samples / (time.perf_counter() - started)
+
+
+def training_step(model, spec):
+    optimizer = torch.optim.Adam(model.parameters(), lr=spec['learning_rate'],
+                                 weight_decay=spec['weight_decay'])
+    criterion = nn.MSELoss()
+    model.train()
+
+    def step(x, y):
+        optimizer.zero_grad()
+        loss = criterion(model(x), y)
+        loss.backward()
+        optimizer.step()
+    return step
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark training data loaders")
+    parser.add_argument('--hours', type=int, default=2 * 8760, help="Rows of synthetic hourly data")
+    parser.add_argument('--batches', type=int, default=200, help="Batches timed per loader")
+    parser.add_argument('--prefetch', type=int, default=2, help="Prefetch threads for the fast path")
+    parser.add_argument('--num-workers', type=int, default=0, help="DataLoader workers for the batched loader")
+    parser.add_argument('--threads', type=int, default=None, help="torch.set_num_threads")
+    parser.add_argument('--architectures', nargs='*', default=list(ARCHITECTURES))
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    print(f"{'architecture':<11} {'loader':<26} {'data samples/s':>15} {'train samples/s':>16}")
+    for name in args.architectures:
+        spec = ARCHITECTURES[name]
+        width = len(FEATURE_SETS[spec['feature_set']])
+        sequence_length, batch_size = spec['sequence_length'], spec['batch_size']
+
+        features, targets = synthetic_data(args.hours, width)
+        dataset = WindowedDataset(features, targets, sequence_length)
+        train_idx = np.random.default_rng(0).permutation(len(dataset))[:int(0.7 * len(dataset))]
+
+        loaders = {
+            'per-sample DataLoader': lambda: DataLoader(
+                Subset(PerSampleDataset(features, targets, sequence_length), train_idx.tolist()),
+                batch_size=batch_size, shuffle=True),
+            'batched DataLoader': lambda: make_loader(
+                dataset, train_idx, batch_size, fast=False, num_workers=args.num_workers,
+                persistent_workers=True),
+            'fast path': lambda: make_loader(dataset, train_idx, batch_size),
+            f'fast path + {args.prefetch} prefetch': lambda: make_loader(
+                dataset, train_idx, batch_size, prefetch=args.prefetch),
+        }
+
+        for label, loader in loaders.items():
+            data_rate = samples_per_second(loader(), args.batches)
+            model = build_model(name, input_size=width, sequence_length=sequence_length)
+            train_rate = samples_per_second(loader(), args.batches, training_step(model, spec))
+            print(f"{name:<11} {label:<26} {data_rate:>15,.0f} {train_rate:>16,.0f}")
+
+
+if __name__ == "__main__":
+    main()
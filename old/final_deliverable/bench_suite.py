@@ -0,0 +1,431 @@
+"""Offline benchmark suite: ingestion, feature preparation, training and dashboard inference.
+
+    python bench_suite.py --scales 1m 2y --check
+    python bench_suite.py --scales 10y-5r --only training --train-windows 50000
+
+Everything runs on synthetic data, so no API key, network access or real
+database is needed. For each scale (SCALES: hours per region x regions) it times:
+
+  ingestion    store_data (which also runs calculate_statistics) and a second
+               calculate_statistics of EIA_API_request_all_dates, per region,
+               into a fresh SQLite file; the collector catches and logs its own
+               errors, so an error it logs fails the benchmark instead of
+               timing a rolled-back call
+  loader       load_merged_data and load_aligned over one synthetic weather and
+               target database per region
+  features     the dashboard's prepare_features ('default' frame) and the
+               'joint' feature matrix over every region's rows
+  windows      building a WindowedDataset and gathering every window
+  training     one epoch of each architecture in models.ARCHITECTURES
+  dashboard    get_predictions (uncached and cached), predict_frame over the
+               scale's hours and create_plots of those predictions, with the
+               Meteostat fetch replaced by synthetic weather and the XGBoost
+               models from old/models
+
+Each run is appended to bench_history.json together with the host, commit
+and library versions. With --check, any benchmark slower than its threshold
+(THRESHOLDS, default DEFAULT_THRESHOLD) times the median of the last
+--baseline-runs runs on the same host is reported and the exit status is 1.
+A failed benchmark is recorded without a time, so it never becomes a
+baseline, and always makes the exit status 1.
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import closing
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import torch
+
+from batching import make_loader
+from bench_xgboost import best_of, synthetic_weather
+from features import FEATURE_SETS, build_feature_frame, build_feature_matrix
+from models import ARCHITECTURES, build_model
+from trainer import Trainer
+from training_data import load_aligned, load_merged_data
+from windows import WindowedDataset
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_HISTORY = os.path.join(BENCH_DIR, 'bench_history.json')
+INGESTION_DIR = os.path.join(BENCH_DIR, '..', 'data_collection', 'energy')
+
+SCALES = {
+    '1m': dict(hours=24 * 30, regions=1),
+    '2y': dict(hours=24 * 730, regions=1),
+    '10y-5r': dict(hours=24 * 3650, regions=5),
+}
+
+GROUPS = ['ingestion', 'loader', 'features', 'windows', 'training', 'dashboard']
+
+REGIONS = ['NE', 'NY', 'MIDA', 'CAR', 'TEX']
+FUEL_TYPES = ['COL', 'NG', 'NUC', 'OIL', 'SUN', 'WAT', 'WND', 'OTH']
+
+# Allowed slowdown against the baseline median, by benchmark name
+DEFAULT_THRESHOLD = 1.25
+THRESHOLDS = {
+    'store_data': 1.5,
+    'calculate_statistics': 1.5,
+    'train_epoch': 1.5,
+    'create_plots': 1.5,
+}
+# Below this the timer and scheduler noise dominate, so no regression is reported
+MIN_SECONDS = 0.005
+
+
+def synthetic_targets(hours, seed=0):
+    rng = np.random.default_rng(seed)
+    hour_of_day = np.arange(hours) % 24
+    return {
+        'solar': np.clip(np.sin((hour_of_day - 6) / 12 * np.pi), 0, None) * 800 + rng.normal(0, 20, hours),
+        'wind': rng.gamma(2, 150, hours),
+        'demand': 13000 + 2500 * np.sin(hour_of_day / 24 * 2 * np.pi) + rng.normal(0, 300, hours),
+    }
+
+
+def write_training_database(path, hours, seed=0):
+    """The weather and target tables training_data.py reads, filled with synthetic rows"""
+    weather = synthetic_weather(hours, seed).rename(columns={'datetime': 'time'})
+    weather['time'] = weather['time'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    targets = synthetic_targets(hours, seed)
+    with closing(sqlite3.connect(path)) as conn:
+        weather.to_sql('historical_weather_data', conn, index=False, if_exists='replace')
+        for table, column, target in [('SUN_data_NE', 'value', 'solar'), ('WND_data_NE', 'value', 'wind'),
+                                      ('demand_data_NE', 'Demand', 'demand')]:
+            pd.DataFrame({'datetime': weather['time'], column: targets[target]}).to_sql(
+                table, conn, index=False, if_exists='replace')
+
+
+def synthetic_eia_records(hours, region, seed=0):
+    """Records shaped like the EIA API's fuel-type-data response"""
+    # Known collector bug: SQLite's date() returns NULL for the API's 'YYYY-MM-DDTHH' periods, so
+    # calculate_statistics fails on DailyGeneration.date and the ingestion benchmark reports it
+    rng = np.random.default_rng(seed)
+    periods = pd.date_range('2015-01-01', periods=hours, freq='h').strftime('%Y-%m-%dT%H')
+    values = rng.gamma(2, 500, (hours, len(FUEL_TYPES))).round(1)
+    return [{'period': period, 'respondent': region, 'respondent-name': f'{region} region',
+             'fueltype': fuel, 'type-name': fuel, 'value': str(value), 'value-units': 'megawatthours'}
+            for period, row in zip(periods, values) for fuel, value in zip(FUEL_TYPES, row)]
+
+
+def load_ingestion_module():
+    """EIA_API_request_all_dates, imported without a real API key (no request is made)"""
+    os.environ.setdefault('EIA_API_KEY', 'offline-benchmark')
+    if INGESTION_DIR not in sys.path:
+        sys.path.insert(0, INGESTION_DIR)
+    module = importlib.import_module('EIA_API_request_all_dates')
+    logging.getLogger(module.__name__).setLevel(logging.WARNING)
+    return module
+
+
+def timed(function):
+    started = time.perf_counter()
+    function()
+    return time.perf_counter() - started
+
+
+class ErrorRecorder(logging.Handler):
+    """Collects the ERROR records of a logger while attached"""
+
+    def __init__(self, target):
+        super(ErrorRecorder, self).__init__(level=logging.ERROR)
+        self.target = target
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+    def __enter__(self):
+        self.target.addHandler(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.target.removeHandler(self)
+
+
+def check_logged(errors, name):
+    """Raise RuntimeError if ``name`` logged an error instead of raising it"""
+    if errors.messages:
+        raise RuntimeError(f"{name} logged {len(errors.messages)} error(s), first: {errors.messages[0]}")
+
+
+def bench_ingestion(hours, regions, workdir, repeats):
+    eia = load_ingestion_module()
+    results = {'store_data': {'seconds': 0.0, 'items': 0},
+               'calculate_statistics': {'seconds': 0.0, 'items': 0}}
+    with eia.DatabaseConnection(os.path.join(workdir, 'energy_production.db')) as db:
+        eia.initialize_database(db)
+        for i, region in enumerate(REGIONS[:regions]):
+            records = synthetic_eia_records(hours, region, seed=i)
+            with ErrorRecorder(eia.logger) as errors:
+                results['store_data']['seconds'] += timed(lambda: eia.store_data(db, records, region))
+            check_logged(errors, 'store_data')
+            results['store_data']['items'] += len(records)
+            with ErrorRecorder(eia.logger) as errors:
+                results['calculate_statistics']['seconds'] += best_of(
+                    lambda: eia.calculate_statistics(db, region), repeats)
+            check_logged(errors, 'calculate_statistics')
+            results['calculate_statistics']['items'] += len(records)
+    return results
+
+
+def bench_loader(hours, regions, workdir, repeats):
+    targets = ['solar', 'wind', 'demand']
+    results = {'load_merged_data': {'seconds': 0.0, 'items': 0}, 'load_aligned': {'seconds': 0.0, 'items': 0}}
+    for i, region in enumerate(REGIONS[:regions]):
+        path = os.path.join(workdir, f'energy_data_{region}.db')
+        write_training_database(path, hours, seed=i)
+        for name, load in [('load_merged_data', load_merged_data), ('load_aligned', load_aligned)]:
+            results[name]['seconds'] += best_of(lambda: load(targets, path), repeats)
+            results[name]['items'] += hours
+    return results
+
+
+def bench_features(hours, regions, workdir, repeats):
+    weather = synthetic_weather(hours * regions)
+    return {
+        'prepare_features': {'seconds': best_of(lambda: build_feature_frame(weather, feature_set='default'),
+                                                repeats), 'items': len(weather)},
+        'feature_matrix_joint': {'seconds': best_of(lambda: build_feature_matrix(weather, feature_set='joint'),
+                                                    repeats), 'items': len(weather)},
+    }
+
+
+def bench_windows(hours, regions, workdir, repeats, sequence_length=48, batch_size=1024):
+    rng = np.random.default_rng(0)
+    features = rng.random((hours * regions, len(FEATURE_SETS['joint'])), dtype=np.float32)
+    targets = rng.random((hours * regions, 1), dtype=np.float32)
+
+    def gather_all():
+        dataset = WindowedDataset(features, targets, sequence_length)
+        for start in range(0, len(dataset), batch_size):
+            dataset.get_batch(np.arange(start, min(start + batch_size, len(dataset))))
+
+    return {'windows': {'seconds': best_of(gather_all, repeats), 'items': len(features) - sequence_length}}
+
+
+def bench_training(hours, regions, workdir, repeats, train_windows=None):
+    results = {}
+    rng = np.random.default_rng(0)
+    for name, spec in ARCHITECTURES.items():
+        width, sequence_length = len(FEATURE_SETS[spec['feature_set']]), spec['sequence_length']
+        features = rng.random((hours * regions, width), dtype=np.float32)
+        targets = rng.random((hours * regions, 1), dtype=np.float32)
+        dataset = WindowedDataset(features, targets, sequence_length)
+        indices = np.arange(len(dataset))
+        if train_windows and len(indices) > train_windows:
+            indices = rng.choice(indices, size=train_windows, replace=False)
+
+        torch.manual_seed(0)
+        model = build_model(name, width, sequence_length)
+        optimizer = torch.optim.Adam(model.parameters(), lr=spec['learning_rate'])
+        trainer = Trainer(model, optimizer, clip_grad_norm=spec.get('clip_grad_norm'))
+        loader = make_loader(dataset, indices, spec['batch_size'], shuffle=True, seed=0)
+        results[f'train_epoch/{name}'] = {'seconds': timed(lambda: trainer.train_epoch(loader)),
+                                          'items': len(indices)}
+    return results
+
+
+def offline_dashboard(weather):
+    """EnergyDashboard with the XGBoost forecaster and Meteostat replaced by ``weather``"""
+    import app
+    from forecasters import XGBoostForecaster
+    from prediction_cache import PredictionCache
+
+    def fetch_weather_window(latitude, longitude, start, end):
+        times = weather['datetime']
+        return weather[(times >= start) & (times < end)].reset_index(drop=True)
+
+    app.fetch_weather_window = fetch_weather_window
+    dashboard = app.EnergyDashboard.__new__(app.EnergyDashboard)
+    dashboard.coordinates = (42.3601, -71.0589)
+    dashboard.prediction_cache = PredictionCache()
+    dashboard.model = XGBoostForecaster()
+    dashboard.model_version = 'benchmark'
+    return dashboard
+
+
+def bench_dashboard(hours, regions, workdir, repeats):
+    weather = synthetic_weather(hours)
+    dashboard = offline_dashboard(weather)
+    start = weather['datetime'].iloc[0]
+
+    def uncached():
+        dashboard.prediction_cache.invalidate()
+        dashboard.get_predictions(start)
+
+    dashboard.get_predictions(start)
+    predictions = dashboard.predict_frame(weather.copy())
+    return {
+        'get_predictions': {'seconds': best_of(uncached, repeats), 'items': 24},
+        'get_predictions_cached': {'seconds': best_of(lambda: dashboard.get_predictions(start), repeats),
+                                   'items': 24},
+        'predict_frame': {'seconds': best_of(lambda: dashboard.predict_frame(weather.copy()), repeats),
+                          'items': hours},
+        'create_plots': {'seconds': best_of(lambda: dashboard.create_plots(predictions), repeats),
+                         'items': hours},
+    }
+
+
+BENCHMARKS = {
+    'ingestion': bench_ingestion,
+    'loader': bench_loader,
+    'features': bench_features,
+    'windows': bench_windows,
+    'training': bench_training,
+    'dashboard': bench_dashboard,
+}
+
+
+def run_suite(scales, groups, repeats=3, train_windows=None):
+    """{'<scale>/<benchmark>': {'seconds', 'items'}, {'skipped': reason} or {'failed': reason}}"""
+    results = {}
+    for scale in scales:
+        hours, regions = SCALES[scale]['hours'], SCALES[scale]['regions']
+        for group in groups:
+            logger.info(f"{scale}: {group}")
+            kwargs = {'train_windows': train_windows} if group == 'training' else {}
+            with tempfile.TemporaryDirectory(prefix='bench-') as workdir:
+                try:
+                    group_results = BENCHMARKS[group](hours, regions, workdir, repeats, **kwargs)
+                except (ImportError, OSError) as e:
+                    # Missing optional dependency (streamlit, meteostat, dotenv) or model files
+                    logger.warning(f"Skipping {group} at {scale}: {e}")
+                    results[f'{scale}/{group}'] = {'skipped': str(e)}
+                    continue
+                except RuntimeError as e:
+                    logger.error(f"{group} failed at {scale}: {e}")
+                    results[f'{scale}/{group}'] = {'failed': str(e)}
+                    continue
+            for name, result in group_results.items():
+                results[f'{scale}/{name}'] = result
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_history(path, history):
+    temporary = f"{path}.tmp-{os.getpid()}"
+    with open(temporary, 'w') as file:
+        json.dump(history, file, indent=2)
+    os.replace(temporary, path)
+
+
+def threshold(key):
+    return THRESHOLDS.get(key.split('/')[1], DEFAULT_THRESHOLD)
+
+
+def baselines(history, run, baseline_runs=5):
+    """Median seconds per benchmark over the last ``baseline_runs`` runs on the same host"""
+    previous = [entry for entry in history if entry['host'] == run['host']][-baseline_runs:]
+    medians = {}
+    for key in run['results']:
+        seconds = [entry['results'][key]['seconds'] for entry in previous
+                   if 'seconds' in entry['results'].get(key, {})]
+        if seconds:
+            medians[key] = float(np.median(seconds))
+    return medians
+
+
+def find_regressions(run, medians):
+    regressions = []
+    for key, result in run['results'].items():
+        if key not in medians or 'seconds' not in result or result['seconds'] < MIN_SECONDS:
+            continue
+        if result['seconds'] > medians[key] * threshold(key):
+            regressions.append(key)
+    return regressions
+
+
+def print_results(run, medians, regressions):
+    print(f"\n{'benchmark':<42} {'seconds':>10} {'items/s':>12} {'baseline':>10} {'ratio':>7}")
+    for key, result in run['results'].items():
+        if 'skipped' in result:
+            print(f"{key:<42} {'skipped':>10}")
+            continue
+        if 'failed' in result:
+            print(f"{key:<42} {'FAILED':>10}  {result['failed']}")
+            continue
+        rate = result['items'] / result['seconds'] if result['seconds'] > 0 else float('inf')
+        line = f"{key:<42} {result['seconds']:>10.4f} {rate:>12.0f}"
+        if key in medians:
+            line += f" {medians[key]:>10.4f} {result['seconds'] / medians[key]:>6.2f}x"
+        if key in regressions:
+            line += f"  REGRESSION (> {threshold(key):.2f}x)"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, features, training and inference")
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=['1m', '2y'])
+    parser.add_argument('--only', nargs='+', choices=GROUPS, default=GROUPS)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--train-windows', type=int,
+                        help="Cap the windows in each training epoch (default: all)")
+    parser.add_argument('--history', default=BENCH_HISTORY)
+    parser.add_argument('--baseline-runs', type=int, default=5)
+    parser.add_argument('--check', action='store_true', help="Exit with status 1 on a regression")
+    parser.add_argument('--no-save', action='store_true', help="Do not append this run to the history")
+    args = parser.parse_args()
+
+    run = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'host': platform.node(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'torch': torch.__version__,
+        'repeats': args.repeats,
+        'train_windows': args.train_windows,
+        'results': run_suite(args.scales, args.only, args.repeats, args.train_windows),
+    }
+
+    history = load_history(args.history)
+    medians = baselines(history, run, args.baseline_runs)
+    regressions = find_regressions(run, medians)
+    print_results(run, medians, regressions)
+
+    if not args.no_save:
+        save_history(args.history, history + [run])
+        logger.info(f"Appended run to {args.history}")
+    failed = [key for key, result in run['results'].items() if 'failed' in result]
+    if failed:
+        logger.error(f"{len(failed)} benchmark(s) failed: {', '.join(failed)}")
+    if args.check and regressions:
+        logger.error(f"{len(regressions)} benchmark(s) regressed: {', '.join(regressions)}")
+    if failed or (args.check and regressions):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Load time and predict latency of the XGBoost models: pickle vs native format.
+
+    python bench_xgboost.py --rows 24 720 8760 --repeats 20
+
+Load: ``pickle.load`` of each <target>_model.pkl against
+``Booster.load_model`` of the UBJSON copy (converted into a temporary
+directory when the model directory has none).
+
+Predict: the original path (a feature DataFrame and one
+``XGBRegressor.predict`` per target) against XGBoostForecaster.predict (one
+float32 matrix shared by the three boosters' ``inplace_predict``), both
+starting from the same synthetic weather rows.
+"""
+import argparse
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from features import WEATHER_FEATURES, build_feature_frame
+from forecasters import MODEL_DIR, TARGETS, XGBoostForecaster, load_booster
+
+
+def synthetic_weather(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    weather = pd.DataFrame({
+        'temperature': rng.normal(10, 8, rows),
+        'dwpt': rng.normal(3, 7, rows),
+        'humidity': rng.uniform(20, 100, rows),
+        'precipitation': rng.exponential(0.2, rows),
+        'wdir': rng.uniform(0, 360, rows),
+        'windspeed': rng.gamma(2, 6, rows),
+        'pres': rng.normal(1015, 8, rows),
+        'cloudcover': rng.integers(1, 9, rows).astype(float),
+    })[WEATHER_FEATURES]
+    weather.insert(0, 'datetime', pd.date_range('2023-01-01', periods=rows, freq='h'))
+    return weather
+
+
+def best_of(function, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def pickle_load(path):
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark XGBoost model loading and prediction")
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    parser.add_argument('--rows', type=int, nargs='+', default=[24, 720, 8760, 87600])
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    native_dir = args.model_dir
+    if not all(os.path.exists(os.path.join(args.model_dir, f'{t}_model.ubj')) for t in TARGETS):
+        native_dir = tempfile.mkdtemp(prefix='xgb-native-')
+        for target in TARGETS:
+            load_booster(os.path.join(args.model_dir, f'{target}_model.pkl')).save_model(
+                os.path.join(native_dir, f'{target}_model.ubj'))
+
+    try:
+        print(f"{'target':<8} {'pickle load ms':>15} {'ubj load ms':>12} {'pickle MB':>10} {'ubj MB':>8}")
+        for target in TARGETS:
+            pkl = os.path.join(args.model_dir, f'{target}_model.pkl')
+            ubj = os.path.join(native_dir, f'{target}_model.ubj')
+            pickle_ms = best_of(lambda: pickle_load(pkl), args.repeats) * 1e3
+            native_ms = best_of(lambda: load_booster(ubj), args.repeats) * 1e3
+            print(f"{target:<8} {pickle_ms:>15.2f} {native_ms:>12.2f} "
+                  f"{os.path.getsize(pkl) / 1e6:>10.2f} {os.path.getsize(ubj) / 1e6:>8.2f}")
+
+        regressors = {target: pickle_load(os.path.join(args.model_dir, f'{target}_model.pkl'))
+                      for target in TARGETS}
+        forecaster = XGBoostForecaster(native_dir)
+
+        def pickle_path(weather):
+            features = build_feature_frame(weather, feature_set='default')
+            return {target: model.predict(features) for target, model in regressors.items()}
+
+        print(f"\n{'rows':>8} {'pickle path ms':>15} {'native batched ms':>18} {'speedup':>8}")
+        for rows in args.rows:
+            weather = synthetic_weather(rows)
+            old = pickle_path(weather)
+            new = forecaster.predict(weather)
+            for target in TARGETS:
+                np.testing.assert_allclose(new[target]['24'], old[target], rtol=1e-5, atol=1e-3)
+
+            old_ms = best_of(lambda: pickle_path(weather), args.repeats) * 1e3
+            new_ms = best_of(lambda: forecaster.predict(weather), args.repeats) * 1e3
+            print(f"{rows:>8} {old_ms:>15.2f} {new_ms:>18.2f} {old_ms / new_ms:>7.1f}x")
+    finally:
+        if native_dir != args.model_dir:
+            shutil.rmtree(native_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
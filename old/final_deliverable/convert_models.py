@@ -0,0 +1,56 @@
+"""Convert the pickled XGBoost regressors to XGBoost's native model format.
+
+    python convert_models.py --format ubj
+
+Writes <target>_model.ubj (or .json) next to each <target>_model.pkl. The
+native files keep the feature names, load without unpickling and do not tie
+serving to the exact xgboost / scikit-learn versions used for training.
+XGBoostForecaster picks them up ahead of the pickles.
+"""
+import argparse
+import logging
+import os
+
+import numpy as np
+
+from features import FEATURE_SETS
+from forecasters import MODEL_DIR, TARGETS, load_booster
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def convert(model_dir=MODEL_DIR, model_format='ubj', check_rows=1000):
+    """Convert every target's pickle and check the native copy predicts the same"""
+    features = np.random.default_rng(0).random((check_rows, len(FEATURE_SETS['default'])), dtype=np.float32)
+    for target in TARGETS:
+        source = os.path.join(model_dir, f'{target}_model.pkl')
+        output = os.path.join(model_dir, f'{target}_model.{model_format}')
+
+        booster = load_booster(source)
+        booster.save_model(output)
+        converted = load_booster(output)
+
+        difference = np.abs(booster.inplace_predict(features, validate_features=False)
+                            - converted.inplace_predict(features, validate_features=False)).max()
+        if difference > 0:
+            raise RuntimeError(f"{output} differs from {source} by up to {difference}")
+        logger.info(f"{source} ({os.path.getsize(source) / 1e6:.2f} MB) -> "
+                    f"{output} ({os.path.getsize(output) / 1e6:.2f} MB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert pickled XGBoost models to the native format")
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    parser.add_argument('--format', choices=['ubj', 'json'], default='ubj')
+    args = parser.parse_args()
+
+    convert(args.model_dir, args.format)
+
+
+if __name__ == "__main__":
+    main()
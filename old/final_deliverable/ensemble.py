@@ -0,0 +1,216 @@
+"""Hybrid XGBoost + CNN forecaster with per-target blend weights.
+
+    python ensemble.py --networks solar=solar_cnn.pt wind=wind_cnn.pt demand=demand_cnn.pt \\
+        --holdout-hours 2160 --output blend_weights.json
+
+HybridForecaster builds the 'joint' feature matrix once per request; the
+XGBoost boosters read its 'default' columns and each exported CNN (see
+export.py) reads its own columns as sliding windows over the same rows.
+The two predictions are blended per target as
+
+    xgboost_weight * xgboost + cnn_weight * cnn + bias
+
+Rows without a full window of the preceding hours get the XGBoost
+prediction. That covers a window with a missing value, a skipped hour, or
+rows from non-adjacent periods concatenated into one request. Rows are put
+in time order first, and ``predict(weather, history=...)`` takes earlier
+hours as lookback, so the first requested hours get a CNN prediction too.
+``lookback_hours`` says how many such hours the networks use; the dashboard
+fetches them before each run of requested hours.
+It exposes the same ``predict(weather_data)`` as XGBoostForecaster, so it can
+be registered as the dashboard's forecaster.
+
+Running this module fits the weights on the last --holdout-hours of the
+aligned database (load_aligned), which should be hours the networks were
+not trained on; windows that straddle a missing hour are left out. By
+default the fit is a convex combination; with --stack it is an unconstrained
+least-squares stack with an intercept.
+"""
+import argparse
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+
+from export import ExportedModel
+from features import NS_PER_HOUR, build_feature_matrix, column_indices, to_epoch_ns
+from forecasters import HORIZONS, MODEL_DIR, TARGETS, XGBoostForecaster
+from alignment import window_validity
+from training_data import DATABASE_PATH, load_aligned
+from windows import sliding_windows
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+XGBOOST_ONLY = {'xgboost': 1.0, 'cnn': 0.0, 'bias': 0.0}
+EQUAL_BLEND = {'xgboost': 0.5, 'cnn': 0.5, 'bias': 0.0}
+
+
+class HybridForecaster:
+    """XGBoost and exported CNNs evaluated on one feature matrix and blended per target"""
+
+    feature_set = 'joint'
+
+    def __init__(self, xgboost, networks=None, weights=None):
+        self.xgboost = xgboost
+        self.networks = dict(networks or {})
+        weights = weights or {}
+        self.weights = {target: {**(EQUAL_BLEND if target in self.networks else XGBOOST_ONLY),
+                                 **weights.get(target, {})}
+                        for target in TARGETS}
+
+    @classmethod
+    def load(cls, networks, weights_path=None, model_dir=MODEL_DIR, registry=None):
+        """Build from {target: exported CNN path} and an optional blend-weights JSON file"""
+        weights = None
+        if weights_path:
+            with open(weights_path) as file:
+                weights = json.load(file)
+        return cls(XGBoostForecaster(model_dir, registry=registry),
+                   {target: ExportedModel(path) for target, path in networks.items()},
+                   weights)
+
+    @property
+    def lookback_hours(self):
+        """Hours of weather before the first requested hour that the blended networks read"""
+        return max([network.metadata['sequence_length'] for target, network in self.networks.items()
+                    if self.weights[target]['cnn'] != 0], default=0)
+
+    @staticmethod
+    def with_history(weather_data, history=None):
+        """``weather_data`` plus the ``history`` hours it lacks, in time order, and where its rows ended up"""
+        frame = weather_data
+        if history is not None and len(history):
+            requested = to_epoch_ns(weather_data['datetime'])
+            history = history[~np.isin(to_epoch_ns(history['datetime']), requested)]
+            frame = pd.concat([weather_data, history], ignore_index=True)
+        order = np.argsort(to_epoch_ns(frame['datetime']), kind='stable')
+        positions = np.empty(len(order), dtype=np.int64)
+        positions[order] = np.arange(len(order))
+        return frame.iloc[order].reset_index(drop=True), positions[:len(weather_data)]
+
+    def predict_components(self, weather_data, history=None):
+        """XGBoost and CNN predictions per row of ``weather_data``.
+
+        CNN rows are NaN unless the ``sequence_length`` hours before them,
+        from ``weather_data`` or ``history``, are consecutive and finite.
+        """
+        frame, positions = self.with_history(weather_data, history)
+        features = build_feature_matrix(frame, feature_set=self.feature_set)
+        xgboost = self.xgboost.predict_features(
+            features[positions][:, column_indices(self.xgboost.feature_set, self.feature_set)])
+
+        # hourly[j]: row j + 1 is the hour after row j
+        hourly = np.diff(to_epoch_ns(frame['datetime'])) == NS_PER_HOUR
+        cnn = {}
+        for target, network in self.networks.items():
+            if self.weights[target]['cnn'] == 0:
+                continue
+            sequence_length = network.metadata['sequence_length']
+            values = np.full(len(features), np.nan, dtype=np.float32)
+            if len(features) > sequence_length:
+                columns = features[:, column_indices(network.metadata['feature_set'], self.feature_set)]
+                # window_validity over sequence_length - 1 checks rows i .. i + sequence_length - 1, the
+                # inputs of the prediction for row i + sequence_length; over hourly it checks that rows
+                # i .. i + sequence_length are consecutive hours
+                complete = (window_validity(np.isfinite(columns).all(axis=1),
+                                            sequence_length - 1)[:len(features) - sequence_length]
+                            & window_validity(hourly, sequence_length - 1))
+                starts = np.flatnonzero(complete)
+                if len(starts):
+                    values[starts + sequence_length] = network.predict(
+                        sliding_windows(columns, sequence_length)[starts])
+            cnn[target] = values[positions]
+        return xgboost, cnn
+
+    def blend(self, xgboost, cnn):
+        blended = {}
+        for target, values in xgboost.items():
+            if target not in cnn:
+                blended[target] = values
+                continue
+            weights = self.weights[target]
+            combined = weights['xgboost'] * values + weights['cnn'] * cnn[target] + weights['bias']
+            blended[target] = np.where(np.isnan(cnn[target]), values, combined)
+        return blended
+
+    def predict(self, weather_data, history=None):
+        """Predict every target for each row of ``weather_data``, with ``history`` as optional lookback"""
+        predictions = {}
+        for target, values in self.blend(*self.predict_components(weather_data, history)).items():
+            predictions[target] = {horizon: values for horizon in HORIZONS.values()}
+        return predictions
+
+
+def fit_blend_weights(xgboost, cnn, actual, stack=False):
+    """Blend weights minimizing squared error on rows where both models predicted"""
+    valid = ~np.isnan(cnn) & ~np.isnan(actual)
+    a, b, y = (np.asarray(v, dtype=np.float64)[valid] for v in (xgboost, cnn, actual))
+
+    if stack:
+        design = np.column_stack([a, b, np.ones_like(a)])
+        (w_xgboost, w_cnn, bias), *_ = np.linalg.lstsq(design, y, rcond=None)
+        return {'xgboost': float(w_xgboost), 'cnn': float(w_cnn), 'bias': float(bias)}
+
+    difference = a - b
+    denominator = difference @ difference
+    weight = 1.0 if denominator == 0 else float(np.clip((y - b) @ difference / denominator, 0.0, 1.0))
+    return {'xgboost': weight, 'cnn': 1.0 - weight, 'bias': 0.0}
+
+
+def parse_networks(pairs):
+    networks = {}
+    for pair in pairs or []:
+        target, path = pair.split('=', 1)
+        networks[target] = path
+    return networks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit per-target blend weights for the hybrid forecaster")
+    parser.add_argument('--networks', nargs='+', required=True, metavar='TARGET=ARTIFACT',
+                        help="Exported CNN per target (export.py output)")
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    parser.add_argument('--database', default=DATABASE_PATH)
+    parser.add_argument('--holdout-hours', type=int, default=24 * 90)
+    parser.add_argument('--stack', action='store_true', help="Unconstrained weights with an intercept")
+    parser.add_argument('--output', default='blend_weights.json')
+    args = parser.parse_args()
+
+    forecaster = HybridForecaster.load(parse_networks(args.networks), model_dir=args.model_dir)
+    aligned = load_aligned(TARGETS, args.database)
+    holdout = aligned.tail(args.holdout_hours).reset_index(drop=True)
+    # The hours before the holdout are lookback only, so its first hours get a CNN prediction too
+    first = len(aligned) - len(holdout)
+    history = aligned.iloc[max(first - forecaster.lookback_hours, 0):first]
+    xgboost, cnn = forecaster.predict_components(holdout, history)
+    # Also drop rows whose own weather is missing, so every fitted row is a full window_validity window
+    observed = np.isfinite(build_feature_matrix(holdout, feature_set=forecaster.feature_set)).all(axis=1)
+    cnn = {target: np.where(observed, values, np.nan) for target, values in cnn.items()}
+
+    weights = {}
+    for target, values in cnn.items():
+        actual = holdout[target].to_numpy(dtype=np.float64)
+        weights[target] = fit_blend_weights(xgboost[target], values, actual, args.stack)
+    forecaster.weights.update(weights)
+    blended = forecaster.blend(xgboost, cnn)
+
+    print(f"{'target':<8} {'MAE xgboost':>12} {'MAE cnn':>10} {'MAE blend':>10}  weights")
+    for target, values in cnn.items():
+        actual = holdout[target].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(values) & ~np.isnan(actual)
+        mae = [np.abs(p[valid] - actual[valid]).mean() for p in (xgboost[target], values, blended[target])]
+        print(f"{target:<8} {mae[0]:>12.2f} {mae[1]:>10.2f} {mae[2]:>10.2f}  {weights[target]}")
+
+    with open(args.output, 'w') as file:
+        json.dump(weights, file, indent=2)
+    logger.info(f"Wrote blend weights to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""Export trained CNN / LSTM checkpoints as self-contained CPU inference artifacts.
+
+    python export.py --architecture WindCNN --checkpoint wind_forecasting_model.pth \\
+        --target wind --output wind_model.pt --onnx wind_model.onnx
+
+Export steps:
+  1. BatchNorm layers are folded into the Conv1d before them (eval mode).
+  2. Linear and LSTM layers get dynamic int8 quantization (--no-quantize to skip).
+  3. The model is traced to TorchScript and saved with its feature layout
+     and min-max scaling constants as an extra file, so ExportedModel can
+     serve it with torch alone, without models.py or the notebooks.
+  4. Optionally, the folded float model is written as ONNX with a dynamic
+     batch axis (dynamic-quantized ops do not export to ONNX).
+
+The export then checks parity against the eager model on the test set
+(--test-set .npz with ``X`` windows and ``y`` targets in original units, or
+the chronologically last --test-fraction of the gap-free windows of the
+aligned database, as WindowedDataset trains on them) and benchmarks
+latency and throughput of both.
+"""
+import argparse
+import copy
+import io
+import json
+import logging
+import sys
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+from features import FEATURE_SETS, build_feature_matrix
+from models import ARCHITECTURES, build_model
+from alignment import window_validity
+from training_data import DATABASE_PATH, load_aligned
+from windows import sliding_windows
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+METADATA_FILE = 'metadata.json'
+
+
+def load_checkpoint(path, architecture):
+    """Rebuild the eager model from a notebook checkpoint or a bare state_dict"""
+    checkpoint = torch.load(path, map_location='cpu', weights_only=False)
+    state = checkpoint.get('model_state_dict', checkpoint)
+
+    kwargs = {}
+    if 'lstm.weight_ih_l0' in state:
+        input_size = state['lstm.weight_ih_l0'].shape[1]
+        kwargs['hidden_size'] = state['lstm.weight_hh_l0'].shape[1]
+        kwargs['num_layers'] = sum(key.startswith('lstm.weight_ih_l') for key in state)
+    else:
+        input_size = state['conv1.weight'].shape[1]
+    sequence_length = checkpoint.get('sequence_length') or ARCHITECTURES[architecture]['sequence_length']
+    # The last fully connected layer is the head: one output, or one per quantile
+    head = [key for key in state if key.startswith('fc') and key.endswith('.weight')][-1]
+    kwargs['output_size'] = state[head].shape[0]
+
+    model = build_model(architecture, input_size, sequence_length, **kwargs)
+    model.load_state_dict(state)
+    model.eval()
+    return model, checkpoint
+
+
+def fold_batchnorm(model):
+    """Copy of ``model`` with every convN / bnN pair fused into one Conv1d"""
+    model = copy.deepcopy(model).eval()
+    for name, module in list(model.named_children()):
+        bn_name = name.replace('conv', 'bn', 1)
+        if isinstance(module, nn.Conv1d) and isinstance(getattr(model, bn_name, None), nn.BatchNorm1d):
+            setattr(model, name, fuse_conv_bn_eval(module, getattr(model, bn_name)))
+            setattr(model, bn_name, nn.Identity())
+    return model
+
+
+def quantize(model):
+    """Dynamic int8 quantization of the Linear and LSTM layers"""
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear, nn.LSTM}, dtype=torch.qint8)
+
+
+def scaler_metadata(scaler):
+    # MinMaxScaler.transform is X * scale_ + min_
+    return {'scale': scaler.scale_.tolist(), 'min': scaler.min_.tolist()}
+
+
+def export_model(model, architecture, output, input_size, sequence_length, scaler_features=None,
+                 scaler_target=None, quantized=True, onnx_path=None):
+    """Fold, quantize, trace and save ``model``; returns the TorchScript module"""
+    folded = fold_batchnorm(model)
+    example = torch.zeros(2, sequence_length, input_size)
+
+    if onnx_path:
+        torch.onnx.export(folded, example, onnx_path, input_names=['x'], output_names=['y'],
+                          dynamic_axes={'x': {0: 'batch'}, 'y': {0: 'batch'}})
+        logger.info(f"Wrote ONNX graph to {onnx_path}")
+
+    deployable = quantize(folded) if quantized else folded
+    with torch.no_grad():
+        traced = torch.jit.trace(deployable, example)
+    if not quantized:
+        # Inlines the folded float weights as constants
+        traced = torch.jit.freeze(traced)
+
+    metadata = {
+        'architecture': architecture,
+        'feature_set': ARCHITECTURES[architecture]['feature_set'],
+        'features': FEATURE_SETS[ARCHITECTURES[architecture]['feature_set']],
+        'input_size': input_size,
+        'sequence_length': sequence_length,
+        'quantized': quantized,
+        'scaler_features': scaler_metadata(scaler_features) if scaler_features is not None else None,
+        'scaler_target': scaler_metadata(scaler_target) if scaler_target is not None else None,
+    }
+    torch.jit.save(traced, output, _extra_files={METADATA_FILE: json.dumps(metadata)})
+    logger.info(f"Wrote {'int8 ' if quantized else ''}TorchScript model to {output}")
+    return traced
+
+
+class ExportedModel:
+    """Load an exported artifact and predict in original units from raw feature windows"""
+
+    def __init__(self, path):
+        extra_files = {METADATA_FILE: ''}
+        self.module = torch.jit.load(path, map_location='cpu', _extra_files=extra_files)
+        self.module.eval()
+        self.metadata = json.loads(extra_files[METADATA_FILE])
+
+        scaler = self.metadata['scaler_features']
+        self.feature_scale = None if scaler is None else np.asarray(scaler['scale'], dtype=np.float32)
+        self.feature_min = None if scaler is None else np.asarray(scaler['min'], dtype=np.float32)
+        scaler = self.metadata['scaler_target']
+        self.target_scale = None if scaler is None else np.asarray(scaler['scale'], dtype=np.float32)
+        self.target_min = None if scaler is None else np.asarray(scaler['min'], dtype=np.float32)
+
+    def predict(self, windows):
+        """(batch, sequence_length, features) raw windows -> (batch,) or (batch, quantiles) predictions"""
+        windows = np.asarray(windows, dtype=np.float32)
+        if self.feature_scale is not None:
+            windows = windows * self.feature_scale + self.feature_min
+        with torch.no_grad():
+            output = self.module(torch.from_numpy(np.ascontiguousarray(windows))).numpy()
+        if self.target_scale is not None:
+            output = (output - self.target_min) / self.target_scale
+        # (rows,) for a point model, (rows, quantiles) for a quantile model
+        return output.ravel() if output.shape[1] == 1 else output
+
+
+def load_test_set(path, architecture, target, sequence_length, database_path, test_fraction):
+    """Raw (windows, targets) from an .npz file or the tail of the database"""
+    if path:
+        data = np.load(path)
+        return data['X'].astype(np.float32), data['y'].astype(np.float32).ravel()
+
+    aligned = load_aligned([target], database_path)
+    features = build_feature_matrix(aligned, feature_set=ARCHITECTURES[architecture]['feature_set'])
+    targets = aligned[target].to_numpy(dtype=np.float32)
+
+    # Only windows whose rows and target were all observed, like WindowedDataset
+    valid = np.isfinite(features).all(axis=1) & np.isfinite(targets)
+    starts = np.flatnonzero(window_validity(valid, sequence_length))
+    starts = starts[int(len(starts) * (1 - test_fraction)):]
+    return sliding_windows(features, sequence_length)[starts], targets[starts + sequence_length]
+
+
+def eager_predict(model, windows, scaler_features, scaler_target, batch_size=1024):
+    shape = windows.shape
+    scaled = scaler_features.transform(windows.reshape(-1, shape[2])).reshape(shape).astype(np.float32)
+    outputs = []
+    with torch.no_grad():
+        for start in range(0, len(scaled), batch_size):
+            outputs.append(model(torch.from_numpy(scaled[start:start + batch_size])).numpy())
+    outputs = np.concatenate(outputs)
+    predicted = scaler_target.inverse_transform(outputs.reshape(-1, 1)).reshape(outputs.shape)
+    return predicted.ravel() if predicted.shape[1] == 1 else predicted
+
+
+def check_parity(eager, exported, actual, target_range, tolerance):
+    """Differences between the two models relative to the target's training range"""
+    difference = np.abs(eager - exported)
+    if eager.ndim == 2:
+        # Quantile model: compare every quantile column against the actuals
+        actual = actual[:, None]
+    p99 = float(np.percentile(difference, 99)) / target_range
+    print(f"\nParity on {len(actual)} test windows")
+    print(f"  max |eager - exported|: {difference.max():.4f} ({difference.max() / target_range:.3%} of range)")
+    print(f"  p99 |eager - exported|: {p99:.3%} of range (tolerance {tolerance:.2%})")
+    print(f"  MAE eager: {np.abs(eager - actual).mean():.3f}, exported: {np.abs(exported - actual).mean():.3f}")
+    return p99 <= tolerance
+
+
+def time_module(module, batch, repeats):
+    """Median and p95 seconds per call"""
+    timings = []
+    with torch.no_grad():
+        for _ in range(max(3, repeats // 10)):
+            module(batch)
+        for _ in range(repeats):
+            started = time.perf_counter()
+            module(batch)
+            timings.append(time.perf_counter() - started)
+    return np.median(timings), np.percentile(timings, 95)
+
+
+def serialized_size(obj):
+    buffer = io.BytesIO()
+    if isinstance(obj, torch.jit.ScriptModule):
+        torch.jit.save(obj, buffer)
+    else:
+        torch.save(obj, buffer)
+    return buffer.tell()
+
+
+def benchmark(eager, exported, input_size, sequence_length, repeats=200, batch_size=1024):
+    print(f"\n{'model':<10} {'p50 ms @1':>10} {'p95 ms @1':>10} {f'rows/s @{batch_size}':>16} {'size MB':>8}")
+    for label, module in [('eager', eager), ('exported', exported)]:
+        p50, p95 = time_module(module, torch.rand(1, sequence_length, input_size), repeats)
+        batch_p50, _ = time_module(module, torch.rand(batch_size, sequence_length, input_size),
+                                   max(10, repeats // 20))
+        size = serialized_size(module.state_dict() if label == 'eager' else module) / 1e6
+        print(f"{label:<10} {p50 * 1e3:>10.3f} {p95 * 1e3:>10.3f} {batch_size / batch_p50:>16,.0f} {size:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a trained model for CPU inference")
+    parser.add_argument('--architecture', choices=list(ARCHITECTURES), required=True)
+    parser.add_argument('--checkpoint', required=True, help="Notebook .pth checkpoint or bare state_dict")
+    parser.add_argument('--target', choices=['solar', 'wind', 'demand'], required=True)
+    parser.add_argument('--output', required=True, help="TorchScript artifact path")
+    parser.add_argument('--onnx', default=None, help="Also write the folded float model as ONNX")
+    parser.add_argument('--no-quantize', action='store_true')
+    parser.add_argument('--test-set', default=None, help=".npz with raw X windows and y targets")
+    parser.add_argument('--test-fraction', type=float, default=0.3)
+    parser.add_argument('--database', default=DATABASE_PATH)
+    parser.add_argument('--tolerance', type=float, default=0.02,
+                        help="Max p99 eager/exported difference as a fraction of the target range")
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=None, help="torch.set_num_threads")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    model, checkpoint = load_checkpoint(args.checkpoint, args.architecture)
+    scaler_features, scaler_target = checkpoint.get('scaler_features'), checkpoint.get('scaler_target')
+    input_size = model.lstm.input_size if hasattr(model, 'lstm') else model.conv1.in_channels
+    sequence_length = checkpoint.get('sequence_length') or ARCHITECTURES[args.architecture]['sequence_length']
+
+    export_model(model, args.architecture, args.output, input_size, sequence_length, scaler_features,
+                 scaler_target, quantized=not args.no_quantize, onnx_path=args.onnx)
+    exported = ExportedModel(args.output)
+
+    passed = True
+    if scaler_features is None or scaler_target is None:
+        logger.warning("Checkpoint has no scalers; skipping the parity check")
+    else:
+        windows, actual = load_test_set(args.test_set, args.architecture, args.target, sequence_length,
+                                        args.database, args.test_fraction)
+        target_range = float(scaler_target.data_range_[0]) or 1.0
+        passed = check_parity(eager_predict(model, windows, scaler_features, scaler_target),
+                              exported.predict(windows), actual, target_range, args.tolerance)
+        print(f"  parity: {'PASS' if passed else 'FAIL'}")
+
+    benchmark(model, exported.module, input_size, sequence_length, args.repeats)
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
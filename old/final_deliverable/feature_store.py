@@ -0,0 +1,234 @@
+"""On-disk cache of prepared feature matrices, keyed by the state of the source tables.
+
+    features_scaled, targets_scaled, scaler_features, scaler_target = load_prepared(['solar'], 'base')
+
+An entry is addressed by a hash of the database path, each source table's
+row count and latest timestamp, the targets, and the feature layout (plus
+FEATURE_STORE_VERSION, to be bumped whenever features.py changes what a
+column means). It holds the raw and min-max scaled float32 matrices, the
+UTC epoch-nanosecond timestamps as .npy files, and the scaler parameters in
+meta.json. A hit memory-maps the arrays copy-on-write, so nothing is read
+until it is used and the cached files are never modified. Entry names
+also carry a short hash of the database path and the gap and quality
+policies, and a rebuild prunes only the superseded entries with that same
+hash, so stores over different databases or policies share a cache
+directory without evicting each other.
+
+Each write goes to a new version directory inside the entry, and the
+entry's ``current`` file is then swapped to name it with one atomic
+rename. A reader, or a crash, at any point sees either the old version or
+the new one, never a missing or half-written entry.
+
+Rows come from load_aligned, so the matrices cover every hour between the
+first and last common timestamp, with NaN wherever a gap was left masked;
+WindowedDataset skips windows touching those rows. The gap and quality
+policies are part of the key, and the quality report (quality.py) is kept
+in meta.json.
+
+Only row counts and max timestamps are fingerprinted: rows edited in place
+without adding new hours need ``refresh=True``.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import uuid
+from collections import namedtuple
+from contextlib import closing
+
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+
+from features import FEATURE_SETS, build_feature_matrix, to_epoch_ns
+from training_data import DATABASE_PATH, DEFAULT_GAP_POLICIES, DEFAULT_QUALITY_POLICIES, load_aligned
+
+logger = logging.getLogger(__name__)
+
+FEATURE_STORE_VERSION = 4
+
+FEATURE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'feature_cache')
+
+# source -> (table, timestamp column)
+SOURCE_TABLES = {
+    'weather': ('historical_weather_data', 'time'),
+    'solar': ('SUN_data_NE', 'datetime'),
+    'wind': ('WND_data_NE', 'datetime'),
+    'demand': ('demand_data_NE', 'datetime'),
+}
+
+ARRAYS = ['features', 'targets', 'epoch_ns', 'features_scaled', 'targets_scaled']
+
+# File inside an entry naming its current version directory
+POINTER = 'current'
+
+PreparedData = namedtuple('PreparedData', ARRAYS + ['scaler_features', 'scaler_target', 'key'])
+
+
+def source_fingerprint(database_path, targets):
+    """Row count and latest timestamp of the weather table and each target table"""
+    with closing(sqlite3.connect(f"file:{database_path}?mode=ro", uri=True)) as conn:
+        fingerprint = {}
+        for source in ['weather'] + list(targets):
+            table, column = SOURCE_TABLES[source]
+            fingerprint[source] = list(conn.execute(f"SELECT COUNT(*), MAX({column}) FROM {table}").fetchone())
+    return fingerprint
+
+
+def cache_key(fingerprint, targets, feature_set, policies=DEFAULT_GAP_POLICIES,
+              quality=DEFAULT_QUALITY_POLICIES, database_path=DATABASE_PATH):
+    config = {
+        'version': FEATURE_STORE_VERSION,
+        'database': os.path.abspath(database_path),
+        'sources': fingerprint,
+        'targets': list(targets),
+        'feature_set': feature_set,
+        'columns': FEATURE_SETS[feature_set],
+        'policies': {source: list(policies[source]) for source in ['weather'] + list(targets)},
+        'quality': {source: quality.get(source) for source in ['weather'] + list(targets)},
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def scope_key(database_path, policies, quality):
+    """Short hash of what an entry's data depends on besides the table state: prune only within it"""
+    config = {'database': os.path.abspath(database_path), 'policies': policies, 'quality': quality}
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=list).encode()).hexdigest()[:8]
+
+
+def scaler_params(scaler):
+    params = {name: getattr(scaler, name).tolist()
+              for name in ['min_', 'scale_', 'data_min_', 'data_max_', 'data_range_']}
+    params.update(feature_range=list(scaler.feature_range), n_samples_seen_=int(scaler.n_samples_seen_))
+    return params
+
+
+def scaler_from_params(params):
+    """Rebuild a fitted MinMaxScaler without refitting it"""
+    scaler = MinMaxScaler(feature_range=tuple(params['feature_range']))
+    for name in ['min_', 'scale_', 'data_min_', 'data_max_', 'data_range_']:
+        setattr(scaler, name, np.asarray(params[name], dtype=np.float64))
+    scaler.n_features_in_ = len(params['min_'])
+    scaler.n_samples_seen_ = params['n_samples_seen_']
+    return scaler
+
+
+class FeatureStore:
+    """Prepared training matrices cached under ``cache_dir``, one directory per entry"""
+
+    def __init__(self, database_path=DATABASE_PATH, cache_dir=FEATURE_CACHE_DIR, policies=None,
+                 quality=None):
+        self.database_path = database_path
+        self.cache_dir = cache_dir
+        self.policies = {**DEFAULT_GAP_POLICIES, **(policies or {})}
+        self.quality = {**DEFAULT_QUALITY_POLICIES, **(quality or {})}
+        self.scope = scope_key(database_path, self.policies, self.quality)
+
+    def entry_prefix(self, targets, feature_set):
+        return f"{feature_set}-{'-'.join(targets)}-{self.scope}-"
+
+    def entry_path(self, targets, feature_set, key):
+        return os.path.join(self.cache_dir, self.entry_prefix(targets, feature_set) + key)
+
+    def get(self, targets, feature_set='default', refresh=False):
+        """Cached PreparedData for ``targets`` / ``feature_set``, building it on a miss"""
+        targets = list(targets)
+        key = cache_key(source_fingerprint(self.database_path, targets), targets, feature_set,
+                        self.policies, self.quality, self.database_path)
+        path = self.entry_path(targets, feature_set, key)
+
+        if refresh or self.current(path) is None:
+            logger.info(f"Feature cache miss for {feature_set} {targets}; preparing {key}")
+            self.write(path, self.prepare(targets, feature_set))
+            self.prune(targets, feature_set, keep=path)
+        else:
+            logger.info(f"Feature cache hit for {feature_set} {targets} ({key})")
+        try:
+            return self.read(path, key)
+        except FileNotFoundError:
+            # A concurrent write replaced the version between reading the pointer and opening it
+            return self.read(path, key)
+
+    def prepare(self, targets, feature_set):
+        aligned = load_aligned(targets, self.database_path, self.policies, quality=self.quality)
+        features = build_feature_matrix(aligned, feature_set=feature_set)
+        target_values = aligned[targets].to_numpy(dtype=np.float32)
+        logger.info(f"{len(aligned)} hours, {int(np.isnan(features).any(axis=1).sum())} with masked weather, "
+                    f"{int(np.isnan(target_values).any(axis=1).sum())} with masked targets")
+
+        # MinMaxScaler ignores NaN when fitting and keeps it when transforming
+        scaler_features = MinMaxScaler().fit(features)
+        scaler_target = MinMaxScaler().fit(target_values)
+        return {
+            'features': features,
+            'targets': target_values,
+            'epoch_ns': to_epoch_ns(aligned['datetime']),
+            'features_scaled': scaler_features.transform(features).astype(np.float32),
+            'targets_scaled': scaler_target.transform(target_values).astype(np.float32),
+            'meta': {'scaler_features': scaler_params(scaler_features),
+                     'scaler_target': scaler_params(scaler_target),
+                     'targets': targets, 'feature_set': feature_set,
+                     'columns': FEATURE_SETS[feature_set],
+                     'quality': aligned.attrs['quality'].to_dict('records')},
+        }
+
+    def current(self, path):
+        """The entry's current version directory, or None if it has none"""
+        try:
+            with open(os.path.join(path, POINTER)) as file:
+                return os.path.join(path, file.read().strip())
+        except FileNotFoundError:
+            return None
+
+    def write(self, path, prepared):
+        """Write a new version directory, then swap the entry's pointer to it"""
+        os.makedirs(path, exist_ok=True)
+        version = f'v-{uuid.uuid4().hex}'
+        temporary = tempfile.mkdtemp(dir=path, prefix='.tmp-')
+        try:
+            for name in ARRAYS:
+                np.save(os.path.join(temporary, f'{name}.npy'), prepared[name])
+            with open(os.path.join(temporary, 'meta.json'), 'w') as file:
+                json.dump(prepared['meta'], file)
+            os.replace(temporary, os.path.join(path, version))
+
+            descriptor, pointer = tempfile.mkstemp(dir=path, prefix='.tmp-')
+            with os.fdopen(descriptor, 'w') as file:
+                file.write(version)
+            os.replace(pointer, os.path.join(path, POINTER))
+        finally:
+            shutil.rmtree(temporary, ignore_errors=True)
+
+        # Superseded versions; open memmaps of them stay readable until closed. Whatever the
+        # pointer names now is kept too, in case a concurrent write swapped it after ours
+        keep = {version, os.path.basename(self.current(path) or version)}
+        for name in os.listdir(path):
+            if name.startswith('v-') and name not in keep:
+                shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+    def read(self, path, key):
+        version = self.current(path)
+        if version is None:
+            raise FileNotFoundError(f"Feature cache entry {path} has no current version")
+        with open(os.path.join(version, 'meta.json')) as file:
+            meta = json.load(file)
+        arrays = {name: np.load(os.path.join(version, f'{name}.npy'), mmap_mode='c') for name in ARRAYS}
+        return PreparedData(**arrays, scaler_features=scaler_from_params(meta['scaler_features']),
+                            scaler_target=scaler_from_params(meta['scaler_target']), key=key)
+
+    def prune(self, targets, feature_set, keep):
+        """Remove superseded entries for the same targets, feature set, database and policies"""
+        prefix = self.entry_prefix(targets, feature_set)
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            # The remainder must be a bare key, so 'solar' never matches 'solar-wind'
+            if name.startswith(prefix) and '-' not in name[len(prefix):] and path != keep:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+def load_prepared(targets, feature_set='default', database_path=DATABASE_PATH, cache_dir=FEATURE_CACHE_DIR):
+    """Cached drop-in for load_merged_data + prepare_training_data"""
+    prepared = FeatureStore(database_path, cache_dir).get(targets, feature_set)
+    return prepared.features_scaled, prepared.targets_scaled, prepared.scaler_features, prepared.scaler_target
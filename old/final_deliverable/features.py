@@ -0,0 +1,126 @@
+"""Feature pipeline shared by the training notebooks and the dashboard.
+
+Every calendar feature is derived from one int64 array of UTC epoch
+nanoseconds with integer arithmetic and small lookup tables, and the output
+is written column by column into a single preallocated float32 matrix, so
+training and serving produce byte-identical inputs for the same rows.
+"""
+import numpy as np
+import pandas as pd
+
+WEATHER_FEATURES = ['temperature', 'dwpt', 'humidity', 'precipitation',
+                    'wdir', 'windspeed', 'pres', 'cloudcover']
+
+# Column layouts used by the models. 'default' is the dashboard / hierarchical
+# forecaster input (input_size=12); the others match the notebook models.
+FEATURE_SETS = {
+    'default': WEATHER_FEATURES + ['hour', 'month', 'season', 'time_of_day'],
+    'base': WEATHER_FEATURES + ['hour', 'month', 'season'],
+    'wind': ['temperature', 'dwpt', 'humidity', 'precipitation',
+             'wind_x', 'wind_y', 'windspeed', 'pres', 'cloudcover',
+             'hour', 'day_of_week', 'month', 'season'],
+    'demand': WEATHER_FEATURES + ['hour', 'day_of_week', 'month', 'season', 'time_of_day'],
+    # Union of the above, for the joint solar/wind/demand model
+    'joint': ['temperature', 'dwpt', 'humidity', 'precipitation', 'wdir',
+              'wind_x', 'wind_y', 'windspeed', 'pres', 'cloudcover',
+              'hour', 'day_of_week', 'month', 'season', 'time_of_day'],
+}
+
+CALENDAR_FEATURES = ['hour', 'day_of_week', 'month', 'season', 'time_of_day']
+
+NS_PER_HOUR = 3_600_000_000_000
+
+# Indexed by month (1-12): DJF=1, MAM=2, JJA=3, SON=4
+SEASON_BY_MONTH = np.array([0, 1, 1, 2, 2, 2, 3, 3, 3, 4, 4, 4, 1], dtype=np.int8)
+
+# Indexed by hour (0-23): night=1, morning=2, afternoon=3, evening=4
+TIME_OF_DAY_BY_HOUR = np.repeat(np.arange(1, 5, dtype=np.int8), 6)
+
+
+def column_indices(feature_set, within='joint'):
+    """Positions of ``feature_set``'s columns inside the ``within`` layout"""
+    return [FEATURE_SETS[within].index(name) for name in FEATURE_SETS[feature_set]]
+
+
+def to_epoch_ns(values):
+    """Convert datetimes (strings, naive or tz-aware) to int64 UTC epoch nanoseconds"""
+    if isinstance(values, np.ndarray) and values.dtype == np.int64:
+        return values
+
+    index = pd.DatetimeIndex(pd.to_datetime(values))
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return index.as_unit('ns').asi8
+
+
+class CalendarFeatures:
+    """Lazily computed calendar columns for one timestamp array"""
+
+    def __init__(self, epoch_ns):
+        self.hours = np.floor_divide(epoch_ns, NS_PER_HOUR)
+        self._cache = {}
+
+    def __getitem__(self, name):
+        if name not in self._cache:
+            self._cache[name] = getattr(self, f'_{name}')()
+        return self._cache[name]
+
+    def _days(self):
+        return np.floor_divide(self.hours, 24)
+
+    def _hour(self):
+        return self.hours - self['days'] * 24
+
+    def _day_of_week(self):
+        # 1970-01-01 was a Thursday; Monday=0 as in pandas dayofweek
+        return (self['days'] + 3) % 7
+
+    def _month(self):
+        # The datetime cast only runs once per distinct day, not once per row
+        days = self['days']
+        if days.size == 0:
+            return days
+        first = days.min()
+        span = np.arange(first, days.max() + 1).astype('datetime64[D]')
+        month_by_day = (span.astype('datetime64[M]').astype(np.int64) % 12 + 1).astype(np.int8)
+        return month_by_day[days - first]
+
+    def _season(self):
+        return SEASON_BY_MONTH[self['month']]
+
+    def _time_of_day(self):
+        return TIME_OF_DAY_BY_HOUR[self['hour']]
+
+
+def build_feature_matrix(weather, timestamps=None, feature_set='default', out=None):
+    """Build the float32 feature matrix for ``feature_set``.
+
+    ``weather`` is a DataFrame or mapping of weather columns. ``timestamps``
+    defaults to ``weather['datetime']``. Pass ``out`` to fill a preallocated
+    (rows, features) float32 array in place.
+    """
+    columns = FEATURE_SETS[feature_set] if isinstance(feature_set, str) else list(feature_set)
+    epoch_ns = to_epoch_ns(weather['datetime'] if timestamps is None else timestamps)
+    calendar = CalendarFeatures(epoch_ns)
+
+    if out is None:
+        out = np.empty((len(epoch_ns), len(columns)), dtype=np.float32)
+
+    for j, name in enumerate(columns):
+        if name in CALENDAR_FEATURES:
+            out[:, j] = calendar[name]
+        elif name in ('wind_x', 'wind_y'):
+            speed = np.asarray(weather['windspeed'], dtype=np.float64)
+            direction = np.radians(np.asarray(weather['wdir'], dtype=np.float64))
+            out[:, j] = speed * (np.cos(direction) if name == 'wind_x' else np.sin(direction))
+        else:
+            out[:, j] = np.asarray(weather[name], dtype=np.float64)
+
+    return out
+
+
+def build_feature_frame(weather, timestamps=None, feature_set='default'):
+    """Same as build_feature_matrix, wrapped in a DataFrame without copying"""
+    columns = FEATURE_SETS[feature_set] if isinstance(feature_set, str) else list(feature_set)
+    matrix = build_feature_matrix(weather, timestamps, columns)
+    return pd.DataFrame(matrix, columns=columns, copy=False)
@@ -0,0 +1,232 @@
+"""Incremental fine-tuning of a CNN / LSTM on the hours ingested since it was last trained.
+
+    python finetune.py --target solar --architecture EnergyCNN \\
+        --checkpoint solar_cnn_checkpoint.pth --watermark "2024-06-30 23:00"   # first run
+    python finetune.py --target solar --architecture EnergyCNN                # daily
+
+Versions of each target / architecture live in model_versions/<target>-<architecture>/
+as v<N>.pth checkpoints plus a manifest.json recording, for each version, its
+parent, its watermark (the last hour it was trained on) and its holdout error,
+and a log of every run. The first run registers --checkpoint as version 1
+with the given --watermark. Each run then:
+
+  1. takes the hours after the current version's watermark and holds out the
+     last --holdout-hours of them, which no version has been trained on,
+  2. fine-tunes a copy of the current weights for --epochs at
+     learning_rate * --lr-scale on a replay buffer: every window ending in a
+     new hour, plus --replay-ratio times as many sampled from the
+     --replay-hours before the watermark so the model does not forget them,
+  3. scores the current and the fine-tuned model on the holdout windows and
+     registers the candidate only if its MAE is at most (1 + --tolerance)
+     times the current MAE.
+
+The new watermark is the last training hour, so today's holdout hours are
+trained on in the next run. Every version keeps the scalers of version 1,
+so all of them read identically scaled inputs; version checkpoints load
+with export.load_checkpoint.
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import torch
+
+from backtest import score
+from batching import make_loader
+from export import load_checkpoint
+from feature_store import FeatureStore
+from models import ARCHITECTURES
+from trainer import Trainer, save_checkpoint
+from training_data import DATABASE_PATH
+from windows import WindowedDataset
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+MODEL_VERSIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_versions')
+
+
+def format_hour(epoch_ns):
+    return pd.Timestamp(int(epoch_ns)).strftime('%Y-%m-%d %H:%M')
+
+
+class VersionStore:
+    """Accepted versions of one target / architecture and the log of fine-tuning runs"""
+
+    def __init__(self, target, architecture, root=MODEL_VERSIONS_DIR):
+        self.directory = os.path.join(root, f'{target}-{architecture}')
+        self.manifest_path = os.path.join(self.directory, 'manifest.json')
+        self.manifest = {'target': target, 'architecture': architecture,
+                         'current': None, 'versions': [], 'runs': []}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as file:
+                self.manifest = json.load(file)
+
+    @property
+    def current(self):
+        for entry in self.manifest['versions']:
+            if entry['version'] == self.manifest['current']:
+                return entry
+        return None
+
+    def checkpoint_path(self, entry):
+        return os.path.join(self.directory, entry['checkpoint'])
+
+    def register(self, payload, watermark, parent=None, **metrics):
+        """Save ``payload`` as the next version and make it current"""
+        version = len(self.manifest['versions']) + 1
+        entry = {'version': version, 'checkpoint': f'v{version}.pth', 'parent': parent,
+                 'watermark': watermark, 'created': datetime.now(timezone.utc).isoformat(), **metrics}
+        save_checkpoint({**payload, 'watermark': watermark}, self.checkpoint_path(entry))
+        self.manifest['versions'].append(entry)
+        self.manifest['current'] = version
+        self.save()
+        logger.info(f"Registered version {version} (watermark {watermark})")
+        return entry
+
+    def record_run(self, run):
+        self.manifest['runs'].append({'finished': datetime.now(timezone.utc).isoformat(), **run})
+        self.save()
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = f"{self.manifest_path}.tmp-{os.getpid()}"
+        with open(temporary, 'w') as file:
+            json.dump(self.manifest, file, indent=2)
+        os.replace(temporary, self.manifest_path)
+
+
+def checkpoint_payload(model, checkpoint):
+    """What a version checkpoint keeps: weights, scalers and window length"""
+    return {'model_state_dict': model.state_dict(),
+            'scaler_features': checkpoint['scaler_features'],
+            'scaler_target': checkpoint['scaler_target'],
+            'sequence_length': checkpoint.get('sequence_length')}
+
+
+def replay_buffer(target_rows, watermark_row, holdout_start, replay_hours, replay_ratio, rng):
+    """Dataset indices of all new training windows plus a sample of recent ones before them"""
+    new = np.flatnonzero((target_rows > watermark_row) & (target_rows < holdout_start))
+    recent = np.flatnonzero((target_rows <= watermark_row) & (target_rows > watermark_row - replay_hours))
+    count = min(len(recent), int(round(len(new) * replay_ratio)))
+    return new, np.concatenate([new, rng.choice(recent, size=count, replace=False)])
+
+
+def predict(model, dataset, indices, scaler_target, batch_size=2048):
+    """Predictions in original units for the windows at ``indices``"""
+    model.eval()
+    outputs = []
+    with torch.no_grad():
+        for start in range(0, len(indices), batch_size):
+            batch_X, _ = dataset.get_batch(indices[start:start + batch_size])
+            outputs.append(model(batch_X).numpy())
+    return scaler_target.inverse_transform(np.concatenate(outputs)).ravel()
+
+
+def finetune(target, architecture, checkpoint=None, watermark=None, holdout_hours=24 * 7,
+             replay_hours=24 * 90, replay_ratio=1.0, epochs=3, lr_scale=0.1, tolerance=0.0,
+             min_new_hours=24, database_path=DATABASE_PATH, root=MODEL_VERSIONS_DIR, seed=0):
+    """Fine-tune the current version on newly ingested hours; returns the run record"""
+    store = VersionStore(target, architecture, root)
+    if store.current is None:
+        if not (checkpoint and watermark):
+            raise ValueError(f"No versions in {store.directory}; pass --checkpoint and --watermark")
+        model, base = load_checkpoint(checkpoint, architecture)
+        store.register(checkpoint_payload(model, base), format_hour(pd.Timestamp(watermark).value),
+                       source=os.path.abspath(checkpoint))
+
+    current = store.current
+    model, checkpoint = load_checkpoint(store.checkpoint_path(current), architecture)
+    spec = ARCHITECTURES[architecture]
+    sequence_length = checkpoint.get('sequence_length') or spec['sequence_length']
+    scaler_features, scaler_target = checkpoint['scaler_features'], checkpoint['scaler_target']
+
+    prepared = FeatureStore(database_path).get([target], spec['feature_set'])
+    watermark_row = int(np.searchsorted(prepared.epoch_ns, pd.Timestamp(current['watermark']).value,
+                                        side='right')) - 1
+    first = max(watermark_row - replay_hours - sequence_length + 1, 0)
+    dataset = WindowedDataset(scaler_features.transform(prepared.features[first:]),
+                              scaler_target.transform(prepared.targets[first:]), sequence_length)
+    # Row numbers below are relative to ``first``
+    target_rows = dataset.start_rows + sequence_length
+    watermark_row -= first
+    n_rows = len(prepared.features) - first
+    holdout_start = max(n_rows - holdout_hours, watermark_row + 1)
+
+    run = {'parent': current['version'], 'watermark': current['watermark'],
+           'new_hours': int(n_rows - 1 - watermark_row), 'accepted': False}
+    new, buffer = replay_buffer(target_rows, watermark_row, holdout_start, replay_hours,
+                                replay_ratio, np.random.default_rng(seed))
+    holdout = np.flatnonzero(target_rows >= holdout_start)
+    if len(new) < min_new_hours or len(holdout) == 0:
+        logger.info(f"{len(new)} new training windows and {len(holdout)} holdout windows "
+                    f"since {current['watermark']}; nothing to do")
+        store.record_run({**run, 'status': 'skipped'})
+        return run
+
+    torch.manual_seed(seed)
+    candidate = copy.deepcopy(model)
+    optimizer = torch.optim.Adam(candidate.parameters(), lr=spec['learning_rate'] * lr_scale,
+                                 weight_decay=spec['weight_decay'])
+    loader = make_loader(dataset, buffer, spec['batch_size'], shuffle=True, seed=seed)
+    Trainer(candidate, optimizer, clip_grad_norm=spec.get('clip_grad_norm')).fit(
+        loader, num_epochs=epochs, verbose=False)
+
+    actual = prepared.targets[first:, 0][target_rows[holdout]]
+    current_scores = score(actual, predict(model, dataset, holdout, scaler_target))
+    candidate_scores = score(actual, predict(candidate, dataset, holdout, scaler_target))
+    run.update(status='evaluated', train_windows=int(len(new)), replay_windows=int(len(buffer) - len(new)),
+               holdout_windows=int(len(holdout)), current_mae=float(current_scores['MAE']),
+               candidate_mae=float(candidate_scores['MAE']))
+    logger.info(f"Holdout MAE over {len(holdout)} hours: current {run['current_mae']:.3f}, "
+                f"fine-tuned {run['candidate_mae']:.3f}")
+
+    if run['candidate_mae'] <= run['current_mae'] * (1 + tolerance):
+        last_trained = format_hour(prepared.epoch_ns[first + target_rows[new].max()])
+        entry = store.register(checkpoint_payload(candidate, checkpoint), last_trained,
+                               parent=current['version'], holdout_mae=run['candidate_mae'],
+                               holdout_rmse=float(candidate_scores['RMSE']))
+        run.update(accepted=True, version=entry['version'])
+    else:
+        logger.info(f"Fine-tuned model regressed; keeping version {current['version']}")
+    store.record_run(run)
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fine-tune a forecasting network on newly ingested hours")
+    parser.add_argument('--target', choices=['solar', 'wind', 'demand'], required=True)
+    parser.add_argument('--architecture', choices=list(ARCHITECTURES), required=True)
+    parser.add_argument('--checkpoint', help="Initial checkpoint, registered as version 1 on the first run")
+    parser.add_argument('--watermark', help="Last hour the initial checkpoint was trained on (UTC)")
+    parser.add_argument('--holdout-hours', type=int, default=24 * 7)
+    parser.add_argument('--replay-hours', type=int, default=24 * 90)
+    parser.add_argument('--replay-ratio', type=float, default=1.0,
+                        help="Replayed windows per new window")
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--lr-scale', type=float, default=0.1)
+    parser.add_argument('--tolerance', type=float, default=0.0,
+                        help="Accepted relative MAE increase on the holdout")
+    parser.add_argument('--min-new-hours', type=int, default=24)
+    parser.add_argument('--database', default=DATABASE_PATH)
+    parser.add_argument('--versions-dir', default=MODEL_VERSIONS_DIR)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    run = finetune(args.target, args.architecture, args.checkpoint, args.watermark, args.holdout_hours,
+                   args.replay_hours, args.replay_ratio, args.epochs, args.lr_scale, args.tolerance,
+                   args.min_new_hours, args.database, args.versions_dir, args.seed)
+    print(json.dumps(run, indent=2))
+
+
+if __name__ == "__main__":
+    main()
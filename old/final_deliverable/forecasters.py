@@ -0,0 +1,152 @@
+import json
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from features import FEATURE_SETS, build_feature_matrix
+from registry import file_digest
+
+TARGETS = ['solar', 'wind', 'demand']
+
+# Dashboard horizon label -> key in the forecaster's prediction dict
+HORIZONS = {'24h': '24', '1w': '168', '30d': '720'}
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models')
+
+# Native XGBoost formats are tried first; the pickles are the fallback
+MODEL_FORMATS = ['ubj', 'json', 'pkl']
+
+# Booster attribute listing the quantiles of a multi-quantile booster (quantiles.py)
+QUANTILE_ATTR = 'quantiles'
+
+
+def quantile_labels(quantiles):
+    """Column suffixes for ``quantiles``: 0.1 -> 'p10'"""
+    return [f'p{round(q * 100):02d}' for q in quantiles]
+
+
+def booster_quantiles(booster):
+    """The quantiles a booster was trained for, or None for a point-forecast booster"""
+    attr = booster.attr(QUANTILE_ATTR) if hasattr(booster, 'attr') else None
+    return json.loads(attr) if attr else None
+
+
+def model_path(model_dir, target):
+    """Path of the stored model for ``target``, preferring the native formats"""
+    for extension in MODEL_FORMATS:
+        path = os.path.join(model_dir, f'{target}_model.{extension}')
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"No {target} model in {model_dir}")
+
+
+def load_booster(path):
+    """Load an xgboost.Booster from UBJSON / JSON, or from a pickled XGBRegressor"""
+    if path.endswith('.pkl'):
+        with open(path, 'rb') as file:
+            model = pickle.load(file)
+        return model.get_booster() if hasattr(model, 'get_booster') else model
+
+    booster = xgb.Booster()
+    booster.load_model(path)
+    return booster
+
+
+class XGBoostForecaster:
+    """Solar, wind and demand forecaster backed by the stored XGBoost boosters.
+
+    With a ``registry`` the boosters are loaded once per process and shared
+    by every forecaster built on it; each is registered as ``xgboost/<target>``
+    with the model file's digest as its version.
+
+    Boosters trained by quantiles.py emit every quantile from one
+    ``inplace_predict``; their median is the point forecast and ``predict``
+    also returns the bands under ``predictions[target]['quantiles']``.
+    """
+
+    feature_set = 'default'
+
+    def __init__(self, model_dir=MODEL_DIR, registry=None):
+        self.models = {}
+        self.quantiles = {}
+        for target in TARGETS:
+            name = f'xgboost/{target}'
+            booster = registry.get(name) if registry is not None else None
+            if booster is None:
+                path = model_path(model_dir, target)
+                booster = load_booster(path)
+                if registry is not None:
+                    registry.register(name, booster, version=file_digest(path))
+            self.models[target] = booster
+            quantiles = booster_quantiles(booster)
+            if quantiles:
+                self.quantiles[target] = quantiles
+
+    def predict(self, weather_data):
+        """Predict every target for each row of ``weather_data``"""
+        features = build_feature_matrix(weather_data, feature_set=self.feature_set)
+
+        predictions = {}
+        for target, values in self.predict_outputs(features).items():
+            # The regressors only see the weather at the target hour, so every
+            # horizon shares the same values
+            point = self.point_forecast(target, values)
+            predictions[target] = {horizon: point for horizon in HORIZONS.values()}
+            if target in self.quantiles:
+                predictions[target]['quantiles'] = dict(zip(quantile_labels(self.quantiles[target]), values.T))
+        return predictions
+
+    def predict_features(self, features):
+        """Point forecast of every target from one prepared (rows, features) matrix"""
+        return {target: self.point_forecast(target, values)
+                for target, values in self.predict_outputs(features).items()}
+
+    def predict_outputs(self, features):
+        """Booster outputs per target: (rows,) for point boosters, (rows, quantiles) for quantile boosters.
+
+        The matrix is handed to each booster's ``inplace_predict`` as is, so
+        no DMatrix or per-target copy is built.
+        """
+        if isinstance(features, pd.DataFrame):
+            features = features[FEATURE_SETS[self.feature_set]].to_numpy(dtype=np.float32)
+        features = np.ascontiguousarray(features, dtype=np.float32)
+
+        outputs = {}
+        for target, booster in self.models.items():
+            values = booster.inplace_predict(features, validate_features=False)
+            if target in self.quantiles:
+                # Each quantile is fitted separately and they can cross; sorting a row restores the order
+                values = np.sort(values.reshape(len(features), -1), axis=1)
+            outputs[target] = values
+        return outputs
+
+    def point_forecast(self, target, values):
+        """The median column of a quantile booster's output, the output itself otherwise"""
+        if target not in self.quantiles:
+            return values
+        return values[:, int(np.argmin(np.abs(np.asarray(self.quantiles[target]) - 0.5)))]
+
+
+def forecast_frame(forecaster, weather_data, history=None):
+    """Run ``forecaster`` and label its outputs as <target>_<horizon> columns
+
+    ``history`` (earlier weather rows) is passed on to forecasters that read
+    lookback, i.e. those with a ``lookback_hours`` attribute.
+    """
+    if history is not None and getattr(forecaster, 'lookback_hours', 0):
+        predictions = forecaster.predict(weather_data, history=history)
+    else:
+        predictions = forecaster.predict(weather_data)
+
+    results = {'datetime': pd.to_datetime(weather_data['datetime']).to_numpy()}
+    for target in TARGETS:
+        bands = predictions[target].get('quantiles', {})
+        for label, horizon in HORIZONS.items():
+            results[f'{target}_{label}'] = predictions[target][horizon]
+            # Quantile models add <target>_<horizon>_p10 / _p50 / _p90
+            for quantile, values in bands.items():
+                results[f'{target}_{label}_{quantile}'] = values
+    return pd.DataFrame(results)
@@ -0,0 +1,256 @@
+"""Named timing spans, counters and histograms for the collectors, dashboard and service.
+
+    from instrumentation import count, span, timed
+
+    with span('eia.fetch', region=region):
+        response = requests.get(endpoint, params=params)
+    count('eia.records_stored', stored_count, region=region)
+
+    @timed('dashboard.create_plots')
+    def create_plots(...): ...
+
+Nothing is recorded unless the ENERGY_METRICS environment variable is set
+(or ``metrics.enable()`` is called). While disabled, ``span`` returns one
+shared no-op context manager and ``count`` / ``observe`` return after a
+single attribute check, so instrumented code runs as before.
+
+ENERGY_METRICS=1 keeps the metrics in memory (service.py serves them at
+/metrics?format=prometheus); ENERGY_METRICS=<path> also writes them there in
+Prometheus text format on ``flush()`` and at exit. A span records its
+duration in the ``<name>_seconds`` histogram and counts exceptions that
+escape it in ``<name>_errors_total``.
+
+ENERGY_PROFILE=<directory> makes every ``profiled(name)`` block (a collector
+run, a dashboard rerun) dump a cProfile file <name>-<time>-<pid>.prof there,
+readable with ``python -m pstats`` or snakeviz. py-spy needs no support from
+here: ``py-spy record --pid <pid>`` attaches to any of these processes.
+"""
+import atexit
+import cProfile
+import logging
+import math
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENV = 'ENERGY_METRICS'
+PROFILE_ENV = 'ENERGY_PROFILE'
+METRIC_PREFIX = 'energy_'
+
+# Upper bounds in seconds; the last bucket catches everything
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, math.inf)
+
+
+def metric_name(name, suffix=''):
+    return METRIC_PREFIX + re.sub(r'[^a-zA-Z0-9_]', '_', name) + suffix
+
+
+def format_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+
+class Histogram:
+    """Counts per bucket (non-cumulative), plus sum and count"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class NullSpan:
+    """What ``span`` returns while metrics are disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.seconds = time.perf_counter() - self.started
+        self.metrics.observe(f'{self.name}_seconds', self.seconds, **self.labels)
+        if exc_type is not None:
+            self.metrics.count(f'{self.name}_errors', **self.labels)
+        return False
+
+
+class Metrics:
+    """Thread-safe counters and histograms keyed by name and labels"""
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def enable(self, path=None):
+        self.enabled = True
+        self.path = path or self.path
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def span(self, name, **labels):
+        """Context manager timing its block into the ``<name>_seconds`` histogram"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, labels)
+
+    def snapshot(self):
+        """Counters and histogram summaries as plain dicts"""
+        with self.lock:
+            counters = {metric_name(name, '_total') + format_labels(labels): value
+                        for (name, labels), value in self.counters.items()}
+            histograms = {metric_name(name) + format_labels(labels):
+                          {'count': h.count, 'sum': h.sum, 'mean': h.sum / h.count if h.count else 0.0}
+                          for (name, labels), h in self.histograms.items()}
+        return {'counters': counters, 'histograms': histograms}
+
+    def prometheus_text(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, (h.buckets, list(h.counts), h.sum, h.count))
+                                for key, h in self.histograms.items())
+
+        typed = set()
+        for (name, labels), value in counters:
+            full = metric_name(name, '_total')
+            if full not in typed:
+                lines.append(f'# TYPE {full} counter')
+                typed.add(full)
+            lines.append(f'{full}{format_labels(labels)} {value}')
+
+        for (name, labels), (buckets, counts, total, observations) in histograms:
+            full = metric_name(name)
+            if full not in typed:
+                lines.append(f'# TYPE {full} histogram')
+                typed.add(full)
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                le = '+Inf' if math.isinf(bound) else repr(bound)
+                lines.append(f'{full}_bucket{format_labels(labels, ("le", le))} {cumulative}')
+            lines.append(f'{full}_sum{format_labels(labels)} {total}')
+            lines.append(f'{full}_count{format_labels(labels)} {observations}')
+        return '\n'.join(lines) + '\n'
+
+    def flush(self, path=None):
+        """Write the Prometheus text to ``path`` (default: the ENERGY_METRICS file), atomically"""
+        path = path or self.path
+        if not (self.enabled and path):
+            return
+        temporary = f"{path}.tmp-{os.getpid()}"
+        with open(temporary, 'w') as file:
+            file.write(self.prometheus_text())
+        os.replace(temporary, path)
+
+
+metrics = Metrics()
+count = metrics.count
+observe = metrics.observe
+span = metrics.span
+
+
+def timed(name, **labels):
+    """Decorator timing every call of the function as span ``name``"""
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return function(*args, **kwargs)
+            with Span(metrics, name, labels):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def profiled(name, directory=None):
+    """cProfile the block and dump it to ENERGY_PROFILE (or ``directory``) when set"""
+    directory = directory or os.environ.get(PROFILE_ENV)
+    if not directory:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is already active in this process (e.g. a concurrent dashboard session)
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof")
+        profiler.dump_stats(path)
+        logger.info(f"Wrote profile {path}")
+
+
+def configure_from_environment():
+    target = os.environ.get(METRICS_ENV)
+    if target:
+        metrics.enable(None if target == '1' else target)
+        atexit.register(metrics.flush)
+
+
+configure_from_environment()
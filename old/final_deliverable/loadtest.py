@@ -0,0 +1,92 @@
+"""Load test for service.py against a local instance.
+
+    python service.py --port 8600 &
+    python loadtest.py --url http://127.0.0.1:8600 --concurrency 32 --duration 30
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import requests
+
+from service import ARROW_MIME
+
+
+def synthetic_weather(hours, start='2024-06-01', seed=0):
+    """Plausible hourly New England weather rows as JSON-ready records"""
+    rng = np.random.default_rng(seed)
+    datetime = pd.date_range(start, periods=hours, freq='h')
+    hour = datetime.hour.to_numpy()
+    temperature = 18 + 8 * np.sin((hour - 9) / 24 * 2 * np.pi) + rng.normal(0, 1.5, hours)
+    weather = pd.DataFrame({
+        'datetime': datetime.strftime('%Y-%m-%dT%H:%M:%S'),
+        'temperature': temperature,
+        'dwpt': temperature - rng.uniform(2, 8, hours),
+        'humidity': rng.uniform(40, 95, hours),
+        'precipitation': rng.exponential(0.2, hours) * (rng.random(hours) < 0.15),
+        'wdir': rng.uniform(0, 360, hours),
+        'windspeed': rng.gamma(2.0, 6.0, hours),
+        'pres': rng.normal(1015, 6, hours),
+        'cloudcover': rng.integers(1, 9, hours).astype(float),
+    })
+    return weather.to_dict(orient='records')
+
+
+def worker(url, payload, headers, deadline, latencies, errors, lock):
+    session = requests.Session()
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = session.post(f"{url}/forecast", json=payload, headers=headers, timeout=60)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors.append(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the forecast service")
+    parser.add_argument('--url', default='http://127.0.0.1:8600')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20.0, help="Seconds to run")
+    parser.add_argument('--hours', type=int, default=24, help="Weather rows per request")
+    parser.add_argument('--arrow', action='store_true', help="Request Arrow instead of JSON")
+    args = parser.parse_args()
+
+    payload = {'weather': synthetic_weather(args.hours)}
+    headers = {'Accept': ARROW_MIME} if args.arrow else {}
+    latencies, errors, lock = [], [], threading.Lock()
+
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(args.url, payload, headers, deadline, latencies, errors, lock))
+        for _ in range(args.concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    print(f"Requests: {len(latencies)} ok, {len(errors)} failed in {elapsed:.1f}s "
+          f"({args.concurrency} clients, {args.hours} rows each)")
+    print(f"Throughput: {len(latencies) / elapsed:.1f} req/s, {len(latencies) * args.hours / elapsed:.0f} rows/s")
+    if latencies:
+        p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+        print(f"Latency: p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms")
+
+    server = requests.get(f"{args.url}/metrics", timeout=10).json()
+    print(f"Server: {server['batches']} batches, "
+          f"{server['mean_batch_requests']:.1f} requests per batch on average")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""Model architectures from CNNenergy.ipynb and RNNenergy.ipynb.
+
+The classes are the notebook definitions, kept here so training, benchmarks
+and serving all import the same code. ARCHITECTURES records each notebook's
+input layout and hyperparameters. Every architecture takes ``output_size``
+(1 in the notebooks); quantiles.py uses it for one output per quantile.
+"""
+import torch.nn as nn
+
+from features import FEATURE_SETS
+
+
+class EnergyCNN(nn.Module):
+    def __init__(self, input_channels, sequence_length, output_size=1):
+        super(EnergyCNN, self).__init__()
+
+        # First convolutional block
+        self.conv1 = nn.Conv1d(in_channels=input_channels,
+                              out_channels=32,
+                              kernel_size=3,
+                              padding=1)
+        self.bn1 = nn.BatchNorm1d(32)
+        self.pool1 = nn.MaxPool1d(kernel_size=2)
+
+        # Second convolutional block
+        self.conv2 = nn.Conv1d(in_channels=32,
+                              out_channels=64,
+                              kernel_size=3,
+                              padding=1)
+        self.bn2 = nn.BatchNorm1d(64)
+        self.pool2 = nn.MaxPool1d(kernel_size=2)
+
+        # Calculate size after convolutions and pooling
+        self.flatten_size = 64 * (sequence_length // 4)
+
+        # Fully connected layers
+        self.fc1 = nn.Linear(self.flatten_size, 128)
+        self.dropout = nn.Dropout(0.3)
+        self.fc2 = nn.Linear(128, output_size)
+
+        self.relu = nn.ReLU()
+
+    def forward(self, x):
+        # Input shape: (batch_size, sequence_length, features)
+        # Reshape for CNN: (batch_size, features, sequence_length)
+        x = x.transpose(1, 2)
+
+        # First conv block
+        x = self.conv1(x)
+        x = self.bn1(x)
+        x = self.relu(x)
+        x = self.pool1(x)
+
+        # Second conv block
+        x = self.conv2(x)
+        x = self.bn2(x)
+        x = self.relu(x)
+        x = self.pool2(x)
+
+        # Flatten and fully connected layers
+        x = x.reshape(x.size(0), -1)
+        x = self.fc1(x)
+        x = self.relu(x)
+        x = self.dropout(x)
+        x = self.fc2(x)
+
+        return x
+
+
+class DemandCNN(nn.Module):
+    def __init__(self, input_channels, sequence_length, output_size=1):
+        super(DemandCNN, self).__init__()
+
+        # First convolutional block with larger filters
+        self.conv1 = nn.Conv1d(in_channels=input_channels,
+                              out_channels=64,
+                              kernel_size=5,
+                              padding=2)
+        self.bn1 = nn.BatchNorm1d(64)
+        self.pool1 = nn.MaxPool1d(kernel_size=2)
+
+        # Second convolutional block
+        self.conv2 = nn.Conv1d(in_channels=64,
+                              out_channels=128,
+                              kernel_size=3,
+                              padding=1)
+        self.bn2 = nn.BatchNorm1d(128)
+        self.pool2 = nn.MaxPool1d(kernel_size=2)
+
+        # Third convolutional block
+        self.conv3 = nn.Conv1d(in_channels=128,
+                              out_channels=256,
+                              kernel_size=3,
+                              padding=1)
+        self.bn3 = nn.BatchNorm1d(256)
+        self.pool3 = nn.MaxPool1d(kernel_size=2)
+
+        # Calculate size after convolutions and pooling
+        self.flatten_size = 256 * (sequence_length // 8)
+
+        # Fully connected layers
+        self.fc1 = nn.Linear(self.flatten_size, 512)
+        self.dropout1 = nn.Dropout(0.4)
+        self.fc2 = nn.Linear(512, 128)
+        self.dropout2 = nn.Dropout(0.3)
+        self.fc3 = nn.Linear(128, output_size)
+
+        self.relu = nn.ReLU()
+
+    def forward(self, x):
+        # Reshape for CNN
+        x = x.transpose(1, 2)
+
+        # First conv block
+        x = self.conv1(x)
+        x = self.bn1(x)
+        x = self.relu(x)
+        x = self.pool1(x)
+
+        # Second conv block
+        x = self.conv2(x)
+        x = self.bn2(x)
+        x = self.relu(x)
+        x = self.pool2(x)
+
+        # Third conv block
+        x = self.conv3(x)
+        x = self.bn3(x)
+        x = self.relu(x)
+        x = self.pool3(x)
+
+        # Flatten and fully connected layers
+        x = x.reshape(x.size(0), -1)
+        x = self.fc1(x)
+        x = self.relu(x)
+        x = self.dropout1(x)
+        x = self.fc2(x)
+        x = self.relu(x)
+        x = self.dropout2(x)
+        x = self.fc3(x)
+
+        return x
+
+
+class WindCNN(nn.Module):
+    def __init__(self, input_channels, sequence_length, output_size=1):
+        super(WindCNN, self).__init__()
+
+        # First convolutional block with larger kernel for wind patterns
+        self.conv1 = nn.Conv1d(in_channels=input_channels,
+                              out_channels=64,
+                              kernel_size=7,  # Larger kernel for wind patterns
+                              padding=3)
+        self.bn1 = nn.BatchNorm1d(64)
+        self.pool1 = nn.MaxPool1d(kernel_size=2)
+
+        # Second convolutional block with dilation for larger receptive field
+        self.conv2 = nn.Conv1d(in_channels=64,
+                              out_channels=128,
+                              kernel_size=5,
+                              padding=4,
+                              dilation=2)  # Dilated convolution
+        self.bn2 = nn.BatchNorm1d(128)
+        self.pool2 = nn.MaxPool1d(kernel_size=2)
+
+        # Third convolutional block for fine-grained features
+        self.conv3 = nn.Conv1d(in_channels=128,
+                              out_channels=256,
+                              kernel_size=3,
+                              padding=1)
+        self.bn3 = nn.BatchNorm1d(256)
+        self.pool3 = nn.MaxPool1d(kernel_size=2)
+
+        # Calculate size after convolutions and pooling
+        self.flatten_size = 256 * (sequence_length // 8)
+
+        # Fully connected layers
+        self.fc1 = nn.Linear(self.flatten_size, 512)
+        self.dropout1 = nn.Dropout(0.5)  # Higher dropout for wind's volatility
+        self.fc2 = nn.Linear(512, 128)
+        self.dropout2 = nn.Dropout(0.3)
+        self.fc3 = nn.Linear(128, output_size)
+
+        self.relu = nn.ReLU()
+        self.leaky_relu = nn.LeakyReLU(0.1)  # LeakyReLU for better gradient flow
+
+    def forward(self, x):
+        # Reshape for CNN
+        x = x.transpose(1, 2)
+
+        # First conv block
+        x = self.conv1(x)
+        x = self.bn1(x)
+        x = self.leaky_relu(x)  # Using LeakyReLU
+        x = self.pool1(x)
+
+        # Second conv block
+        x = self.conv2(x)
+        x = self.bn2(x)
+        x = self.leaky_relu(x)
+        x = self.pool2(x)
+
+        # Third conv block
+        x = self.conv3(x)
+        x = self.bn3(x)
+        x = self.leaky_relu(x)
+        x = self.pool3(x)
+
+        # Flatten and fully connected layers
+        x = x.reshape(x.size(0), -1)
+        x = self.fc1(x)
+        x = self.leaky_relu(x)
+        x = self.dropout1(x)
+        x = self.fc2(x)
+        x = self.leaky_relu(x)
+        x = self.dropout2(x)
+        x = self.fc3(x)
+
+        return x
+
+
+class SolarRNN(nn.Module):
+    def __init__(self, input_size, hidden_size, output_size, num_layers=2):
+        super(SolarRNN, self).__init__()
+        self.lstm = nn.LSTM(input_size, hidden_size, num_layers=num_layers, batch_first=True, dropout=0.2)
+        self.fc = nn.Linear(hidden_size, output_size)
+
+    def forward(self, x):
+        out, _ = self.lstm(x)
+        out = self.fc(out[:, -1, :])  # Use the last LSTM output
+        return out
+
+
+class WindRNN(nn.Module):
+    def __init__(self, input_size, hidden_size, output_size, num_layers=2):
+        super(WindRNN, self).__init__()
+        self.lstm = nn.LSTM(input_size, hidden_size, num_layers=num_layers, batch_first=True, dropout=0.2)
+        self.fc = nn.Linear(hidden_size, output_size)
+
+    def forward(self, x):
+        out, _ = self.lstm(x)
+        out = self.fc(out[:, -1, :])  # Use the last LSTM output
+        return out
+
+
+class EnergyRNN(nn.Module):
+    def __init__(self, input_size, hidden_size, output_size, num_layers=2):
+        super(EnergyRNN, self).__init__()
+        self.lstm = nn.LSTM(input_size, hidden_size, num_layers=num_layers, batch_first=True, dropout=0.2)
+        self.fc = nn.Linear(hidden_size, output_size)
+
+    def forward(self, x):
+        out, _ = self.lstm(x)
+        out = self.fc(out[:, -1, :])  # Use the last LSTM output
+        return out
+
+
+def lstm_factory(cls):
+    def build(input_size, sequence_length, hidden_size=64, num_layers=2, output_size=1):
+        return cls(input_size, hidden_size, output_size, num_layers)
+    return build
+
+
+# name -> how the notebooks build and train it. ``build(input_size, sequence_length,
+# output_size=1)`` returns a fresh model; feature_set names a layout in features.FEATURE_SETS.
+ARCHITECTURES = {
+    'EnergyCNN': dict(build=EnergyCNN, feature_set='base', sequence_length=24,
+                      batch_size=32, learning_rate=0.001, weight_decay=0.0, num_epochs=20),
+    'DemandCNN': dict(build=DemandCNN, feature_set='demand', sequence_length=48,
+                      batch_size=64, learning_rate=0.0005, weight_decay=1e-5, num_epochs=30),
+    'WindCNN': dict(build=WindCNN, feature_set='wind', sequence_length=36,
+                    batch_size=32, learning_rate=0.0003, weight_decay=1e-4, num_epochs=40,
+                    clip_grad_norm=1.0),
+    'SolarRNN': dict(build=lstm_factory(SolarRNN), feature_set='base', sequence_length=24,
+                     batch_size=32, learning_rate=0.001, weight_decay=0.0, num_epochs=20),
+    'WindRNN': dict(build=lstm_factory(WindRNN), feature_set='base', sequence_length=24,
+                    batch_size=32, learning_rate=0.001, weight_decay=0.0, num_epochs=20),
+    'EnergyRNN': dict(build=lstm_factory(EnergyRNN), feature_set='default', sequence_length=24,
+                      batch_size=32, learning_rate=0.001, weight_decay=0.0, num_epochs=20),
+}
+
+
+def build_model(name, input_size=None, sequence_length=None, **kwargs):
+    """Instantiate an architecture with its notebook defaults"""
+    spec = ARCHITECTURES[name]
+    input_size = input_size or len(FEATURE_SETS[spec['feature_set']])
+    sequence_length = sequence_length or spec['sequence_length']
+    return spec['build'](input_size, sequence_length, **kwargs)
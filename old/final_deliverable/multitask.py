@@ -0,0 +1,211 @@
+"""Joint solar / wind / demand model: one shared encoder, one head per target.
+
+    python multitask.py --encoder cnn --epochs 20 --loss-weights solar=1 wind=1 demand=0.5
+
+Weather is read and scaled once, every target is trained in the same pass,
+and a single artifact (weights, config and both scalers) is written. The
+windows are split in time order (train, then validation, then test), and
+training runs through trainer.Trainer. A rerun with the same --output
+therefore resumes, and the best validation weights are kept.
+"""
+import argparse
+import logging
+import os
+
+import numpy as np
+import torch
+import torch.nn as nn
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+from batching import make_loader
+from feature_store import load_prepared
+from trainer import Trainer
+from training_data import DATABASE_PATH
+from windows import WindowedDataset
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+TARGETS = ['solar', 'wind', 'demand']
+
+
+class MultiTaskForecaster(nn.Module):
+    """Shared CNN or LSTM encoder over the weather window with a small head per target"""
+
+    def __init__(self, input_size, sequence_length, targets=TARGETS, encoder='cnn', hidden_size=128):
+        super(MultiTaskForecaster, self).__init__()
+        self.targets = list(targets)
+        self.encoder_type = encoder
+
+        if encoder == 'cnn':
+            self.encoder = nn.Sequential(
+                nn.Conv1d(input_size, 32, kernel_size=3, padding=1),
+                nn.BatchNorm1d(32),
+                nn.ReLU(),
+                nn.MaxPool1d(kernel_size=2),
+                nn.Conv1d(32, 64, kernel_size=3, padding=1),
+                nn.BatchNorm1d(64),
+                nn.ReLU(),
+                nn.MaxPool1d(kernel_size=2),
+                nn.Flatten(),
+                nn.Linear(64 * (sequence_length // 4), hidden_size),
+                nn.ReLU(),
+                nn.Dropout(0.3)
+            )
+        elif encoder == 'lstm':
+            self.lstm = nn.LSTM(input_size, hidden_size, num_layers=2, batch_first=True, dropout=0.2)
+        else:
+            raise ValueError(f"Unknown encoder {encoder!r}; use 'cnn' or 'lstm'")
+
+        self.heads = nn.ModuleDict({
+            target: nn.Sequential(nn.Linear(hidden_size, 64), nn.ReLU(), nn.Linear(64, 1))
+            for target in self.targets
+        })
+
+    def encode(self, x):
+        # Input shape: (batch_size, sequence_length, features)
+        if self.encoder_type == 'cnn':
+            return self.encoder(x.transpose(1, 2))
+        out, _ = self.lstm(x)
+        return out[:, -1, :]
+
+    def forward(self, x):
+        shared = self.encode(x)
+        # (batch_size, n_targets), columns in self.targets order
+        return torch.cat([self.heads[target](shared) for target in self.targets], dim=1)
+
+
+class WeightedMultiTaskLoss(nn.Module):
+    """Sum of per-target MSE losses scaled by per-target weights"""
+
+    def __init__(self, weights):
+        super(WeightedMultiTaskLoss, self).__init__()
+        self.register_buffer('weights', torch.as_tensor(weights, dtype=torch.float32))
+
+    def forward(self, outputs, targets):
+        per_target = ((outputs - targets) ** 2).mean(dim=0)
+        return (per_target * self.weights).sum()
+
+
+def chronological_split(dataset, val_fraction=0.15, test_fraction=0.15):
+    """Train / validation / test window indices in time order.
+
+    Each split starts one window after the previous one ends, so no
+    validation or test target ever appears inside an earlier window.
+    """
+    starts = dataset.start_rows
+    sequence_length = dataset.sequence_length
+    if len(starts) == 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty
+
+    def cut(fraction):
+        return starts[min(int(len(starts) * fraction), len(starts) - 1)]
+
+    val_cut, test_cut = cut(1 - val_fraction - test_fraction), cut(1 - test_fraction)
+    indices = np.arange(len(starts))
+    train = indices[starts + sequence_length < val_cut]
+    val = indices[(starts >= val_cut + sequence_length) & (starts + sequence_length < test_cut)]
+    test = indices[starts >= test_cut + sequence_length]
+    return train, val, test
+
+
+def evaluate_multitask(model, dataset, indices, scaler_target, device, batch_size=1024):
+    """MAE, RMSE and R² per target in original units"""
+    model.eval()
+    predictions, actuals = [], []
+    with torch.no_grad():
+        for batch_X, batch_y in make_loader(dataset, indices, batch_size, shuffle=False):
+            predictions.append(model(batch_X.to(device)).cpu().numpy())
+            actuals.append(batch_y.numpy())
+
+    predictions = scaler_target.inverse_transform(np.concatenate(predictions))
+    actuals = scaler_target.inverse_transform(np.concatenate(actuals))
+
+    metrics = {}
+    for j, target in enumerate(model.targets):
+        metrics[target] = {
+            'MAE': mean_absolute_error(actuals[:, j], predictions[:, j]),
+            'RMSE': np.sqrt(mean_squared_error(actuals[:, j], predictions[:, j])),
+            'R2': r2_score(actuals[:, j], predictions[:, j]),
+        }
+    return metrics
+
+
+def config_changes(path, config):
+    """'key: saved -> requested' for every config entry that differs from the checkpoint at ``path``"""
+    saved = torch.load(path, map_location='cpu', weights_only=False).get('config') or {}
+    return [f"{key}: {saved.get(key)!r} -> {config.get(key)!r}"
+            for key in sorted(set(saved) | set(config)) if saved.get(key) != config.get(key)]
+
+
+def parse_weights(pairs, targets):
+    weights = {target: 1.0 for target in targets}
+    for pair in pairs or []:
+        target, value = pair.split('=')
+        weights[target] = float(value)
+    return [weights[target] for target in targets]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the joint solar/wind/demand model")
+    parser.add_argument('--database', default=DATABASE_PATH)
+    parser.add_argument('--encoder', choices=['cnn', 'lstm'], default='cnn')
+    parser.add_argument('--sequence-length', type=int, default=24)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--learning-rate', type=float, default=0.001)
+    parser.add_argument('--loss-weights', nargs='*', metavar='TARGET=WEIGHT')
+    parser.add_argument('--val-fraction', type=float, default=0.15)
+    parser.add_argument('--test-fraction', type=float, default=0.15)
+    parser.add_argument('--patience', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='multitask_model.pth',
+                        help="Checkpoint path; an unfinished run there is resumed")
+    parser.add_argument('--fresh', action='store_true', help="Start over instead of resuming --output")
+    args = parser.parse_args()
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    features_scaled, targets_scaled, scaler_features, scaler_target = load_prepared(
+        TARGETS, 'joint', args.database)
+    dataset = WindowedDataset(features_scaled, targets_scaled, args.sequence_length)
+
+    train_idx, val_idx, test_idx = chronological_split(dataset, args.val_fraction, args.test_fraction)
+    logger.info(f"{len(dataset)} windows: {len(train_idx)} train, {len(val_idx)} validation, "
+                f"{len(test_idx)} test")
+
+    config = {'input_size': dataset.num_features, 'sequence_length': args.sequence_length,
+              'targets': TARGETS, 'encoder': args.encoder, 'feature_set': 'joint'}
+    if os.path.exists(args.output) and not args.fresh:
+        changes = config_changes(args.output, config)
+        if changes:
+            parser.error(f"{args.output} was trained with a different configuration ({'; '.join(changes)}); "
+                         f"pass --fresh to start over or choose another --output")
+
+    torch.manual_seed(args.seed)
+    model = MultiTaskForecaster(dataset.num_features, args.sequence_length, TARGETS, args.encoder).to(device)
+    criterion = WeightedMultiTaskLoss(parse_weights(args.loss_weights, TARGETS)).to(device)
+    optimizer = torch.optim.Adam(model.parameters(), lr=args.learning_rate)
+    trainer = Trainer(model, optimizer, criterion=criterion, device=device, checkpoint_path=args.output,
+                      patience=args.patience, fresh=args.fresh,
+                      extra_state={'config': config,
+                                   'scaler_features': scaler_features,
+                                   'scaler_target': scaler_target})
+
+    train_loader = make_loader(dataset, train_idx, args.batch_size, shuffle=True, prefetch=2, seed=args.seed)
+    val_loader = make_loader(dataset, val_idx, 2048, shuffle=False) if len(val_idx) else None
+    trainer.fit(train_loader, val_loader, num_epochs=args.epochs)
+
+    for target, scores in evaluate_multitask(model, dataset, test_idx, scaler_target, device).items():
+        print(f"{target.capitalize()} (Test Set) - MAE: {scores['MAE']:.2f}, "
+              f"RMSE: {scores['RMSE']:.2f}, R²: {scores['R2']:.2f}")
+    print(f"Saved joint model to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+import pandas as pd
+
+PredictionKey = namedtuple('PredictionKey', ['location', 'start', 'horizons', 'model_version', 'weather_hash'])
+
+
+def weather_digest(weather):
+    """Content hash of a weather frame (values and column names, not the index)"""
+    digest = hashlib.sha1(pd.util.hash_pandas_object(weather, index=False).to_numpy().tobytes())
+    digest.update(','.join(map(str, weather.columns)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def prediction_key(location, start, horizons, model_version, weather):
+    return PredictionKey(tuple(location), pd.Timestamp(start).isoformat(), tuple(horizons),
+                         model_version, weather_digest(weather))
+
+
+class PredictionCache:
+    """Bounded LRU cache of forecast frames, safe to share between sessions.
+
+    Entries are evicted least-recently-used first once either ``max_entries``
+    or ``max_bytes`` is exceeded. Cached frames are shared and must be
+    treated as read-only; callers copy before modifying.
+    """
+
+    def __init__(self, max_entries=512, max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, frame):
+        size = int(frame.memory_usage(index=True, deep=True).sum())
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (frame, size)
+            self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.bytes -= evicted
+
+    def invalidate(self, model_version=None):
+        """Drop entries computed by ``model_version`` (all entries when None)"""
+        with self.lock:
+            if model_version is None:
+                self.entries.clear()
+                self.bytes = 0
+                return
+            for key in [key for key in self.entries if key.model_version == model_version]:
+                self.bytes -= self.entries.pop(key)[1]
+
+    def on_model_registered(self, name, old_version, new_version):
+        """ModelRegistry listener: forget predictions made by the replaced version"""
+        if old_version is not None and old_version != new_version:
+            self.invalidate(old_version)
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.bytes,
+                    'hits': self.hits, 'misses': self.misses}
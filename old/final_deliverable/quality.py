@@ -0,0 +1,182 @@
+"""Vectorized data-quality checks and repairs for the hourly source series.
+
+    python quality.py --targets solar wind demand --output quality_report.csv
+
+alignment.align_sources runs these on every source column. It runs them
+after the readings are scattered onto the hour grid and before the gap
+policy fills anything:
+
+  duplicates  readings that share an hour (the grid keeps their mean)
+  missing     grid hours without a reading, and the longest such run
+  flatline    runs of at least ``flatline_hours`` identical readings
+              (zeros exempt with ``ignore_zero_flatlines``, e.g. solar at night)
+  negative    readings below 0 of a quantity that cannot be negative
+  outlier     readings more than ``outlier_z`` standard deviations from the mean
+              of the surrounding ``outlier_window`` hours (the reading itself excluded)
+
+Repairs follow the source's policy. Negatives are clipped to 0 or masked.
+Flatlines and outliers are masked, so the gap policy (alignment.fill_gaps)
+treats them like any other missing hour. Run lengths come from one cumsum
+over change points. The rolling mean and variance come from cumulative
+sums of the series minus its mean, which keeps the sums of squares
+precise. Every check is linear numpy over the whole column, with no Python
+loop over rows.
+
+Each column adds one row (QUALITY_COLUMNS) to the report that
+load_aligned attaches as ``frame.attrs['quality']``.
+"""
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+REPAIRS = ('mask', 'clip')
+
+# Source kind -> checks and repairs; None disables a check
+QUALITY_POLICIES = {
+    'weather': dict(flatline_hours=48, ignore_zero_flatlines=True, negative=None,
+                    outlier_z=None, outlier_window=168),
+    'generation': dict(flatline_hours=6, ignore_zero_flatlines=True, negative='clip',
+                       outlier_z=6.0, outlier_window=168),
+    'demand': dict(flatline_hours=6, ignore_zero_flatlines=False, negative='mask',
+                   outlier_z=6.0, outlier_window=168),
+}
+
+QUALITY_COLUMNS = ['source', 'column', 'hours', 'observed', 'missing', 'longest_gap', 'duplicates',
+                   'flatline', 'negative', 'outliers', 'repaired']
+
+
+def run_lengths(values):
+    """Length of the run of equal consecutive values that each element belongs to (NaN never repeats)"""
+    values = np.asarray(values)
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int64)
+    starts = np.concatenate([[True], values[1:] != values[:-1]])
+    run_id = np.cumsum(starts) - 1
+    return np.bincount(run_id)[run_id]
+
+
+def rolling_mean_std(values, window):
+    """Mean, standard deviation and count of the finite values within ``window // 2`` hours of each row.
+
+    The row itself is left out, so a spike does not inflate its own baseline.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    finite = np.isfinite(values)
+    # Centring first keeps the cumulative sums of squares small enough to stay exact
+    centre = values[finite].mean() if finite.any() else 0.0
+    x = np.where(finite, values - centre, 0.0)
+
+    counts = np.concatenate([[0], np.cumsum(finite)])
+    sums = np.concatenate([[0.0], np.cumsum(x)])
+    squares = np.concatenate([[0.0], np.cumsum(x * x)])
+
+    rows = np.arange(n)
+    low = np.maximum(rows - window // 2, 0)
+    high = np.minimum(rows + window // 2 + 1, n)
+    count = counts[high] - counts[low] - finite
+    total = sums[high] - sums[low] - x
+    total_squares = squares[high] - squares[low] - x * x
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        variance = np.maximum(total_squares / count - mean * mean, 0.0)
+    return mean + centre, np.sqrt(variance), count
+
+
+def duplicate_count(hours):
+    """Readings beyond the first in each hour"""
+    hours = np.asarray(hours, dtype=np.int64)
+    if len(hours) == 0:
+        return 0
+    return int(len(hours) - np.count_nonzero(np.bincount(hours - hours.min())))
+
+
+def check_column(values, policy, hours=None):
+    """Flag and repair one grid column; returns (repaired values, report counts)"""
+    values = np.array(values, dtype=np.float64, copy=True)
+    missing = np.isnan(values)
+    finite = ~missing
+
+    gap_lengths = run_lengths(missing)
+    report = {
+        'hours': len(values),
+        'observed': int(finite.sum()),
+        'missing': int(missing.sum()),
+        'longest_gap': int(gap_lengths[missing].max()) if missing.any() else 0,
+        'duplicates': duplicate_count(hours) if hours is not None else 0,
+    }
+
+    flatline = np.zeros(len(values), dtype=bool)
+    if policy.get('flatline_hours'):
+        flatline = finite & (run_lengths(values) >= policy['flatline_hours'])
+        if policy.get('ignore_zero_flatlines'):
+            flatline &= values != 0
+
+    negative = np.zeros(len(values), dtype=bool)
+    if policy.get('negative'):
+        if policy['negative'] not in REPAIRS:
+            raise ValueError(f"Unknown negative repair {policy['negative']!r}; use one of {REPAIRS}")
+        negative = finite & (values < 0)
+
+    outlier = np.zeros(len(values), dtype=bool)
+    if policy.get('outlier_z'):
+        window = policy.get('outlier_window', 168)
+        mean, std, count = rolling_mean_std(values, window)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            outlier = finite & (count >= window // 4) & (std > 0) & (np.abs(values - mean) > policy['outlier_z'] * std)
+
+    if policy.get('negative') == 'clip':
+        values[negative] = 0.0
+        masked = flatline | outlier
+    else:
+        masked = flatline | outlier | negative
+    values[masked] = np.nan
+
+    report.update(flatline=int(flatline.sum()), negative=int(negative.sum()), outliers=int(outlier.sum()),
+                  repaired=int((masked | negative).sum()))
+    return values, report
+
+
+def report_frame(rows):
+    """Quality report rows as a DataFrame with QUALITY_COLUMNS"""
+    return pd.DataFrame(rows, columns=QUALITY_COLUMNS)
+
+
+def log_report(report):
+    """One log line per column with something to report"""
+    issues = report[(report[['duplicates', 'flatline', 'negative', 'outliers']].sum(axis=1) > 0)
+                    | (report['missing'] > 0)]
+    for row in issues.itertuples(index=False):
+        logger.info(f"Quality {row.source}/{row.column}: {row.missing} missing (longest {row.longest_gap} h), "
+                    f"{row.duplicates} duplicates, {row.flatline} flatline, {row.negative} negative, "
+                    f"{row.outliers} outliers; {row.repaired} repaired")
+
+
+def main():
+    from training_data import DATABASE_PATH, load_aligned
+
+    parser = argparse.ArgumentParser(description="Data-quality report for the training tables")
+    parser.add_argument('--database', default=DATABASE_PATH)
+    parser.add_argument('--targets', nargs='+', default=['solar', 'wind', 'demand'])
+    parser.add_argument('--output', default=None, help="Write the report as CSV")
+    args = parser.parse_args()
+
+    report = load_aligned(args.targets, args.database).attrs['quality']
+    print(report.to_string(index=False))
+    if args.output:
+        report.to_csv(args.output, index=False)
+        logger.info(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""P10 / P50 / P90 forecasts from the same single inference call as a point forecast.
+
+    python quantiles.py --output-dir ../models/quantile
+    python service.py --model-dir ../models/quantile
+
+Networks: ``build_model(name, ..., output_size=len(QUANTILES))`` gives any
+architecture one output per quantile from its final Linear layer; train it
+with ``PinballLoss(QUANTILES)`` as the Trainer criterion
+(train_regions.py --quantiles does this).
+
+XGBoost: ``train_quantile_booster`` fits a single booster with the
+``reg:quantileerror`` objective over every alpha, so one ``inplace_predict``
+returns all quantiles. The quantiles are stored as a booster attribute and
+XGBoostForecaster picks them up when it loads the model. Running this module
+trains such a booster per target into --output-dir.
+"""
+import argparse
+import json
+import logging
+import os
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from feature_store import FeatureStore
+from forecasters import MODEL_DIR, QUANTILE_ATTR, TARGETS, XGBoostForecaster
+from training_data import DATABASE_PATH
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.1, 0.5, 0.9)
+
+# Native equivalents of backtest.XGBOOST_PARAMS
+XGBOOST_QUANTILE_PARAMS = dict(max_depth=6, eta=0.1, subsample=0.8, tree_method='hist')
+
+
+class PinballLoss(nn.Module):
+    """Mean pinball (quantile) loss of (batch, quantiles) outputs against (batch, 1) targets"""
+
+    def __init__(self, quantiles=QUANTILES):
+        super(PinballLoss, self).__init__()
+        self.register_buffer('quantiles', torch.tensor(quantiles, dtype=torch.float32))
+
+    def forward(self, predicted, target):
+        quantiles = self.quantiles.to(predicted.device)
+        error = target - predicted
+        return torch.max(quantiles * error, (quantiles - 1) * error).mean()
+
+
+def inverse_quantiles(scaler_target, outputs):
+    """Inverse-transform (rows, quantiles) network outputs with a single-target scaler, sorted per row"""
+    outputs = np.asarray(outputs)
+    values = scaler_target.inverse_transform(outputs.reshape(-1, 1)).reshape(outputs.shape)
+    # The heads are trained independently and can cross; sorting each row restores the order
+    return np.sort(values, axis=-1)
+
+
+def train_quantile_booster(features, targets, quantiles=QUANTILES, num_boost_round=300, **params):
+    """One xgboost.Booster predicting every quantile of ``targets``, skipping hours without a target"""
+    import xgboost as xgb
+
+    quantiles = sorted(quantiles)
+    known = np.isfinite(targets)
+    dtrain = xgb.QuantileDMatrix(features[known], targets[known])
+    booster = xgb.train({**XGBOOST_QUANTILE_PARAMS, **params, 'objective': 'reg:quantileerror',
+                         'quantile_alpha': np.asarray(quantiles)}, dtrain, num_boost_round=num_boost_round)
+    booster.set_attr(**{QUANTILE_ATTR: json.dumps(quantiles)})
+    return booster
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train multi-quantile XGBoost boosters for every target")
+    parser.add_argument('--database', default=DATABASE_PATH)
+    parser.add_argument('--output-dir', default=os.path.join(MODEL_DIR, 'quantile'))
+    parser.add_argument('--quantiles', type=float, nargs='+', default=list(QUANTILES))
+    parser.add_argument('--rounds', type=int, default=300)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    store = FeatureStore(args.database)
+    for target in TARGETS:
+        prepared = store.get([target], XGBoostForecaster.feature_set)
+        booster = train_quantile_booster(prepared.features, prepared.targets[:, 0], args.quantiles,
+                                         num_boost_round=args.rounds)
+        path = os.path.join(args.output_dir, f'{target}_model.ubj')
+        booster.save_model(path)
+        logger.info(f"Saved {target} quantile booster {args.quantiles} to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""One network for every region: region embeddings and optional per-region output heads.
+
+    python train_regions.py --shards shards/joint-solar-wind --target solar \\
+        --architecture EnergyCNN --region-embedding 4 --region-heads
+
+RegionalForecaster wraps any architecture in models.ARCHITECTURES. A learned
+embedding of the region is appended to every time step of the window, so
+the network sees (features + embedding) channels; with ``region_heads``
+each region also gets its own scale and bias on the output. ``forward(x,
+regions)`` takes a batch that mixes regions.
+
+MultiRegionForecaster serves a checkpoint written by train_regions.py: it
+takes weather for any number of regions and runs every window of every
+region through the model as one batch. A checkpoint trained with
+--quantiles returns (rows, quantiles) per region from that same call.
+"""
+import numpy as np
+import torch
+import torch.nn as nn
+
+from features import build_feature_matrix
+from models import build_model
+from quantiles import inverse_quantiles
+from windows import sliding_windows
+
+
+class RegionalForecaster(nn.Module):
+    """A notebook architecture conditioned on the region of each sample"""
+
+    def __init__(self, architecture, input_size, sequence_length, regions, embedding_dim=4,
+                 region_heads=False, **kwargs):
+        super(RegionalForecaster, self).__init__()
+        self.regions = list(regions)
+        self.embedding = nn.Embedding(len(self.regions), embedding_dim)
+        self.network = build_model(architecture, input_size + embedding_dim, sequence_length, **kwargs)
+
+        self.region_heads = region_heads
+        if region_heads:
+            # Start as the identity so the heads only learn what the shared network cannot
+            self.head_scale = nn.Embedding(len(self.regions), 1)
+            self.head_bias = nn.Embedding(len(self.regions), 1)
+            nn.init.ones_(self.head_scale.weight)
+            nn.init.zeros_(self.head_bias.weight)
+
+    def forward(self, x, regions):
+        # x: (batch_size, sequence_length, features); regions: (batch_size,) indices into self.regions
+        embedded = self.embedding(regions)[:, None, :].expand(-1, x.shape[1], -1)
+        out = self.network(torch.cat([x, embedded], dim=2))
+        if self.region_heads:
+            out = out * self.head_scale(regions) + self.head_bias(regions)
+        return out
+
+
+class MultiRegionForecaster:
+    """Batched inference of a RegionalForecaster for several regions at once"""
+
+    def __init__(self, model, scaler_features, scaler_target, feature_set, sequence_length, target,
+                 quantiles=None):
+        self.model = model.eval()
+        self.quantiles = quantiles
+        self.scaler_features = scaler_features
+        self.scaler_target = scaler_target
+        self.feature_set = feature_set
+        self.sequence_length = sequence_length
+        self.target = target
+
+    @property
+    def regions(self):
+        return self.model.regions
+
+    @classmethod
+    def load(cls, path, architecture):
+        """Rebuild from a train_regions.py checkpoint"""
+        checkpoint = torch.load(path, map_location='cpu', weights_only=False)
+        quantiles = checkpoint.get('quantiles')
+        model = RegionalForecaster(architecture, checkpoint['input_size'], checkpoint['sequence_length'],
+                                   checkpoint['regions'], checkpoint['region_embedding'],
+                                   checkpoint['region_heads'], output_size=len(quantiles) if quantiles else 1)
+        model.load_state_dict(checkpoint.get('best_model_state_dict') or checkpoint['model_state_dict'])
+        return cls(model, checkpoint['scaler_features'], checkpoint['scaler_target'],
+                   checkpoint['feature_set'], checkpoint['sequence_length'], checkpoint['target'], quantiles)
+
+    def predict(self, weather_by_region, batch_size=8192):
+        """{region: prediction per weather row}, NaN for rows without a full window of history
+
+        Quantile models give a (rows, quantiles) array per region instead of (rows,).
+        """
+        unknown = set(weather_by_region) - set(self.regions)
+        if unknown:
+            raise ValueError(f"Model was not trained on {sorted(unknown)}; it knows {self.regions}")
+
+        windows, region_ids, lengths = [], [], {}
+        for region, weather in weather_by_region.items():
+            features = build_feature_matrix(weather, feature_set=self.feature_set)
+            scaled = self.scaler_features.transform(features).astype(np.float32)
+            region_windows = sliding_windows(scaled, self.sequence_length)
+            windows.append(region_windows)
+            region_ids.append(np.full(len(region_windows), self.regions.index(region), dtype=np.int64))
+            lengths[region] = len(features)
+
+        x = torch.from_numpy(np.concatenate(windows)) if windows else torch.empty(0)
+        ids = torch.from_numpy(np.concatenate(region_ids)) if region_ids else torch.empty(0, dtype=torch.long)
+        outputs = []
+        with torch.no_grad():
+            for start in range(0, len(x), batch_size):
+                outputs.append(self.model(x[start:start + batch_size], ids[start:start + batch_size]).numpy())
+        width = len(self.quantiles) if self.quantiles else 1
+        predicted = np.concatenate(outputs) if outputs else np.empty((0, width))
+        if self.quantiles:
+            predicted = inverse_quantiles(self.scaler_target, predicted)
+        else:
+            predicted = self.scaler_target.inverse_transform(predicted).ravel()
+
+        results, offset = {}, 0
+        for region, rows in lengths.items():
+            values = np.full((rows,) + predicted.shape[1:], np.nan, dtype=np.float64)
+            count = max(rows - self.sequence_length, 0)
+            values[self.sequence_length:] = predicted[offset:offset + count]
+            results[region] = values
+            offset += count
+        return results
@@ -0,0 +1,26 @@
+"""Balancing regions the pipeline knows about.
+
+NE is the region the notebooks and the dashboard were built for; the others
+are the ISOs EIA_API_request_all_dates.main() collects. ``coordinates`` is the
+Meteostat point used for each region's weather and ``database`` the SQLite
+file with its historical actuals in the energy_data_NE.db layout, if any.
+"""
+DEFAULT_REGION = 'NE'
+
+REGIONS = {
+    'NE': dict(name='New England (ISO-NE)', coordinates=(42.3601, -71.0589),
+               timezone='America/New_York', database='energy_data_NE.db'),
+    'CAISO': dict(name='California (CAISO)', coordinates=(34.0522, -118.2437),
+                  timezone='America/Los_Angeles', database=None),
+    'MISO': dict(name='Midcontinent (MISO)', coordinates=(44.9778, -93.2650),
+                 timezone='America/Chicago', database=None),
+    'NYISO': dict(name='New York (NYISO)', coordinates=(40.7128, -74.0060),
+                  timezone='America/New_York', database=None),
+    'PJM': dict(name='Mid-Atlantic (PJM)', coordinates=(39.9526, -75.1652),
+                timezone='America/New_York', database=None),
+    'ERCOT': dict(name='Texas (ERCOT)', coordinates=(32.7767, -96.7970),
+                  timezone='America/Chicago', database=None),
+}
+
+# The regions EIA_API_request_all_dates.main() collects
+EIA_REGIONS = ['CAISO', 'MISO', 'NYISO', 'PJM', 'ERCOT']
@@ -0,0 +1,57 @@
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def file_digest(path, length=12):
+    """Short content hash of a model file, usable as a model version"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+class ModelRegistry:
+    """Process-wide store of the models being served, with a version per name.
+
+    Listeners passed to ``subscribe`` are called as
+    ``listener(name, old_version, new_version)`` whenever a model is
+    registered, so caches keyed by model version can drop stale entries.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.models = {}
+        self.versions = {}
+        self.counters = {}
+        self.listeners = []
+
+    def register(self, name, model, version=None):
+        """Make ``model`` the served model for ``name`` and return its version"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+            version = version or f"{name}-v{self.counters[name]}"
+            old_version = self.versions.get(name)
+            self.models[name] = model
+            self.versions[name] = version
+            listeners = list(self.listeners)
+
+        logger.info(f"Registered {name} version {version}")
+        for listener in listeners:
+            listener(name, old_version, version)
+        return version
+
+    def get(self, name):
+        with self.lock:
+            return self.models.get(name)
+
+    def version(self, name):
+        with self.lock:
+            return self.versions.get(name)
+
+    def subscribe(self, listener):
+        with self.lock:
+            self.listeners.append(listener)
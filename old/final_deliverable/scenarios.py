@@ -0,0 +1,92 @@
+"""Weather-ensemble what-if runs over a prepared feature matrix.
+
+The ensemble is built as one stacked (members, hours, features) float32
+array and reshaped to (members * hours, features) for a single batched model
+call, so a 100-member run costs one large predict rather than 100 small ones.
+"""
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_SETS
+
+DEFAULT_PERCENTILES = (10, 50, 90)
+
+
+class Perturbation:
+    """Per-member perturbation of one feature column.
+
+    Each ensemble member draws ``scale`` uniformly from ``scale_range`` and
+    ``shift`` uniformly from ``shift_range``, then uses
+    ``value * scale + shift`` for every hour. The result is clipped to
+    [lower, upper].
+    """
+
+    def __init__(self, column, shift_range=(0.0, 0.0), scale_range=(1.0, 1.0), lower=None, upper=None):
+        self.column = column
+        self.shift_range = shift_range
+        self.scale_range = scale_range
+        self.lower = lower
+        self.upper = upper
+
+    def apply(self, stacked, j, rng):
+        members = stacked.shape[0]
+        scale = rng.uniform(*self.scale_range, size=members).astype(np.float32)
+        shift = rng.uniform(*self.shift_range, size=members).astype(np.float32)
+
+        column = stacked[:, :, j]
+        column *= scale[:, None]
+        column += shift[:, None]
+        if self.lower is not None or self.upper is not None:
+            np.clip(column, self.lower, self.upper, out=column)
+
+
+# Presets offered in the dashboard. 'cloudcover' is Meteostat's categorical
+# weather-condition code (coco), not a percentage, so it is never perturbed.
+SCENARIOS = {
+    'Temperature ±3°C': [Perturbation('temperature', shift_range=(-3.0, 3.0))],
+    'Relative humidity ±10 points': [Perturbation('humidity', shift_range=(-10.0, 10.0), lower=0.0, upper=100.0)],
+    'Wind speed ×0.7–1.3': [Perturbation('windspeed', scale_range=(0.7, 1.3), lower=0.0)],
+}
+
+
+def stack_members(features, perturbations, members, columns, seed=None):
+    """Return (members + 1, hours, features) with the unperturbed baseline as member 0"""
+    features = np.asarray(features, dtype=np.float32)
+    stacked = np.empty((members + 1,) + features.shape, dtype=np.float32)
+    stacked[:] = features
+
+    rng = np.random.default_rng(seed)
+    for perturbation in perturbations:
+        perturbation.apply(stacked[1:], columns.index(perturbation.column), rng)
+    return stacked
+
+
+def run_ensemble(predict_features, features, perturbations, members=100, feature_set='default',
+                 percentiles=DEFAULT_PERCENTILES, seed=None):
+    """Run a perturbed-weather ensemble through ``predict_features`` in one call.
+
+    ``predict_features`` maps a (rows, features) matrix to ``{target: values}``.
+    Returns ``{target: {'baseline': (hours,), 'p10': (hours,), ...}}``.
+    """
+    columns = FEATURE_SETS[feature_set] if isinstance(feature_set, str) else list(feature_set)
+    stacked = stack_members(features, perturbations, members, columns, seed)
+    total, hours, width = stacked.shape
+
+    predictions = predict_features(stacked.reshape(total * hours, width))
+
+    bands = {}
+    for target, values in predictions.items():
+        values = np.asarray(values).reshape(total, hours)
+        bands[target] = {'baseline': values[0]}
+        for q, band in zip(percentiles, np.percentile(values[1:], percentiles, axis=0)):
+            bands[target][f'p{q}'] = band
+    return bands
+
+
+def bands_frame(datetimes, bands):
+    """Flatten ensemble bands into a frame with <target>_<band> columns"""
+    frame = {'datetime': pd.to_datetime(datetimes).to_numpy()}
+    for target, target_bands in bands.items():
+        for name, values in target_bands.items():
+            frame[f'{target}_{name}'] = values
+    return pd.DataFrame(frame)
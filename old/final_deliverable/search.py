@@ -0,0 +1,234 @@
+"""Parallel hyperparameter search for the notebook CNN and LSTM models.
+
+    python search.py --architecture WindCNN --target wind --strategy halving --trials 27
+
+The prepared feature/target matrices are placed in shared memory once;
+every worker process attaches to them without copying and pins
+torch.set_num_threads so workers × threads does not oversubscribe the box.
+Validation uses the chronologically last part of the series.
+
+Strategies:
+  random   every sampled configuration trains up to --max-epochs, stopping
+           early when validation loss stalls for --patience epochs
+  halving  successive halving: all trials train --min-epochs, the best
+           1/--eta continue (resuming from a checkpoint) with eta× the
+           budget, and the rest are pruned, until --max-epochs
+
+Each evaluated rung is written to the ``trials`` table of --trials-db.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import torch
+
+from batching import make_loader
+from feature_store import load_prepared
+from models import ARCHITECTURES, build_model
+from sharing import SharedArrays, attach_shared
+from trainer import Trainer
+from training_data import DATABASE_PATH
+from windows import WindowedDataset
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SEARCH_SPACE = {
+    'batch_size': [16, 32, 64, 128],
+    'sequence_length': [24, 36, 48],
+    'learning_rate': (1e-4, 3e-3),  # log-uniform
+    'hidden_size': [32, 64, 128],  # LSTM architectures only
+}
+
+VALIDATION_FRACTION = 0.2
+
+# Per-process state set up by init_worker
+_WORKER = {}
+
+
+def init_worker(specs, threads):
+    torch.set_num_threads(threads)
+    arrays, handles = attach_shared(specs)
+    _WORKER.update(arrays=arrays, handles=handles)
+
+
+def initialize_trials_table(db_path):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS trials (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            study TEXT NOT NULL,
+            trial INTEGER NOT NULL,
+            architecture TEXT NOT NULL,
+            target TEXT NOT NULL,
+            params TEXT NOT NULL,
+            rung INTEGER NOT NULL,
+            epochs INTEGER NOT NULL,
+            val_loss REAL,
+            status TEXT NOT NULL,
+            seconds REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(study, trial, rung)
+        );
+        """)
+
+
+def record_trials(db_path, study, architecture, target, rung, results):
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany("""
+        INSERT OR REPLACE INTO trials
+        (study, trial, architecture, target, params, rung, epochs, val_loss, status, seconds)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(study, r['trial'], architecture, target, json.dumps(r['params']), rung, r['epochs'],
+               None if not np.isfinite(r['val_loss']) else r['val_loss'], r['status'], r['seconds'])
+              for r in results])
+
+
+def sample_params(architecture, rng):
+    low, high = SEARCH_SPACE['learning_rate']
+    params = {
+        'batch_size': int(rng.choice(SEARCH_SPACE['batch_size'])),
+        'sequence_length': int(rng.choice(SEARCH_SPACE['sequence_length'])),
+        'learning_rate': float(np.exp(rng.uniform(np.log(low), np.log(high)))),
+    }
+    if architecture.endswith('RNN'):
+        params['hidden_size'] = int(rng.choice(SEARCH_SPACE['hidden_size']))
+    return params
+
+
+def chronological_split(dataset_length, sequence_length, validation_fraction=VALIDATION_FRACTION):
+    """Train on early windows, validate on later ones, with a gap so no validation
+    target ever appears inside a training window"""
+    split = int(dataset_length * (1 - validation_fraction))
+    return np.arange(0, split), np.arange(min(split + sequence_length, dataset_length), dataset_length)
+
+
+def run_trial(task):
+    """Train one configuration up to ``task['epochs']`` in a worker process"""
+    started = time.perf_counter()
+    result = {'trial': task['trial'], 'params': task['params'], 'epochs': 0,
+              'val_loss': float('inf'), 'status': 'failed', 'seconds': 0.0}
+    try:
+        params, spec = task['params'], ARCHITECTURES[task['architecture']]
+        arrays = _WORKER['arrays']
+        dataset = WindowedDataset(arrays['features'], arrays['targets'], params['sequence_length'])
+        train_idx, val_idx = chronological_split(len(dataset), params['sequence_length'])
+
+        extra = {'hidden_size': params['hidden_size']} if 'hidden_size' in params else {}
+        model = build_model(task['architecture'], dataset.num_features, params['sequence_length'], **extra)
+        optimizer = torch.optim.Adam(model.parameters(), lr=params['learning_rate'],
+                                     weight_decay=spec['weight_decay'])
+        # Later rungs resume from this checkpoint and continue from the last, not the best, weights
+        trainer = Trainer(model, optimizer, checkpoint_path=task['checkpoint'], patience=task['patience'],
+                          clip_grad_norm=spec.get('clip_grad_norm'), restore_best=False)
+
+        loader = make_loader(dataset, train_idx, params['batch_size'], shuffle=True, seed=task['trial'])
+        val_loader = make_loader(dataset, val_idx, 2048, shuffle=False)
+        trainer.fit(loader, val_loader, task['epochs'], verbose=False)
+        state = trainer.state
+        status = 'stopped' if state['stopped'] else 'complete'
+        result.update(epochs=state['epoch'], val_loss=state['best_val_loss'], status=status)
+    except Exception as e:
+        logger.error(f"Trial {task['trial']} failed: {e}")
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def halving_budgets(min_epochs, max_epochs, eta):
+    budgets, epochs = [], min_epochs
+    while epochs < max_epochs:
+        budgets.append(epochs)
+        epochs *= eta
+    return budgets + [max_epochs]
+
+
+def run_search(architecture, target, strategy='halving', n_trials=27, min_epochs=2, max_epochs=20,
+               eta=3, patience=5, workers=None, threads=1, database_path=DATABASE_PATH,
+               trials_db='trials.db', study=None, seed=0):
+    """Run the search and return results of the surviving trials, best first"""
+    spec = ARCHITECTURES[architecture]
+    study = study or f"{architecture}-{target}-{time.strftime('%Y%m%d-%H%M%S')}"
+    workers = workers or max(1, (os.cpu_count() or 1) // threads)
+    initialize_trials_table(trials_db)
+
+    features, targets, _, _ = load_prepared([target], spec['feature_set'], database_path)
+    shared = SharedArrays(features=features, targets=targets)
+
+    rng = np.random.default_rng(seed)
+    configs = {trial: sample_params(architecture, rng) for trial in range(n_trials)}
+    budgets = [max_epochs] if strategy == 'random' else halving_budgets(min_epochs, max_epochs, eta)
+    checkpoint_dir = tempfile.mkdtemp(prefix='search-')
+    logger.info(f"Study {study}: {n_trials} trials, budgets {budgets}, {workers} workers × {threads} threads")
+
+    alive = list(configs)
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=init_worker, initargs=(shared.specs, threads)) as pool:
+            for rung, epochs in enumerate(budgets):
+                tasks = [{'trial': trial, 'architecture': architecture, 'params': configs[trial],
+                          'epochs': epochs, 'patience': patience,
+                          'checkpoint': os.path.join(checkpoint_dir, f'{trial}.pt')}
+                         for trial in alive]
+                results = sorted(pool.map(run_trial, tasks), key=lambda r: r['val_loss'])
+
+                last_rung = rung == len(budgets) - 1
+                keep = len(results) if last_rung else max(1, len(results) // eta)
+                for position, result in enumerate(results):
+                    if result['status'] == 'complete' and not last_rung:
+                        result['status'] = 'promoted' if position < keep else 'pruned'
+                record_trials(trials_db, study, architecture, target, rung, results)
+
+                alive = [r['trial'] for r in results if r['status'] == 'promoted']
+                logger.info(f"Rung {rung} ({epochs} epochs): best val loss {results[0]['val_loss']:.5f}, "
+                            f"{len(alive)} promoted")
+                if not alive:
+                    break
+    finally:
+        shared.close()
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter search")
+    parser.add_argument('--architecture', choices=list(ARCHITECTURES), default='EnergyCNN')
+    parser.add_argument('--target', choices=['solar', 'wind', 'demand'], default='solar')
+    parser.add_argument('--strategy', choices=['random', 'halving'], default='halving')
+    parser.add_argument('--trials', type=int, default=27)
+    parser.add_argument('--min-epochs', type=int, default=2)
+    parser.add_argument('--max-epochs', type=int, default=20)
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--patience', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=None, help="Default: CPU count / --threads")
+    parser.add_argument('--threads', type=int, default=1, help="torch threads per worker")
+    parser.add_argument('--database', default=DATABASE_PATH)
+    parser.add_argument('--trials-db', default='trials.db')
+    parser.add_argument('--study', default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    results = run_search(args.architecture, args.target, args.strategy, args.trials, args.min_epochs,
+                         args.max_epochs, args.eta, args.patience, args.workers, args.threads,
+                         args.database, args.trials_db, args.study, args.seed)
+
+    print(f"\n{'trial':>5} {'val loss':>10} {'epochs':>6}  params")
+    for result in results[:10]:
+        print(f"{result['trial']:>5} {result['val_loss']:>10.5f} {result['epochs']:>6}  {result['params']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,438 @@
+"""HTTP inference service for the energy forecaster.
+
+    python service.py --port 8600
+
+POST /forecast   {"weather": [{"datetime": ..., "temperature": ..., ...}, ...]}
+                 or {"start": "2024-10-01", "end": "2024-10-02"} to pull Meteostat data.
+                 Responds with JSON, or an Arrow IPC stream when the Accept header
+                 is application/vnd.apache.arrow.stream (or ?format=arrow).
+                 Quantile boosters (quantiles.py) add <target>_<horizon>_p10/_p50/_p90.
+                 A "region" key (see regions.REGIONS) picks the Meteostat point.
+POST /forecast/regions
+                 {"regions": ["NE", "PJM"], "start": ..., "end": ...} or
+                 {"regions": {"NE": {"weather": [...]}, ...}}; every region's windows
+                 go through the --regional-checkpoint model (regional.py) in one call.
+GET  /metrics    Latency and throughput counters as JSON; with ?format=prometheus
+                 (or Accept: text/plain) the instrumentation spans and counters
+                 (instrumentation.py) in Prometheus text format instead.
+GET  /health     Liveness check.
+
+Requests that arrive within --max-wait-ms of each other are coalesced by
+MicroBatcher into a single forecaster call. Each request is validated
+(numeric weather, times normalised to naive UTC) before it is queued, and
+if a batched call still fails its requests are retried one at a time, so an
+error only reaches the request that caused it.
+"""
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from features import WEATHER_FEATURES
+from forecasters import MODEL_DIR, XGBoostForecaster, forecast_frame, quantile_labels
+from regions import DEFAULT_REGION, REGIONS
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+ARROW_MIME = 'application/vnd.apache.arrow.stream'
+DEFAULT_LOCATION = REGIONS[DEFAULT_REGION]['coordinates']
+REQUEST_TIMEOUT = 30
+PROMETHEUS_MIME = 'text/plain; version=0.0.4'
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, float('inf'))
+
+
+class ServiceMetrics:
+    """Thread-safe request, batch and latency counters"""
+
+    def __init__(self, window=10000):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.rows = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.batched_rows = 0
+        self.latencies = deque(maxlen=window)
+
+    def record_request(self, seconds, rows=0, ok=True):
+        with self.lock:
+            self.requests += 1
+            self.rows += rows
+            if not ok:
+                self.errors += 1
+            self.latencies.append(seconds)
+
+    def record_batch(self, requests, rows):
+        with self.lock:
+            self.batches += 1
+            self.batched_requests += requests
+            self.batched_rows += rows
+
+    def snapshot(self):
+        with self.lock:
+            uptime = time.time() - self.started
+            latencies = np.array(self.latencies) * 1000
+            snapshot = {
+                'uptime_s': uptime,
+                'requests': self.requests,
+                'errors': self.errors,
+                'rows': self.rows,
+                'batches': self.batches,
+                'mean_batch_requests': self.batched_requests / self.batches if self.batches else 0.0,
+                'mean_batch_rows': self.batched_rows / self.batches if self.batches else 0.0,
+                'requests_per_s': self.requests / uptime if uptime else 0.0,
+                'rows_per_s': self.rows / uptime if uptime else 0.0,
+            }
+        if latencies.size:
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            snapshot.update(latency_ms_p50=p50, latency_ms_p95=p95, latency_ms_p99=p99,
+                            latency_ms_max=latencies.max())
+        return snapshot
+
+
+class MicroBatcher:
+    """Coalesces requests arriving within ``max_wait_ms`` into one batched predict call"""
+
+    def __init__(self, predict, max_wait_ms=5.0, max_batch_rows=16384, metrics=None):
+        self.predict = predict
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_rows = max_batch_rows
+        self.metrics = metrics
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self.thread.start()
+
+    def submit(self, frame):
+        """Queue a weather frame; the returned future resolves to its forecast frame"""
+        future = Future()
+        self.queue.put((frame, future))
+        return future
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def _collect(self):
+        first = self.queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        rows = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_batch_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self.queue.put(None)
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            frames = [frame for frame, _ in batch]
+            try:
+                with instrumentation.span('service.inference'):
+                    results = self.predict(pd.concat(frames, ignore_index=True))
+                instrumentation.observe('service.batch_requests', len(batch), buckets=BATCH_BUCKETS)
+            except Exception as e:
+                if len(batch) == 1:
+                    logger.error(f"Request failed: {e}")
+                    batch[0][1].set_exception(e)
+                else:
+                    # One bad request must not fail the others it was coalesced with
+                    logger.warning(f"Batch of {len(batch)} requests failed ({e}); retrying them one by one")
+                    self._run_each(batch)
+                continue
+
+            offset = 0
+            for frame, future in batch:
+                future.set_result(results.iloc[offset:offset + len(frame)].reset_index(drop=True))
+                offset += len(frame)
+
+            if self.metrics is not None:
+                self.metrics.record_batch(len(batch), offset)
+
+    def _run_each(self, batch):
+        for frame, future in batch:
+            try:
+                with instrumentation.span('service.inference'):
+                    results = self.predict(frame)
+            except Exception as e:
+                logger.error(f"Request failed: {e}")
+                future.set_exception(e)
+                continue
+            future.set_result(results.reset_index(drop=True))
+            if self.metrics is not None:
+                self.metrics.record_batch(1, len(frame))
+
+
+def fetch_weather(start, end, latitude, longitude):
+    """Hourly Meteostat weather for [start, end), renamed to the model's column names"""
+    from meteostat import Point, Hourly
+
+    with instrumentation.span('service.fetch_weather'):
+        data = Hourly(Point(latitude, longitude), start, end - timedelta(hours=1)).fetch()
+    data = data.rename(columns={
+        'temp': 'temperature',
+        'rhum': 'humidity',
+        'prcp': 'precipitation',
+        'wspd': 'windspeed',
+        'coco': 'cloudcover'
+    })
+    return data.reset_index().rename(columns={'time': 'datetime'})
+
+
+def parse_weather(payload):
+    """Build the weather frame for a /forecast request body"""
+    if 'weather' in payload:
+        weather = pd.DataFrame.from_records(payload['weather'])
+    elif 'start' in payload:
+        start = pd.to_datetime(payload['start']).to_pydatetime()
+        end = pd.to_datetime(payload.get('end', start + timedelta(days=1))).to_pydatetime()
+        region = payload.get('region', DEFAULT_REGION)
+        if region not in REGIONS:
+            raise ValueError(f"Unknown region {region}; known regions: {', '.join(REGIONS)}")
+        latitude = payload.get('latitude', REGIONS[region]['coordinates'][0])
+        longitude = payload.get('longitude', REGIONS[region]['coordinates'][1])
+        weather = fetch_weather(start, end, latitude, longitude)
+    else:
+        raise ValueError("Request needs either 'weather' rows or a 'start' date")
+
+    missing = [column for column in ['datetime'] + WEATHER_FEATURES if column not in weather]
+    if missing:
+        raise ValueError(f"Missing weather columns: {', '.join(missing)}")
+    if weather.empty:
+        raise ValueError("No weather rows to forecast")
+
+    # Coerce here so a malformed request fails on its own, not inside a batch shared with others
+    for column in WEATHER_FEATURES:
+        try:
+            weather[column] = pd.to_numeric(weather[column], errors='raise').astype(np.float64)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Weather column {column} is not numeric: {e}")
+    try:
+        # Naive times are taken as UTC; aware ones are converted, so every request concatenates alike
+        weather['datetime'] = pd.to_datetime(weather['datetime'], utc=True).dt.tz_localize(None)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid datetime values: {e}")
+    return weather
+
+
+def parse_regions(payload):
+    """{region: weather frame} for a /forecast/regions request body"""
+    regions = payload.get('regions')
+    if not regions:
+        raise ValueError("Request needs a 'regions' list or mapping")
+    if isinstance(regions, dict):
+        return {region: parse_weather({'region': region, **body}) for region, body in regions.items()}
+    shared = {key: value for key, value in payload.items() if key != 'regions'}
+    return {region: parse_weather({**shared, 'region': region}) for region in regions}
+
+
+def to_arrow(results):
+    """Serialize a forecast frame as an Arrow IPC stream"""
+    table = pa.Table.from_pandas(results, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class ForecastHandler(BaseHTTPRequestHandler):
+    """Routes requests to the server's MicroBatcher and ServiceMetrics"""
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def send_body(self, status, body, content_type='application/json'):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body)
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/health':
+            self.send_body(200, {'status': 'ok'})
+        elif path == '/metrics':
+            if (parse_qs(urlparse(self.path).query).get('format') == ['prometheus']
+                    or 'text/plain' in self.headers.get('Accept', '')):
+                self.send_body(200, instrumentation.metrics.prometheus_text(), PROMETHEUS_MIME)
+            else:
+                self.send_body(200, self.server.metrics.snapshot())
+        else:
+            self.send_body(404, {'error': f'Unknown path {path}'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == '/forecast/regions':
+            self.forecast_regions()
+            return
+        if url.path != '/forecast':
+            self.send_body(404, {'error': f'Unknown path {url.path}'})
+            return
+
+        started = time.perf_counter()
+        wants_arrow = (ARROW_MIME in self.headers.get('Accept', '')
+                       or parse_qs(url.query).get('format') == ['arrow'])
+        if wants_arrow and pa is None:
+            self.send_body(406, {'error': 'Arrow responses need pyarrow installed'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            weather = parse_weather(json.loads(self.rfile.read(length) or b'{}'))
+        except Exception as e:
+            self.server.metrics.record_request(time.perf_counter() - started, ok=False)
+            self.send_body(400, {'error': str(e)})
+            return
+
+        try:
+            results = self.server.batcher.submit(weather).result(timeout=REQUEST_TIMEOUT)
+        except Exception as e:
+            self.server.metrics.record_request(time.perf_counter() - started, ok=False)
+            self.send_body(500, {'error': str(e)})
+            return
+
+        if wants_arrow:
+            self.send_body(200, to_arrow(results), ARROW_MIME)
+        else:
+            records = results.to_json(orient='records', date_format='iso')
+            self.send_body(200, f'{{"forecasts": {records}}}')
+        self.server.metrics.record_request(time.perf_counter() - started, rows=len(results))
+
+    def forecast_regions(self):
+        started = time.perf_counter()
+        if self.server.regional is None:
+            self.send_body(404, {'error': 'No regional model loaded (start with --regional-checkpoint)'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            weather = parse_regions(json.loads(self.rfile.read(length) or b'{}'))
+        except Exception as e:
+            self.server.metrics.record_request(time.perf_counter() - started, ok=False)
+            self.send_body(400, {'error': str(e)})
+            return
+
+        regional = self.server.regional
+        try:
+            with self.server.regional_lock, instrumentation.span('service.regional_inference'):
+                predictions = regional.predict(weather)
+        except ValueError as e:
+            self.server.metrics.record_request(time.perf_counter() - started, ok=False)
+            self.send_body(400, {'error': str(e)})
+            return
+        except Exception as e:
+            self.server.metrics.record_request(time.perf_counter() - started, ok=False)
+            self.send_body(500, {'error': str(e)})
+            return
+
+        forecasts = {}
+        for region, values in predictions.items():
+            frame = pd.DataFrame({'datetime': weather[region]['datetime'].values})
+            if regional.quantiles:
+                for label, column in zip(quantile_labels(regional.quantiles), values.T):
+                    frame[f'{regional.target}_{label}'] = column
+            else:
+                frame[regional.target] = values
+            forecasts[region] = json.loads(frame.to_json(orient='records', date_format='iso'))
+        self.send_body(200, {'forecasts': forecasts})
+        self.server.metrics.record_request(time.perf_counter() - started,
+                                           rows=sum(len(values) for values in predictions.values()))
+
+
+def create_server(forecaster, host='127.0.0.1', port=8600, max_wait_ms=5.0, max_batch_rows=16384,
+                  regional=None):
+    """Build a ThreadingHTTPServer with a MicroBatcher around ``forecaster``
+
+    ``regional`` is an optional regional.MultiRegionForecaster for /forecast/regions.
+    """
+    server = ThreadingHTTPServer((host, port), ForecastHandler)
+    server.daemon_threads = True
+    server.metrics = ServiceMetrics()
+    server.regional = regional
+    server.regional_lock = threading.Lock()
+    server.batcher = MicroBatcher(
+        lambda weather: forecast_frame(forecaster, weather),
+        max_wait_ms=max_wait_ms,
+        max_batch_rows=max_batch_rows,
+        metrics=server.metrics
+    )
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Energy forecast inference service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help="How long the batcher waits for more requests before predicting")
+    parser.add_argument('--max-batch-rows', type=int, default=16384)
+    parser.add_argument('--regional-checkpoint', help="train_regions.py checkpoint served at /forecast/regions")
+    parser.add_argument('--regional-architecture', default='EnergyCNN')
+    args = parser.parse_args()
+
+    regional = None
+    if args.regional_checkpoint:
+        # torch is only needed when a regional model is served
+        from regional import MultiRegionForecaster
+        regional = MultiRegionForecaster.load(args.regional_checkpoint, args.regional_architecture)
+        logger.info(f"Regional {regional.target} model for {', '.join(regional.regions)}")
+
+    # Always record spans here; /metrics?format=prometheus serves them
+    instrumentation.metrics.enable()
+    server = create_server(XGBoostForecaster(args.model_dir), args.host, args.port,
+                           args.max_wait_ms, args.max_batch_rows, regional)
+    logger.info(f"Serving forecasts on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.batcher.close()
+
+
+if __name__ == "__main__":
+    main()
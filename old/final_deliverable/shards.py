@@ -0,0 +1,374 @@
+"""Sharded on-disk training data: one float32 memmap per region and year.
+
+    python shards.py --ne-database energy_data_NE.db --targets solar wind
+    python shards.py --eia-database energy_production.db --targets solar wind \\
+        --weather CAISO=caiso_weather.db MISO=miso_weather.db NYISO=nyiso_weather.db \\
+                  PJM=pjm_weather.db ERCOT=ercot_weather.db
+
+Layout under --root (default shards/<feature_set>-<targets>):
+
+    index.json                        columns, targets, scaling statistics and
+                                      the shards of every region
+    <region>/<year>/features.npy      (hours, features) float32, raw units
+    <region>/<year>/targets.npy       (hours, targets) float32
+
+Each region is aligned on a dense UTC hour grid (alignment.py) covering the
+hours where its weather and all its targets overlap, cut at year
+boundaries, so consecutive shards are consecutive hours; unobserved hours
+are NaN. New England reads the tables of energy_data_NE.db. The ISOs
+collected by EIA_API_request_all_dates.main() read their solar / wind
+generation from its EnergyProduction table and their weather from a
+per-region database in the historical_weather_data layout. Shards are built
+one region-year at a time, accumulating the min-max statistics on the way,
+so a build never holds more than one region-year in memory.
+
+ShardedWindowDataset memory-maps the shards and indexes every valid window
+of every region; windows may cross a year boundary but never a region or a
+NaN row. ``get_batch`` gathers rows straight from the memmaps and scales
+them with the stored statistics, so only the pages a batch touches are read,
+and resident memory is bounded by the window index (two int64 per window)
+rather than the size of the data. It plugs into batching.make_loader like
+WindowedDataset.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+from collections import namedtuple
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+import torch
+from torch.utils.data import Dataset
+
+from alignment import HourGrid, align_sources, to_hours, window_validity
+from feature_store import scaler_from_params
+from features import FEATURE_SETS, NS_PER_HOUR, WEATHER_FEATURES, build_feature_matrix, column_indices
+from regions import EIA_REGIONS
+from training_data import DATABASE_PATH, DEFAULT_GAP_POLICIES, DEFAULT_QUALITY_POLICIES
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SHARD_FORMAT_VERSION = 1
+
+SHARDS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shards')
+
+EIA_FUEL_TYPES = {'solar': 'SUN', 'wind': 'WND'}
+
+SQLITE_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+EIA_TIME_FORMAT = '%Y-%m-%dT%H'
+
+# One SQLite table holding a time column and value columns, optionally filtered by equality
+Table = namedtuple('Table', ['database', 'name', 'time_column', 'columns', 'filters', 'time_format'])
+
+
+def weather_table(database):
+    return Table(database, 'historical_weather_data', 'time', {column: column for column in WEATHER_FEATURES},
+                 (), SQLITE_TIME_FORMAT)
+
+
+NE_TARGET_TABLES = {
+    'solar': ('SUN_data_NE', 'value'),
+    'wind': ('WND_data_NE', 'value'),
+    'demand': ('demand_data_NE', 'Demand'),
+}
+
+
+class RegionSource:
+    """Weather and target tables of one region, read one hour range at a time"""
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    @classmethod
+    def new_england(cls, database=DATABASE_PATH, targets=('solar', 'wind')):
+        tables = {'weather': weather_table(database)}
+        for target in targets:
+            name, column = NE_TARGET_TABLES[target]
+            tables[target] = Table(database, name, 'datetime', {target: column}, (), SQLITE_TIME_FORMAT)
+        return cls(tables)
+
+    @classmethod
+    def eia(cls, region, eia_database, weather_database, targets=('solar', 'wind')):
+        tables = {'weather': weather_table(weather_database)}
+        for target in targets:
+            if target not in EIA_FUEL_TYPES:
+                raise ValueError(f"The EIA collector has no {target!r} series; use one of {list(EIA_FUEL_TYPES)}")
+            tables[target] = Table(eia_database, 'EnergyProduction', 'period', {target: 'value'},
+                                   (('respondent', region), ('fuel_type', EIA_FUEL_TYPES[target])),
+                                   EIA_TIME_FORMAT)
+        return cls(tables)
+
+    @staticmethod
+    def where(table, extra=''):
+        clauses = [f"{column} = ?" for column, _ in table.filters] + ([extra] if extra else [])
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else ''
+
+    def span(self):
+        """HourGrid over the hours every table has data for"""
+        starts, stops = [], []
+        for table in self.tables.values():
+            with closing(sqlite3.connect(f"file:{table.database}?mode=ro", uri=True)) as conn:
+                first, last = conn.execute(
+                    f"SELECT MIN({table.time_column}), MAX({table.time_column}) FROM {table.name}"
+                    f"{self.where(table)}", [value for _, value in table.filters]).fetchone()
+            if first is None:
+                raise ValueError(f"{table.name} in {table.database} has no rows for {dict(table.filters)}")
+            hours, _ = to_hours([first, last])
+            starts.append(hours[0])
+            stops.append(hours[1] + 1)
+        return HourGrid(max(starts), min(stops))
+
+    def read(self, grid):
+        """align_sources input for the hours of ``grid``"""
+        start, stop = (pd.Timestamp(hour * NS_PER_HOUR) for hour in (grid.start, grid.stop))
+        sources = {}
+        for source, table in self.tables.items():
+            columns = ', '.join(f"{column} AS {name}" for name, column in table.columns.items())
+            query = (f"SELECT {table.time_column} AS time, {columns} FROM {table.name}"
+                     f"{self.where(table, f'{table.time_column} >= ? AND {table.time_column} < ?')}")
+            params = [value for _, value in table.filters] + [start.strftime(table.time_format),
+                                                              stop.strftime(table.time_format)]
+            with closing(sqlite3.connect(f"file:{table.database}?mode=ro", uri=True)) as conn:
+                frame = pd.read_sql_query(query, conn, params=params)
+            sources[source] = (frame['time'].to_numpy(),
+                               {name: frame[name].to_numpy() for name in table.columns}, 'UTC')
+        return sources
+
+
+def year_grids(grid):
+    """Split ``grid`` at every 1 January 00:00 UTC"""
+    year = pd.Timestamp(grid.start * NS_PER_HOUR).year
+    start = grid.start
+    while start < grid.stop:
+        year += 1
+        boundary = pd.Timestamp(f'{year}-01-01').value // NS_PER_HOUR
+        stop = min(boundary, grid.stop)
+        yield year - 1, HourGrid(start, stop)
+        start = stop
+
+
+def minmax_params(data_min, data_max, samples):
+    """MinMaxScaler parameters (see feature_store.scaler_params) from column minima and maxima"""
+    data_range = data_max - data_min
+    scale = 1.0 / np.where(data_range == 0, 1.0, data_range)
+    return {'min_': (-data_min * scale).tolist(), 'scale_': scale.tolist(),
+            'data_min_': data_min.tolist(), 'data_max_': data_max.tolist(),
+            'data_range_': data_range.tolist(), 'feature_range': [0, 1], 'n_samples_seen_': int(samples)}
+
+
+def select_params(params, columns):
+    """Scaler parameters restricted to ``columns``"""
+    selected = dict(params)
+    for name in ['min_', 'scale_', 'data_min_', 'data_max_', 'data_range_']:
+        selected[name] = [params[name][i] for i in columns]
+    return selected
+
+
+def build_shards(sources, root, feature_set='joint', targets=('solar', 'wind'), policies=None, quality=None):
+    """Write one shard per region and year of ``sources`` ({region: RegionSource}) under ``root``"""
+    targets = list(targets)
+    policies = {**DEFAULT_GAP_POLICIES, **(policies or {})}
+    quality = {**DEFAULT_QUALITY_POLICIES, **(quality or {})}
+    columns = FEATURE_SETS[feature_set]
+    bounds = {'features': [np.full(len(columns), np.nan), np.full(len(columns), np.nan)],
+              'targets': [np.full(len(targets), np.nan), np.full(len(targets), np.nan)]}
+    observed = 0
+    index = {'version': SHARD_FORMAT_VERSION, 'feature_set': feature_set, 'columns': columns,
+             'targets': targets, 'regions': {}}
+
+    parent = os.path.dirname(os.path.abspath(root))
+    os.makedirs(parent, exist_ok=True)
+    temporary = tempfile.mkdtemp(dir=parent, prefix='.tmp-shards-')
+    try:
+        for region, source in sources.items():
+            region_grid = source.span()
+            shards = []
+            for year, grid in year_grids(region_grid):
+                aligned = align_sources(source.read(grid), policies, grid, quality)
+                features = build_feature_matrix(aligned.columns, timestamps=aligned.epoch_ns,
+                                                feature_set=feature_set)
+                target_values = np.column_stack([aligned.columns[t] for t in targets]).astype(np.float32)
+
+                path = os.path.join(region, str(year))
+                os.makedirs(os.path.join(temporary, path))
+                np.save(os.path.join(temporary, path, 'features.npy'), features)
+                np.save(os.path.join(temporary, path, 'targets.npy'), target_values)
+
+                for name, values in [('features', features), ('targets', target_values)]:
+                    low, high = bounds[name]
+                    bounds[name] = [np.fmin(low, np.fmin.reduce(values, axis=0)),
+                                    np.fmax(high, np.fmax.reduce(values, axis=0))]
+                observed += int(aligned.valid.sum())
+                shards.append({'year': year, 'path': path, 'rows': len(grid), 'start_hour': grid.start,
+                               'quality': aligned.quality.to_dict('records')})
+                logger.info(f"{region} {year}: {len(grid)} hours, {int(aligned.valid.sum())} complete")
+            index['regions'][region] = {'start_hour': region_grid.start, 'rows': len(region_grid),
+                                        'shards': shards}
+
+        index['scaler_features'] = minmax_params(*bounds['features'], observed)
+        index['scaler_target'] = minmax_params(*bounds['targets'], observed)
+        with open(os.path.join(temporary, 'index.json'), 'w') as file:
+            json.dump(index, file, indent=2)
+        if os.path.exists(root):
+            shutil.rmtree(root)
+        os.replace(temporary, root)
+    finally:
+        shutil.rmtree(temporary, ignore_errors=True)
+    return index
+
+
+class RegionShards:
+    """Memory-mapped shards of one region, addressed by row since the region's first hour"""
+
+    def __init__(self, root, shards):
+        self.features = [np.load(os.path.join(root, s['path'], 'features.npy'), mmap_mode='r') for s in shards]
+        self.targets = [np.load(os.path.join(root, s['path'], 'targets.npy'), mmap_mode='r') for s in shards]
+        self.offsets = np.cumsum([0] + [s['rows'] for s in shards])
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def valid_rows(self, feature_columns, target_columns):
+        """Rows whose selected features and targets are all finite, read one shard at a time"""
+        return np.concatenate([
+            np.isfinite(features[:, feature_columns]).all(axis=1) & np.isfinite(targets[:, target_columns]).all(axis=1)
+            for features, targets in zip(self.features, self.targets)])
+
+    def gather(self, arrays, rows, columns):
+        """``arrays``[rows][:, columns] across shard boundaries, shaped rows.shape + (columns,)"""
+        flat = rows.ravel()
+        shard = np.searchsorted(self.offsets, flat, side='right') - 1
+        out = np.empty((flat.size, len(columns)), dtype=np.float32)
+        for s in np.unique(shard):
+            mask = shard == s
+            out[mask] = arrays[s][np.ix_(flat[mask] - self.offsets[s], columns)]
+        return out.reshape(rows.shape + (len(columns),))
+
+
+class ShardedWindowDataset(Dataset):
+    """(window, next target) pairs over every region of a shard directory.
+
+    ``feature_set`` selects the model's columns out of the shards' layout and
+    ``targets`` the target columns. Windows are ordered by region, then time;
+    ``window_regions`` / ``window_starts`` give each window's region index
+    and first row. ``scaler_features`` / ``scaler_target`` cover the selected
+    columns, for inverse transforms and checkpoints. With ``with_regions``
+    batches are ((windows, region indices), targets), the inputs of
+    regional.RegionalForecaster.
+    """
+
+    def __init__(self, root, sequence_length, feature_set=None, targets=None, regions=None,
+                 with_regions=False):
+        with open(os.path.join(root, 'index.json')) as file:
+            self.index = json.load(file)
+        self.sequence_length = sequence_length
+        self.feature_columns = (column_indices(feature_set, self.index['feature_set'])
+                                if feature_set else list(range(len(self.index['columns']))))
+        self.target_columns = [self.index['targets'].index(t) for t in (targets or self.index['targets'])]
+        self.regions = list(regions or self.index['regions'])
+        self.with_regions = with_regions
+        self.offsets = np.arange(sequence_length)
+
+        feature_params = select_params(self.index['scaler_features'], self.feature_columns)
+        target_params = select_params(self.index['scaler_target'], self.target_columns)
+        self.scaler_features = scaler_from_params(feature_params)
+        self.scaler_target = scaler_from_params(target_params)
+        self.feature_scale = np.asarray(feature_params['scale_'], dtype=np.float32)
+        self.feature_min = np.asarray(feature_params['min_'], dtype=np.float32)
+        self.target_scale = np.asarray(target_params['scale_'], dtype=np.float32)
+        self.target_min = np.asarray(target_params['min_'], dtype=np.float32)
+
+        self.shards, window_regions, window_starts = [], [], []
+        for i, region in enumerate(self.regions):
+            shards = RegionShards(root, self.index['regions'][region]['shards'])
+            valid = shards.valid_rows(self.feature_columns, self.target_columns)
+            starts = np.flatnonzero(window_validity(valid, sequence_length))
+            self.shards.append(shards)
+            window_regions.append(np.full(len(starts), i, dtype=np.int64))
+            window_starts.append(starts.astype(np.int64))
+        self.window_regions = np.concatenate(window_regions)
+        self.window_starts = np.concatenate(window_starts)
+
+    @property
+    def num_features(self):
+        return len(self.feature_columns)
+
+    def __len__(self):
+        return len(self.window_starts)
+
+    def __getitem__(self, idx):
+        x, y = self.get_batch([idx])
+        if self.with_regions:
+            return (x[0][0], x[1][0]), y[0]
+        return x[0], y[0]
+
+    def get_batch(self, indices):
+        """Gather and scale windows ``indices`` as (batch, sequence, features)"""
+        indices = np.asarray(indices, dtype=np.int64)
+        regions, starts = self.window_regions[indices], self.window_starts[indices]
+        x = np.empty((len(indices), self.sequence_length, self.num_features), dtype=np.float32)
+        y = np.empty((len(indices), len(self.target_columns)), dtype=np.float32)
+        for region in np.unique(regions):
+            mask = regions == region
+            shards = self.shards[region]
+            x[mask] = shards.gather(shards.features, starts[mask][:, None] + self.offsets, self.feature_columns)
+            y[mask] = shards.gather(shards.targets, starts[mask] + self.sequence_length, self.target_columns)
+        x *= self.feature_scale
+        x += self.feature_min
+        y *= self.target_scale
+        y += self.target_min
+        if self.with_regions:
+            return (torch.from_numpy(x), torch.from_numpy(regions)), torch.from_numpy(y)
+        return torch.from_numpy(x), torch.from_numpy(y)
+
+    def __getitems__(self, indices):
+        return self.get_batch(indices)
+
+
+def parse_pairs(pairs):
+    mapping = {}
+    for pair in pairs or []:
+        key, value = pair.split('=', 1)
+        mapping[key] = value
+    return mapping
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build per-region, per-year training shards")
+    parser.add_argument('--root', help="Output directory (default shards/<feature_set>-<targets>)")
+    parser.add_argument('--feature-set', choices=list(FEATURE_SETS), default='joint')
+    parser.add_argument('--targets', nargs='+', default=['solar', 'wind'])
+    parser.add_argument('--ne-database', help="energy_data_NE.db, stored as region NE")
+    parser.add_argument('--eia-database', help="EnergyProduction database from EIA_API_request_all_dates.py")
+    parser.add_argument('--weather', nargs='*', metavar='REGION=DATABASE',
+                        help=f"Weather database per EIA region (regions: {', '.join(EIA_REGIONS)})")
+    args = parser.parse_args()
+
+    sources = {}
+    if args.ne_database:
+        sources['NE'] = RegionSource.new_england(args.ne_database, args.targets)
+    if args.eia_database:
+        for region, weather_database in parse_pairs(args.weather).items():
+            sources[region] = RegionSource.eia(region, args.eia_database, weather_database, args.targets)
+    if not sources:
+        parser.error("Give --ne-database and/or --eia-database with --weather")
+
+    root = args.root or os.path.join(SHARDS_DIR, f"{args.feature_set}-{'-'.join(args.targets)}")
+    index = build_shards(sources, root, args.feature_set, args.targets)
+    for region, entry in index['regions'].items():
+        logger.info(f"{region}: {entry['rows']} hours in {len(entry['shards'])} shards")
+    logger.info(f"Wrote {root}")
+
+
+if __name__ == "__main__":
+    main()
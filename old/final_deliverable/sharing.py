@@ -0,0 +1,33 @@
+"""Share read-only float32 arrays with worker processes without copying them"""
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SharedArrays:
+    """Float32 arrays copied into shared memory once and attached by every worker"""
+
+    def __init__(self, **arrays):
+        self.blocks = []
+        self.specs = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array, dtype=np.float32)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=np.float32, buffer=block.buf)[:] = array
+            self.blocks.append(block)
+            self.specs[name] = (block.name, array.shape)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+
+
+def attach_shared(specs):
+    """Map shared blocks back to arrays; keep the returned handles alive while in use"""
+    arrays, handles = {}, []
+    for name, (block_name, shape) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        handles.append(block)
+        arrays[name] = np.ndarray(shape, dtype=np.float32, buffer=block.buf)
+    return arrays, handles
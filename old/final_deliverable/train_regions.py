@@ -0,0 +1,119 @@
+"""Train one of the notebook architectures on every region of a shard directory.
+
+    python train_regions.py --shards shards/joint-solar-wind --target solar --architecture EnergyCNN
+
+Batches are gathered from the memory-mapped shards (shards.py), so the
+process never loads the dataset: memory is the window index, the model and
+a few batches. The last --val-fraction of each region's windows is held out
+(after a gap of one window length) for early stopping, and the checkpoint
+carries the scalers and the shard layout like the notebook checkpoints.
+
+By default the regions are simply pooled. --region-embedding N trains a
+regional.RegionalForecaster instead, which learns an N-dimensional
+embedding per region (and with --region-heads a per-region output scale
+and bias), so one network serves every region without blurring them.
+--quantiles 0.1 0.5 0.9 trains one output per quantile with the pinball
+loss instead of a single MSE output (see quantiles.py).
+"""
+import argparse
+import logging
+
+import numpy as np
+import torch
+
+from batching import make_loader
+from models import ARCHITECTURES, build_model
+from quantiles import PinballLoss
+from regional import RegionalForecaster
+from shards import ShardedWindowDataset
+from trainer import Trainer
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def chronological_split(dataset, val_fraction):
+    """Train / validation window indices, splitting each region at the same fraction of its windows"""
+    train, val = [], []
+    for region in range(len(dataset.regions)):
+        indices = np.flatnonzero(dataset.window_regions == region)
+        split = int(len(indices) * (1 - val_fraction))
+        if split >= len(indices):
+            train.append(indices)
+            continue
+        starts = dataset.window_starts[indices]
+        cut = starts[split]
+        # Training targets come before the cut; validation windows start one window after it
+        train.append(indices[starts + dataset.sequence_length < cut])
+        val.append(indices[starts >= cut + dataset.sequence_length])
+    return np.concatenate(train), (np.concatenate(val) if val else np.array([], dtype=np.int64))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train a forecasting network on sharded multi-region data")
+    parser.add_argument('--shards', required=True, help="Shard directory written by shards.py")
+    parser.add_argument('--target', required=True)
+    parser.add_argument('--architecture', choices=list(ARCHITECTURES), default='EnergyCNN')
+    parser.add_argument('--regions', nargs='*', help="Subset of the shard regions (default: all)")
+    parser.add_argument('--region-embedding', type=int, default=0,
+                        help="Size of the learned region embedding (0 pools the regions)")
+    parser.add_argument('--region-heads', action='store_true', help="Per-region output scale and bias")
+    parser.add_argument('--quantiles', type=float, nargs='+',
+                        help="Train quantile outputs (e.g. 0.1 0.5 0.9) instead of a point forecast")
+    parser.add_argument('--epochs', type=int)
+    parser.add_argument('--val-fraction', type=float, default=0.1)
+    parser.add_argument('--patience', type=int, default=5)
+    parser.add_argument('--prefetch', type=int, default=2)
+    parser.add_argument('--output', default=None, help="Checkpoint path (default <target>_<architecture>_regions.pth)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--fresh', action='store_true', help="Start over instead of resuming --output")
+    args = parser.parse_args()
+    if args.region_heads and args.region_embedding <= 0:
+        parser.error("--region-heads needs --region-embedding")
+
+    spec = ARCHITECTURES[args.architecture]
+    dataset = ShardedWindowDataset(args.shards, spec['sequence_length'], spec['feature_set'],
+                                   [args.target], args.regions, with_regions=args.region_embedding > 0)
+    train_idx, val_idx = chronological_split(dataset, args.val_fraction)
+    logger.info(f"{len(dataset)} windows over {len(dataset.regions)} regions: "
+                f"{len(train_idx)} train, {len(val_idx)} validation")
+
+    torch.manual_seed(args.seed)
+    quantiles = sorted(args.quantiles) if args.quantiles else None
+    output_size = len(quantiles) if quantiles else 1
+    if args.region_embedding > 0:
+        model = RegionalForecaster(args.architecture, dataset.num_features, spec['sequence_length'],
+                                   dataset.regions, args.region_embedding, args.region_heads,
+                                   output_size=output_size)
+    else:
+        model = build_model(args.architecture, dataset.num_features, spec['sequence_length'],
+                            output_size=output_size)
+    optimizer = torch.optim.Adam(model.parameters(), lr=spec['learning_rate'], weight_decay=spec['weight_decay'])
+    output = args.output or f"{args.target}_{args.architecture}_regions.pth"
+    trainer = Trainer(model, optimizer, criterion=PinballLoss(quantiles) if quantiles else None,
+                      checkpoint_path=output, patience=args.patience, fresh=args.fresh,
+                      clip_grad_norm=spec.get('clip_grad_norm'),
+                      extra_state={'scaler_features': dataset.scaler_features,
+                                   'scaler_target': dataset.scaler_target,
+                                   'sequence_length': spec['sequence_length'],
+                                   'regions': dataset.regions,
+                                   'feature_set': spec['feature_set'],
+                                   'input_size': dataset.num_features,
+                                   'target': args.target,
+                                   'region_embedding': args.region_embedding,
+                                   'region_heads': args.region_heads,
+                                   'quantiles': quantiles})
+
+    loader = make_loader(dataset, train_idx, spec['batch_size'], shuffle=True, prefetch=args.prefetch,
+                         seed=args.seed)
+    val_loader = make_loader(dataset, val_idx, 2048, shuffle=False) if len(val_idx) else None
+    trainer.fit(loader, val_loader, num_epochs=args.epochs or spec['num_epochs'])
+    logger.info(f"Saved {output}")
+
+
+if __name__ == "__main__":
+    main()
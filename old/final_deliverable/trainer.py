@@ -0,0 +1,174 @@
+"""Resumable training loop shared by the notebooks, search and backtests.
+
+    trainer = Trainer(model, optimizer, checkpoint_path='solar_cnn.pth', patience=5,
+                      extra_state={'scaler_features': scaler_features, 'scaler_target': scaler_target})
+    losses = trainer.fit(train_loader, val_loader, num_epochs=20)
+
+After every epoch the trainer records the training and validation loss and
+atomically rewrites the checkpoint (model, best model, optimizer, loop state,
+RNG state and ``extra_state``). Constructing a Trainer on an existing
+checkpoint resumes from the last finished epoch, unless ``fresh=True``, which
+starts over and overwrites it. A rerun on a checkpoint that has already
+finished trains nothing and logs a warning saying so. Training stops once the
+validation loss has not improved by ``min_delta`` for ``patience`` epochs, and
+the best weights are restored at the end.
+
+Checkpoints keep the notebooks' keys (``model_state_dict``,
+``optimizer_state_dict``, ``scaler_features``, ...), so export.py reads them
+as they are.
+"""
+import copy
+import logging
+import os
+
+import torch
+import torch.nn as nn
+
+logger = logging.getLogger(__name__)
+
+
+def save_checkpoint(payload, path):
+    """torch.save to a temporary file next to ``path`` and rename it into place"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(temporary, 'wb') as file:
+            torch.save(payload, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+class Trainer:
+    """Epoch loop with validation tracking, early stopping and resumable checkpoints"""
+
+    def __init__(self, model, optimizer, criterion=None, device=None, checkpoint_path=None,
+                 patience=None, min_delta=0.0, clip_grad_norm=None, restore_best=True, extra_state=None,
+                 fresh=False):
+        self.model = model
+        self.optimizer = optimizer
+        self.criterion = criterion or nn.MSELoss()
+        self.device = device or torch.device('cpu')
+        self.checkpoint_path = checkpoint_path
+        self.patience = patience
+        self.min_delta = min_delta
+        self.clip_grad_norm = clip_grad_norm
+        self.restore_best = restore_best
+        self.extra_state = dict(extra_state or {})
+
+        self.state = {'epoch': 0, 'best_val_loss': float('inf'), 'best_epoch': 0,
+                      'epochs_since_best': 0, 'stopped': False, 'train_losses': [], 'val_losses': []}
+        self.best_model_state = None
+        self._loader_rng_state = None
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            if fresh:
+                logger.info(f"Ignoring the existing checkpoint {checkpoint_path}; training from scratch")
+            else:
+                self.resume(checkpoint_path)
+
+    def resume(self, path):
+        checkpoint = torch.load(path, map_location='cpu', weights_only=False)
+        self.model.load_state_dict(checkpoint['model_state_dict'])
+        self.optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
+        self.state = checkpoint['trainer_state']
+        self.best_model_state = checkpoint.get('best_model_state_dict')
+        self._loader_rng_state = checkpoint.get('loader_rng_state')
+        torch.set_rng_state(checkpoint['torch_rng_state'])
+        for key in checkpoint.get('extra_keys', []):
+            self.extra_state.setdefault(key, checkpoint[key])
+        logger.info(f"Resumed from {path} after epoch {self.state['epoch']}")
+
+    def save(self, train_loader=None):
+        generator = getattr(train_loader, 'generator', None)
+        save_checkpoint({
+            'model_state_dict': self.model.state_dict(),
+            'best_model_state_dict': self.best_model_state,
+            'optimizer_state_dict': self.optimizer.state_dict(),
+            'trainer_state': self.state,
+            'torch_rng_state': torch.get_rng_state(),
+            'loader_rng_state': generator.get_state() if generator is not None else None,
+            'extra_keys': list(self.extra_state),
+            **self.extra_state,
+        }, self.checkpoint_path)
+
+    def forward(self, batch_X):
+        """Model output for a batch; a tuple batch (e.g. windows and region ids) is passed as arguments"""
+        if isinstance(batch_X, (tuple, list)):
+            return self.model(*(tensor.to(self.device) for tensor in batch_X))
+        return self.model(batch_X.to(self.device))
+
+    def train_epoch(self, loader):
+        self.model.train()
+        total = 0.0
+        for batch_X, batch_y in loader:
+            batch_y = batch_y.to(self.device)
+
+            self.optimizer.zero_grad()
+            loss = self.criterion(self.forward(batch_X), batch_y)
+            loss.backward()
+            if self.clip_grad_norm:
+                torch.nn.utils.clip_grad_norm_(self.model.parameters(), max_norm=self.clip_grad_norm)
+            self.optimizer.step()
+
+            total += loss.item()
+        return total / max(len(loader), 1)
+
+    def evaluate(self, loader):
+        """Mean per-sample loss over ``loader``"""
+        self.model.eval()
+        total, count = 0.0, 0
+        with torch.no_grad():
+            for batch_X, batch_y in loader:
+                batch_y = batch_y.to(self.device)
+                total += self.criterion(self.forward(batch_X), batch_y).item() * len(batch_y)
+                count += len(batch_y)
+        self.model.train()
+        return total / max(count, 1)
+
+    def fit(self, train_loader, val_loader=None, num_epochs=20, verbose=True):
+        """Train until ``num_epochs`` epochs are done in total or early stopping; returns train losses"""
+        generator = getattr(train_loader, 'generator', None)
+        if self._loader_rng_state is not None and generator is not None:
+            generator.set_state(self._loader_rng_state)
+            self._loader_rng_state = None
+
+        state = self.state
+        if self.checkpoint_path and state['epoch'] and (state['stopped'] or state['epoch'] >= num_epochs):
+            reason = (f"stopped early after epoch {state['epoch']}" if state['stopped']
+                      else f"already trained {state['epoch']} of {num_epochs} epochs")
+            logger.warning(f"{self.checkpoint_path} {reason}; nothing to train. "
+                           f"Start from scratch (fresh=True / --fresh) if the configuration changed.")
+
+        while state['epoch'] < num_epochs and not state['stopped']:
+            train_loss = self.train_epoch(train_loader)
+            state['train_losses'].append(train_loss)
+            state['epoch'] += 1
+            message = f"Epoch {state['epoch']}/{num_epochs}, Loss: {train_loss:.4f}"
+
+            if val_loader is not None:
+                val_loss = self.evaluate(val_loader)
+                state['val_losses'].append(val_loss)
+                message += f", Val Loss: {val_loss:.4f}"
+                if val_loss < state['best_val_loss'] - self.min_delta:
+                    state.update(best_val_loss=val_loss, best_epoch=state['epoch'], epochs_since_best=0)
+                    self.best_model_state = copy.deepcopy(self.model.state_dict())
+                else:
+                    state['epochs_since_best'] += 1
+                    if self.patience is not None and state['epochs_since_best'] >= self.patience:
+                        state['stopped'] = True
+                        message += f" (no improvement for {self.patience} epochs, stopping)"
+
+            if verbose:
+                print(message)
+            if self.checkpoint_path:
+                self.save(train_loader)
+
+        if self.restore_best and self.best_model_state is not None:
+            self.model.load_state_dict(self.best_model_state)
+            if self.checkpoint_path:
+                self.save(train_loader)
+        return state['train_losses']
@@ -0,0 +1,114 @@
+"""Loading and scaling of the SQLite training tables used by the notebooks"""
+import sqlite3
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler
+
+from alignment import align_sources
+from features import WEATHER_FEATURES, build_feature_matrix
+from quality import QUALITY_POLICIES, log_report
+
+DATABASE_PATH = "energy_data_NE.db"
+
+WEATHER_QUERY = """
+SELECT time, temperature, dwpt, humidity, precipitation,
+       wdir, windspeed, pres, cloudcover
+FROM historical_weather_data
+"""
+
+TARGET_QUERIES = {
+    'solar': "SELECT datetime, value FROM SUN_data_NE",
+    'wind': "SELECT datetime, value FROM WND_data_NE",
+    'demand': "SELECT datetime, Demand as value FROM demand_data_NE",
+}
+
+# source -> (policy, limit in hours); see alignment.fill_gaps
+DEFAULT_GAP_POLICIES = {
+    'weather': ('interpolate', 3),
+    'solar': ('mask', None),
+    'wind': ('mask', None),
+    'demand': ('mask', None),
+}
+
+# source -> quality checks and repairs; see quality.py
+DEFAULT_QUALITY_POLICIES = {
+    'weather': QUALITY_POLICIES['weather'],
+    'solar': QUALITY_POLICIES['generation'],
+    'wind': QUALITY_POLICIES['generation'],
+    'demand': QUALITY_POLICIES['demand'],
+}
+
+# source -> timezone its naive timestamps are recorded in
+SOURCE_TIMEZONES = {
+    'weather': 'UTC',
+    'solar': 'UTC',
+    'wind': 'UTC',
+    'demand': 'UTC',
+}
+
+
+def load_merged_data(targets=('solar', 'wind', 'demand'), database_path=DATABASE_PATH):
+    """Weather joined with one column per target, reading each table once"""
+    conn = sqlite3.connect(database_path)
+    try:
+        merged = pd.read_sql_query(WEATHER_QUERY, conn).rename(columns={'time': 'datetime'})
+        merged['datetime'] = pd.to_datetime(merged['datetime'])
+
+        for target in targets:
+            target_data = pd.read_sql_query(TARGET_QUERIES[target], conn)
+            target_data['datetime'] = pd.to_datetime(target_data['datetime'])
+            target_data = target_data.rename(columns={'value': target})
+            merged = pd.merge(merged, target_data, on='datetime', how='inner')
+    finally:
+        conn.close()
+
+    return merged.sort_values('datetime').reset_index(drop=True)
+
+
+def load_aligned(targets=('solar', 'wind', 'demand'), database_path=DATABASE_PATH,
+                 policies=None, timezones=None, quality=None):
+    """Weather and targets on one dense hourly grid, NaN where a gap was left masked
+
+    Unlike load_merged_data no hour is dropped, so row ``i + 1`` is always
+    one hour after row ``i`` and sliding windows never jump across an outage.
+    Every column passes the quality stage first; its report is in
+    ``frame.attrs['quality']``.
+    """
+    policies = {**DEFAULT_GAP_POLICIES, **(policies or {})}
+    quality = {**DEFAULT_QUALITY_POLICIES, **(quality or {})}
+    timezones = {**SOURCE_TIMEZONES, **(timezones or {})}
+    conn = sqlite3.connect(database_path)
+    try:
+        weather = pd.read_sql_query(WEATHER_QUERY, conn)
+        sources = {'weather': (weather['time'].to_numpy(),
+                               {column: weather[column].to_numpy() for column in WEATHER_FEATURES},
+                               timezones['weather'])}
+        for target in targets:
+            target_data = pd.read_sql_query(TARGET_QUERIES[target], conn)
+            sources[target] = (target_data['datetime'].to_numpy(),
+                               {target: target_data['value'].to_numpy()},
+                               timezones[target])
+    finally:
+        conn.close()
+
+    aligned = align_sources(sources, policies, quality=quality)
+    log_report(aligned.quality)
+    frame = pd.DataFrame(aligned.columns)
+    frame.insert(0, 'datetime', pd.to_datetime(aligned.epoch_ns))
+    frame.attrs['quality'] = aligned.quality
+    return frame
+
+
+def prepare_training_data(merged_data, targets, feature_set='default'):
+    """Scale features and targets once; returns float32 arrays plus both scalers"""
+    features = build_feature_matrix(merged_data, feature_set=feature_set)
+    target_values = merged_data[list(targets)].to_numpy(dtype=np.float32)
+
+    scaler_features = MinMaxScaler()
+    scaler_target = MinMaxScaler()
+
+    features_scaled = scaler_features.fit_transform(features).astype(np.float32)
+    targets_scaled = scaler_target.fit_transform(target_values).astype(np.float32)
+
+    return features_scaled, targets_scaled, scaler_features, scaler_target
@@ -0,0 +1,101 @@
+"""Sliding-window datasets over one contiguous float32 feature array.
+
+Replaces ``create_sequences`` and the per-notebook ``EnergyDataset`` /
+``DemandDataset`` / ``WindDataset`` classes. No window is ever copied into
+its own array: ``windows`` is a strided read-only view, and batches are
+gathered with a single fancy-indexing op on start offsets.
+
+Rows holding NaN (hours the alignment stage left masked, see alignment.py)
+are never trained on: WindowedDataset indexes only the windows whose inputs
+and target are all finite.
+"""
+import numpy as np
+import torch
+from numpy.lib.stride_tricks import as_strided
+from torch.utils.data import Dataset
+
+from alignment import window_validity
+
+
+def sliding_windows(features, sequence_length):
+    """Read-only (n_windows, sequence_length, features) view of ``features``.
+
+    Window ``i`` covers rows ``i .. i + sequence_length - 1``; as in
+    ``create_sequences`` there is one window per row that has a target after it.
+    """
+    features = np.ascontiguousarray(features, dtype=np.float32)
+    count = max(len(features) - sequence_length, 0)
+    row_stride, column_stride = features.strides
+    return as_strided(features, shape=(count, sequence_length, features.shape[1]),
+                      strides=(row_stride, row_stride, column_stride), writeable=False)
+
+
+def collate_batch(batch):
+    """collate_fn for WindowedDataset: batches arrive already stacked"""
+    return batch
+
+
+class WindowedDataset(Dataset):
+    """(window, next target) pairs backed by one float32 tensor.
+
+    Use with ``DataLoader(..., collate_fn=collate_batch)``; the loader then
+    calls ``__getitems__`` once per batch (also through ``Subset``) instead of
+    ``__getitem__`` once per sample.
+
+    With ``drop_invalid`` (the default) index ``i`` is the i-th window with
+    no NaN among its rows and target, so samplers and splits never see a
+    window that straddles a gap. ``starts`` maps indices to first rows.
+    """
+
+    def __init__(self, features, targets, sequence_length, drop_invalid=True):
+        self.sequence_length = sequence_length
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        targets = np.ascontiguousarray(targets, dtype=np.float32).reshape(len(targets), -1)
+        self.features = torch.from_numpy(features)
+        self.targets = torch.from_numpy(targets)
+        self.offsets = torch.arange(sequence_length)
+
+        self.starts = None
+        if drop_invalid:
+            valid = np.isfinite(features).all(axis=1) & np.isfinite(targets).all(axis=1)
+            if not valid.all():
+                self.starts = torch.from_numpy(np.flatnonzero(window_validity(valid, sequence_length)))
+
+    @property
+    def num_features(self):
+        return self.features.shape[1]
+
+    @property
+    def start_rows(self):
+        """First row of each window, by dataset index"""
+        if self.starts is not None:
+            return self.starts.numpy()
+        return np.arange(len(self))
+
+    @property
+    def windows(self):
+        return sliding_windows(self.features.numpy(), self.sequence_length)
+
+    def __len__(self):
+        if self.starts is not None:
+            return len(self.starts)
+        return max(len(self.features) - self.sequence_length, 0)
+
+    def __getitem__(self, idx):
+        if self.starts is not None:
+            idx = int(self.starts[idx])
+        # Slicing a tensor is a view, so single samples are not copied either
+        return (self.features[idx:idx + self.sequence_length],
+                self.targets[idx + self.sequence_length])
+
+    def get_batch(self, indices):
+        """Gather windows ``indices`` as (batch, sequence, features)"""
+        starts = torch.as_tensor(np.asarray(indices), dtype=torch.long)
+        if self.starts is not None:
+            starts = self.starts[starts]
+        x = self.features[starts[:, None] + self.offsets]
+        y = self.targets[starts + self.sequence_length]
+        return x, y
+
+    def __getitems__(self, indices):
+        return self.get_batch(indices)